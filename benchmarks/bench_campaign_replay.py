@@ -0,0 +1,83 @@
+"""benchmarks/bench_campaign_replay.py
+캠페인 스냅샷 replay 단계별 소요 시간
+--------------------------------------
+저장된 스냅샷(campaigns.save_snapshot)으로 같은 실행을 발송 없이 여러 번 반복하고, 단계별 소요 시간의 중앙값을 출력한다.
+입력이 매번 같으므로 코드 변경 전후의 결과를 비교해 성능 변화를 확인할 수 있다.
+
+    # 운영에서 저장된 스냅샷 (CAMPAIGN_SNAPSHOT_DIR)
+    python -m benchmarks.bench_campaign_replay --campaign evening_usage_notification --date 2025-07-08
+
+    # 가짜 Firestore로 사용자 N명의 스냅샷을 만든 뒤 replay
+    python -m benchmarks.bench_campaign_replay --users 10000
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import tempfile
+from datetime import datetime
+
+
+def _capture_synthetic(users: int) -> tuple:
+    """가짜 Firestore에 사용자를 만들고 evening_usage_notification dry-run으로 스냅샷을 저장한다."""
+    from benchmarks.bench_usage_notification import _seed
+    from benchmarks.fake_firestore import FakeFirestore
+    from campaigns import KST, campaigns, dry_run_campaign
+    from firestore_client import set_firestore_client
+
+    db = FakeFirestore()
+    _seed(db, users, datetime.now(KST))
+    set_firestore_client(db)
+    campaign = campaigns["evening_usage_notification"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = dry_run_campaign(campaign, capture=True, decision_limit=0)
+    return campaign.name, result["target_date"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="캠페인 스냅샷 replay 벤치마크")
+    parser.add_argument("--campaign", default="evening_usage_notification")
+    parser.add_argument("--date", help="스냅샷의 사용량 대상 날짜 (YYYY-MM-DD)")
+    parser.add_argument("--users", type=int, help="지정하면 가짜 Firestore로 이 인원의 스냅샷을 만들어 사용")
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="SOLAPI 그룹 요청당 흉내 낼 발송 지연(초)")
+    args = parser.parse_args()
+
+    if args.users:
+        os.environ["CAMPAIGN_SNAPSHOT_DIR"] = tempfile.mkdtemp()
+    os.environ.setdefault("SOLAPI_API_KEY", "bench")
+    os.environ.setdefault("SOLAPI_API_SECRET", "bench")
+    os.environ.setdefault("SENDER_PHONE", "01000000000")
+    os.environ.setdefault("SCHEDULER_COORDINATION", "none")
+
+    from campaigns import STAGES, replay_campaign
+
+    campaign_name, target_date = args.campaign, args.date
+    if args.users:
+        campaign_name, target_date = _capture_synthetic(args.users)
+    if not target_date:
+        parser.error("--date 또는 --users가 필요합니다.")
+
+    runs = []
+    for _ in range(args.iterations):
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs.append(replay_campaign(campaign_name, target_date, latency=args.latency, decision_limit=0))
+
+    first = runs[0]
+    print(f"replay {campaign_name} {target_date}: users={first['snapshot']['users']} "
+          f"result={first['result']} decisions={dict(first['decision_counts'])}")
+    print(f"{'stage':<12} {'p50 ms':>10} {'min ms':>10} {'items':>8}")
+    for stage in STAGES:
+        samples = [run["timings"][stage]["seconds"] * 1000 for run in runs]
+        if not any(run["timings"][stage]["calls"] for run in runs):
+            continue
+        print(f"{stage:<12} {statistics.median(samples):10.2f} {min(samples):10.2f} "
+              f"{first['timings'][stage]['items']:>8}")
+    elapsed = [run["elapsed"] * 1000 for run in runs]
+    print(f"{'total':<12} {statistics.median(elapsed):10.2f} {min(elapsed):10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""benchmarks/bench_firestore_client.py
+Firestore 클라이언트 생성 방식별 호출 지연시간 비교
+------------------------------------------------------
+- before: 호출마다 initialize_firestore()로 새 클라이언트(새 gRPC 채널, 인증 로드)를 만든다.
+- after : get_firestore_client()로 프로세스 공유 클라이언트를 재사용한다.
+
+두 경우 모두 같은 문서 1건을 읽으므로, 차이는 클라이언트/채널 생성 비용이다.
+실제 프로젝트 또는 에뮬레이터(FIRESTORE_EMULATOR_HOST)에 대해 실행한다.
+
+    python -m benchmarks.bench_firestore_client --iterations 50
+"""
+
+import argparse
+import statistics
+import time
+
+from firestore_client import get_firestore_client, initialize_firestore, close_firestore_client
+
+
+def _read_once(client, collection: str, document: str) -> None:
+    client.collection(collection).document(document).get()
+
+
+def _measure(get_client, iterations: int, collection: str, document: str) -> list:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _read_once(get_client(), collection, document)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _report(label: str, samples: list) -> None:
+    ordered = sorted(samples)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{label:<8} n={len(samples):<5} "
+        f"mean={statistics.mean(samples):8.2f}ms "
+        f"p50={statistics.median(samples):8.2f}ms "
+        f"p99={p99:8.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Firestore 클라이언트 호출 지연시간 벤치마크")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--collection", default="personal_dashboard")
+    parser.add_argument("--document", default="_healthcheck")
+    args = parser.parse_args()
+
+    before = _measure(initialize_firestore, args.iterations, args.collection, args.document)
+    _report("before", before)
+
+    # 첫 호출(지연 생성)은 워밍업으로 제외
+    _read_once(get_firestore_client(), args.collection, args.document)
+    after = _measure(get_firestore_client, args.iterations, args.collection, args.document)
+    _report("after", after)
+
+    close_firestore_client()
+
+
+if __name__ == "__main__":
+    main()
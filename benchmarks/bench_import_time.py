@@ -0,0 +1,145 @@
+"""benchmarks/bench_import_time.py
+서버 콜드 스타트(import 시간) 측정
+---------------------------------
+새 프로세스에서 `python -X importtime -c "import <모듈>"`을 반복 실행해 모듈 import 시간을 측정한다.
+(첫 실행은 .pyc 생성분이 섞이므로 버리고, 나머지 실행의 중앙값을 보고)
+
+- total  : 대상 모듈 import 전체 시간 (하위 import 포함)
+- direct : 대상 모듈이 직접 import하는 모듈별 누적 시간 (어느 의존성이 느린지)
+- self   : 모듈 자신의 실행 시간이 큰 순서 (모듈 최상단에서 하는 일이 많은 곳)
+- --serve: uvicorn 프로세스 시작부터 GET / 첫 200 응답까지의 시간 (startup 훅 포함)
+
+--max-ms를 지정하면 첫 번째 모듈의 import 중앙값이 이를 넘을 때 종료 코드 1로 끝난다. (배포 전 확인용)
+
+    python -m benchmarks.bench_import_time --modules main,config --repeat 5 --serve
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.load_test import _bench_env, _free_port
+
+_LINE_PREFIX = "import time:"
+
+
+def _parse_importtime(stderr: str) -> list:
+    """-X importtime 출력을 (모듈, 깊이, self_us, cumulative_us) 목록으로 바꾼다."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith(_LINE_PREFIX):
+            continue
+        self_us, cumulative_us, name = line[len(_LINE_PREFIX):].split("|", 2)
+        if not self_us.strip().isdigit():
+            continue    # 머리글 줄
+        stripped = name.rstrip().lstrip(" ")
+        depth = (len(name.rstrip()) - len(stripped) - 1) // 2
+        rows.append((stripped, depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _measure_import(module: str, env: dict) -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return _parse_importtime(result.stderr)
+
+
+def _profile(module: str, repeat: int, env: dict) -> dict:
+    """repeat번 측정한 중앙값: 전체, 직접 import별 누적, 모듈별 self 시간(ms)"""
+    _measure_import(module, env)    # .pyc 생성 실행은 버림
+    totals, direct, self_times = [], {}, {}
+    for _ in range(repeat):
+        rows = _measure_import(module, env)
+        # 대상 모듈 줄은 하위 import 줄들 뒤에 깊이 0으로 나온다.
+        end = max(index for index, row in enumerate(rows) if row[0] == module and row[1] == 0)
+        start = end
+        while start > 0 and rows[start - 1][1] > 0:
+            start -= 1
+        totals.append(rows[end][3] / 1000)
+        for name, depth, self_us, cumulative_us in rows[start:end]:
+            if depth == 1:
+                direct.setdefault(name, []).append(cumulative_us / 1000)
+            self_times.setdefault(name, []).append(self_us / 1000)
+        self_times.setdefault(module, []).append(rows[end][2] / 1000)
+    return {
+        "total": statistics.median(totals),
+        "direct": {name: statistics.median(values) for name, values in direct.items()},
+        "self": {name: statistics.median(values) for name, values in self_times.items()},
+    }
+
+
+def _time_to_first_response(env: dict, timeout: float = 60) -> float:
+    """uvicorn main:app 프로세스를 띄운 시각부터 GET /가 200을 돌려줄 때까지의 시간(초)"""
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"server did not respond within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _print_top(title: str, values: dict, top: int) -> None:
+    print(f"  {title}")
+    for name, ms in sorted(values.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {ms:9.1f}ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="모듈 import 시간/콜드 스타트 벤치마크")
+    parser.add_argument("--modules", default="main,config", help="측정할 모듈 (쉼표 구분)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="direct/self 목록에 표시할 모듈 수")
+    parser.add_argument("--serve", action="store_true", help="uvicorn 시작부터 첫 응답까지의 시간도 측정")
+    parser.add_argument("--max-ms", type=float, default=None, help="첫 번째 모듈 import 중앙값 상한(ms)")
+    args = parser.parse_args()
+
+    modules = [module.strip() for module in args.modules.split(",") if module.strip()]
+    exceeded = False
+    with tempfile.TemporaryDirectory() as tmp:
+        # 발송/외부 호출은 하지 않지만 main import에 필요한 설정과 임시 파일 경로를 지정한다.
+        env = _bench_env(tmp, "http://127.0.0.1:9")
+        env.setdefault("SCHEDULER_COORDINATION", "none")
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [os.getcwd(), env.get("PYTHONPATH")]))
+
+        for index, module in enumerate(modules):
+            result = _profile(module, args.repeat, env)
+            print(f"import {module:<20} total={result['total']:8.1f}ms (median of {args.repeat})")
+            _print_top("direct imports (cumulative)", result["direct"], args.top)
+            _print_top("self time", result["self"], args.top)
+            if index == 0 and args.max_ms is not None and result["total"] > args.max_ms:
+                print(f"REGRESSION: import {module} {result['total']:.1f}ms > {args.max_ms:.1f}ms")
+                exceeded = True
+
+        if args.serve:
+            samples = [_time_to_first_response(env) for _ in range(args.repeat)]
+            print(f"first response (uvicorn start -> GET / 200) median={statistics.median(samples) * 1000:8.1f}ms "
+                  f"min={min(samples) * 1000:8.1f}ms")
+
+    sys.exit(1 if exceeded else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""benchmarks/bench_phone_normalization.py
+전화번호 정규화 처리량 비교
+----------------------------
+- per-row: 단건 등록(POST /recipients)과 같이 행마다 PhoneNumber 모델로 검증
+- batch  : 대량 등록(POST /recipients/bulk)이 사용하는 normalize_phone_numbers 일괄 처리
+- import : CSV 줄 파싱 + 일괄 정규화 + 중복 제거 + 임시 파일 저장소 기록까지 포함한 전체 경로
+
+입력은 하이픈/공백/괄호가 섞인 번호와 일정 비율의 잘못된 값으로 구성한다.
+
+    python -m benchmarks.bench_phone_normalization --rows 100000
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from pydantic import ValidationError
+
+import crud
+from models import PhoneNumber, normalize_phone_numbers
+
+
+def _make_rows(count: int, invalid_ratio: float, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    formats = ["010{}{}", "010-{}-{}", "010 {} {}", "(010) {}-{}", "10{}{}", "010.{}.{}"]
+    rows = []
+    for _ in range(count):
+        if rng.random() < invalid_ratio:
+            rows.append(rng.choice(["", "abc", "010-12", "phone", "+82-10-xxxx"]))
+        else:
+            rows.append(rng.choice(formats).format(f"{rng.randrange(10000):04d}", f"{rng.randrange(10000):04d}"))
+    return rows
+
+
+def _per_row(rows: list) -> int:
+    valid = 0
+    for raw in rows:
+        try:
+            PhoneNumber(phone=raw)
+            valid += 1
+        except ValidationError:
+            pass
+    return valid
+
+
+def _batch(rows: list) -> int:
+    valid, _ = normalize_phone_numbers(rows)
+    return len(valid)
+
+
+def _import(rows: list) -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        crud.recipient_store = crud.RecipientStore(tmp / "recipients.json", tmp / "recipients.log", len(rows) + 1)
+        report = crud.import_recipients((f"{raw}\n" for raw in rows), "csv")
+        crud.recipient_store.close()
+    return report["added"] + report["duplicates"]
+
+
+def _report(label: str, rows: list, fn) -> None:
+    started = time.perf_counter()
+    valid = fn(rows)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<8} rows={len(rows):<8} valid={valid:<8} {elapsed * 1000:9.1f}ms {len(rows) / elapsed:12,.0f} rows/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="전화번호 정규화 처리량 벤치마크")
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--invalid-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    rows = _make_rows(args.rows, args.invalid_ratio)
+    _report("per-row", rows, _per_row)
+    _report("batch", rows, _batch)
+    _report("import", rows, _import)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""benchmarks/bench_roster_listener.py
+명단 조회: 쿼리 경로 vs 리스너(on_snapshot) 경로
+----------------------------------------------------
+인메모리 가짜 Firestore(benchmarks.fake_firestore)에 사용자 N명을 만들고
+get_users_with_phone("real")의 호출당 지연시간과 문서 읽기 수를 비교한다.
+
+- query   : 매 호출마다 personal_dashboard 쿼리 + intention_app_user 존재 확인
+- listener: RosterWatcher가 메모리에 유지하는 명단을 반환 (초기 동기화 비용은 별도 출력)
+
+끝으로 리스너 연결을 강제로 끊은 뒤 재연결/재동기화가 일어나고 변경이 다시 반영되는지 확인한다.
+
+    python -m benchmarks.bench_roster_listener --users 5000 --iterations 20
+"""
+
+import argparse
+import statistics
+import time
+
+import firestore_client
+from benchmarks.fake_firestore import FakeFirestore
+from firestore_client import RosterWatcher, get_users_with_phone, set_firestore_client, reset_firestore_client
+
+
+def _seed(db: FakeFirestore, users: int) -> None:
+    for index in range(users):
+        user_id = f"user{index:06d}"
+        db.collection('personal_dashboard').document(user_id).set({
+            'name': f"사용자{index}",
+            'phone': f"010{index:08d}",
+            'role': 'real' if index % 4 else 'test',
+        })
+        # 10명 중 1명은 intention_app_user에 없는 사용자
+        if index % 10:
+            db.collection('intention_app_user').document(user_id).set({'name': f"사용자{index}"})
+
+
+def _measure(iterations: int, db: FakeFirestore):
+    samples = []
+    db.reset_counters()
+    for _ in range(iterations):
+        started = time.perf_counter()
+        users = get_users_with_phone(role_filter="real")
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, db.reads / iterations, len(users)
+
+
+def _report(label: str, samples: list, reads: float, count: int) -> None:
+    print(
+        f"{label:<9} users={count:<6} "
+        f"mean={statistics.mean(samples):8.2f}ms "
+        f"p50={statistics.median(samples):8.2f}ms "
+        f"reads/call={reads:8.1f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="명단 조회 쿼리 경로/리스너 경로 벤치마크")
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    db = FakeFirestore()
+    _seed(db, args.users)
+    set_firestore_client(db)
+
+    _report("query", *_measure(args.iterations, db))
+
+    watcher = RosterWatcher(check_interval=0.1)
+    firestore_client.roster_watcher = watcher
+    db.reset_counters()
+    started = time.perf_counter()
+    watcher.start()
+    watcher.wait_ready(timeout=10)
+    print(f"initial sync: {(time.perf_counter() - started) * 1000:.2f}ms, reads={db.reads}")
+
+    _report("listener", *_measure(args.iterations, db))
+
+    # 리스너 끊김 -> 재연결/재동기화 확인
+    db.drop_listeners()
+    db.collection('personal_dashboard').document('late_user').set({'phone': '01099999999', 'role': 'real'})
+    db.collection('intention_app_user').document('late_user').set({})
+    deadline = time.monotonic() + 5
+    while watcher.resync_count == 0 or not watcher.is_ready():
+        if time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    found = any(user['user_id'] == 'late_user' for user in get_users_with_phone(role_filter="real"))
+    print(f"resync_count={watcher.resync_count}, late_user reflected={found}")
+
+    watcher.stop()
+    reset_firestore_client()
+
+
+if __name__ == "__main__":
+    main()
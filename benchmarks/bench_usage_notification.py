@@ -0,0 +1,116 @@
+"""benchmarks/bench_usage_notification.py
+정기 사용량 알림 1회 실행: 순차 처리 vs 청크 병렬 처리(run_engine)
+----------------------------------------------------------------------
+인메모리 가짜 Firestore(benchmarks.fake_firestore, RPC당 지연 포함)에 real 사용자 N명과 당일 세션을 만들고,
+스텁 SOLAPI/Slack 서버(benchmarks.stub_provider)를 상대로 오후(당일) 사용량 알림 캠페인 1회 실행 시간을 잰다.
+
+- sequential: 워커 1개, 청크 1개 (명단 전체 사용량 조회가 끝난 뒤 전체 발송, 변경 전 방식)
+- parallel  : RUN_WORKERS/RUN_CHUNK_SIZE/RUN_READ_CONCURRENCY/RUN_SEND_CONCURRENCY 설정의 run_engine
+
+    python -m benchmarks.bench_usage_notification --users 10000 --rpc-latency 0.02 --latency 0.05
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.fake_firestore import FakeFirestore
+from benchmarks.stub_provider import StubProvider
+
+
+def _seed(db: FakeFirestore, users: int, now_kst: datetime) -> None:
+    start_date = now_kst - timedelta(days=7)
+    day_start = now_kst.replace(hour=0, minute=0, second=0, microsecond=0)
+    for index in range(users):
+        user_id = f"user{index:06d}"
+        db.collection('personal_dashboard').document(user_id).set({
+            'name': f"사용자{index}",
+            'phone': f"010{index:08d}",
+            'role': 'real',
+            'start_date': start_date,
+        })
+        user_ref = db.collection('intention_app_user').document(user_id)
+        user_ref.set({'name': f"사용자{index}"})
+        # 3명 중 1명은 오늘 30분 사용, 10명 중 1명은 목표(2시간) 달성
+        if index % 3 == 0 or index % 10 == 0:
+            minutes = 150 if index % 10 == 0 else 30
+            session_start = day_start + timedelta(minutes=1)
+            user_ref.collection('sessions').document('s1').set({
+                'start_time': session_start,
+                'end_time': session_start + timedelta(minutes=minutes),
+            })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="정기 사용량 알림 순차/병렬 실행 벤치마크")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--rpc-latency", type=float, default=0.02, help="가짜 Firestore RPC당 지연(초)")
+    parser.add_argument("--latency", type=float, default=0.05, help="스텁 SOLAPI 응답 지연(초)")
+    parser.add_argument("--query-mode", choices=["concurrent", "collection_group"], default="concurrent")
+    parser.add_argument("--mode", choices=["sequential", "parallel", "both"], default="both")
+    args = parser.parse_args()
+
+    stub = StubProvider(latency=args.latency).start()
+    tmp = tempfile.mkdtemp()
+    os.environ.setdefault("SOLAPI_API_KEY", "bench")
+    os.environ.setdefault("SOLAPI_API_SECRET", "bench")
+    os.environ.setdefault("SENDER_PHONE", "01000000000")
+    os.environ.update({
+        "SOLAPI_BASE_URL": stub.solapi_url,
+        "SLACK_WEBHOOK_URL": stub.slack_url,
+        "SLACK_SPILL_FILE": "",
+        "RECIPIENT_BACKEND": "sqlite",
+        "RECIPIENT_DB": os.path.join(tmp, "recipients.db"),
+        "OUTBOX_DB": os.path.join(tmp, "outbox.db"),
+        "USAGE_ROLLUP_DB": os.path.join(tmp, "usage_rollup.db"),
+        "SCHEDULER_COORDINATION": "none",
+        "CAMPAIGN_SNAPSHOT_CAPTURE": "false",
+        "FIRESTORE_USAGE_QUERY_MODE": args.query_mode,
+    })
+
+    # 환경 변수를 정한 뒤에 앱 모듈을 불러온다.
+    from campaigns import KST, campaigns, run_campaign
+    from firestore_client import set_firestore_client
+    from outbox import outbox
+    from run_engine import RunEngine, run_engine
+
+    db = FakeFirestore(latency=args.rpc_latency)
+    _seed(db, args.users, datetime.now(KST))
+    set_firestore_client(db)
+
+    engines = {
+        "sequential": RunEngine(workers=1, chunk_size=max(1, args.users)),
+        "parallel": run_engine,
+    }
+    modes = ["sequential", "parallel"] if args.mode == "both" else [args.mode]
+    try:
+        for mode in modes:
+            # 멱등 키 때문에 이전 실행의 발송 기록이 재사용되지 않도록 비움
+            with outbox._connection() as conn:
+                conn.execute("DELETE FROM outbox")
+            db.reset_counters()
+            sent_before = stub.messages
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_campaign(campaigns["evening_usage_notification"], engine=engines[mode])
+            elapsed = time.perf_counter() - started
+            sent = stub.messages - sent_before
+            print(
+                f"{mode:<10} users={args.users:<6} elapsed={elapsed:8.2f}s "
+                f"sent={sent:<6} msgs/s={sent / elapsed:8.1f} "
+                f"success={result['success']} failed={result['failed']} "
+                f"firestore rpcs={db.rpcs} reads={db.reads}",
+                flush=True,
+            )
+    finally:
+        outbox.stop()
+        stub.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,355 @@
+"""benchmarks/fake_firestore.py
+인메모리 가짜 Firestore
+------------------------
+firestore_client가 사용하는 API 범위(collection/document/where/select/order_by/limit/
+start_after/stream/get_all/collection_group/on_snapshot)만 흉내 내는 스레드 안전한 인메모리 구현.
+실제 서버 없이 조회 경로와 리스너 모드를 재현하고, 문서 읽기 횟수(reads)를 센다.
+
+    from benchmarks.fake_firestore import FakeFirestore
+    from firestore_client import set_firestore_client
+
+    db = FakeFirestore()
+    db.collection('personal_dashboard').document('u1').set({'phone': '01000000000', 'role': 'real'})
+    set_firestore_client(db)
+
+async 경로(firestore.AsyncClient)는 같은 데이터를 공유하는 db.async_view()로 재현한다.
+
+    set_async_firestore_client(db.async_view())
+
+latency를 주면 stream/get_all/문서 get 호출마다 그만큼 대기해 서버 왕복 지연을 흉내 낸다.
+"""
+
+import operator
+import threading
+import time
+from datetime import datetime, timezone
+
+_OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+}
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data[field]
+
+
+class FakeDocumentReference:
+    def __init__(self, db, path):
+        self._db = db
+        self.path = path
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        return FakeCollectionReference(self._db, self.path[:-1])
+
+    def collection(self, name):
+        return FakeCollectionReference(self._db, self.path + (name,))
+
+    def get(self, field_paths=None, **kwargs):
+        data = self._db._read(self.path)
+        return FakeSnapshot(self, _project(data, field_paths))
+
+    def set(self, data, merge=False):
+        self._db._write(self.path, data, merge=merge)
+
+    def update(self, data):
+        self._db._write(self.path, data, merge=True)
+
+    def delete(self):
+        self._db._delete(self.path)
+
+
+class FakeQuery:
+    def __init__(self, db, parent_path, collection_id, group=False):
+        self._db = db
+        self._parent_path = parent_path
+        self._collection_id = collection_id
+        self._group = group
+        self._filters = []
+        self._projection = None
+        self._orders = []
+        self._limit = None
+        self._start_after = None
+
+    def _copy(self, **changes):
+        query = FakeQuery(self._db, self._parent_path, self._collection_id, self._group)
+        query._filters = list(self._filters)
+        query._projection = self._projection
+        query._orders = list(self._orders)
+        query._limit = self._limit
+        query._start_after = self._start_after
+        for name, value in changes.items():
+            setattr(query, name, value)
+        return query
+
+    def where(self, field_path=None, op_string=None, value=None, filter=None):
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(_filters=self._filters + [(field_path, op_string, value)])
+
+    def select(self, field_paths):
+        return self._copy(_projection=list(field_paths))
+
+    def order_by(self, field_path, direction="ASCENDING"):
+        return self._copy(_orders=self._orders + [(field_path, direction)])
+
+    def limit(self, count):
+        return self._copy(_limit=count)
+
+    def start_after(self, values):
+        return self._copy(_start_after=values)
+
+    def _matches(self, data):
+        for field_path, op_string, value in self._filters:
+            if field_path not in data:
+                return False
+            if op_string == "in":
+                if data[field_path] not in value:
+                    return False
+            elif not _OPERATORS[op_string](data[field_path], value):
+                return False
+        return True
+
+    def _results(self):
+        docs = []
+        for path, data in self._db._documents_in(self._parent_path, self._collection_id, self._group):
+            if self._matches(data):
+                docs.append((path, data))
+        for field_path, direction in reversed(self._orders or [("__name__", "ASCENDING")]):
+            key = (lambda item: item[0][-1]) if field_path == "__name__" else (lambda item, f=field_path: item[1].get(f))
+            docs.sort(key=key, reverse=str(direction).upper().startswith("DESC"))
+        if self._start_after is not None:
+            cursor = self._start_after.get("__name__") if isinstance(self._start_after, dict) else self._start_after.id
+            cursor_id = cursor.id if hasattr(cursor, "id") else cursor
+            docs = [item for item in docs if item[0][-1] > cursor_id]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return docs
+
+    def stream(self, **kwargs):
+        self._db._round_trip()
+        results = self._results()
+        self._db._count_reads(max(1, len(results)))
+        for path, data in results:
+            yield FakeSnapshot(FakeDocumentReference(self._db, path), _project(data, self._projection))
+
+    def get(self, **kwargs):
+        return list(self.stream())
+
+    def on_snapshot(self, callback):
+        return self._db._add_watch(self, callback)
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db, path):
+        super().__init__(db, path[:-1], path[-1])
+        self.path = path
+        self.id = path[-1]
+
+    @property
+    def parent(self):
+        if len(self.path) < 2:
+            return None
+        return FakeDocumentReference(self._db, self.path[:-1])
+
+    def document(self, document_id):
+        return FakeDocumentReference(self._db, self.path + (document_id,))
+
+
+class FakeWatch:
+    def __init__(self, db, query, callback):
+        self._db = db
+        self._query = query
+        self._callback = callback
+        self.is_active = True
+
+    def _notify(self):
+        if not self.is_active:
+            return
+        docs = [
+            FakeSnapshot(FakeDocumentReference(self._db, path), data)
+            for path, data in self._query._results()
+        ]
+        self._db._count_reads(len(docs))
+        self._callback(docs, [], datetime.now(timezone.utc))
+
+    def unsubscribe(self):
+        self.is_active = False
+        self._db._remove_watch(self)
+
+
+class FakeFirestore:
+    """
+    인메모리 가짜 Firestore 클라이언트. reads는 읽은 문서 수(쿼리 결과가 없으면 1), rpcs는 서버 왕복 횟수.
+
+    Args:
+        latency: 서버 왕복(RPC) 1회당 지연(초)
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self._documents = {}   # path tuple -> dict
+        self._children = {}    # (parent path, collection id) -> {path} (하위 컬렉션 쿼리가 전체를 훑지 않도록)
+        self._watches = []
+        self._lock = threading.RLock()
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    # --- 클라이언트 API ---
+
+    def collection(self, name):
+        return FakeCollectionReference(self, (name,))
+
+    def collection_group(self, collection_id):
+        return FakeQuery(self, (), collection_id, group=True)
+
+    def get_all(self, references, field_paths=None, **kwargs):
+        references = list(references)
+        self._round_trip()
+        self._count_reads(len(references))
+        for reference in references:
+            data = self._documents.get(reference.path)
+            yield FakeSnapshot(reference, _project(data, field_paths))
+
+    def async_view(self):
+        """같은 데이터를 AsyncClient처럼 조회하는 뷰 (stream()이 async 이터레이터)"""
+        return FakeAsyncFirestore(self)
+
+    # --- 테스트 보조 ---
+
+    def drop_listeners(self):
+        """리스너 스트림이 끊긴 상황을 흉내 낸다. (이후 변경은 전달되지 않음)"""
+        with self._lock:
+            for watch in self._watches:
+                watch.is_active = False
+
+    def reset_counters(self):
+        self.reads = 0
+        self.writes = 0
+        self.rpcs = 0
+
+    # --- 내부 ---
+
+    def _round_trip(self):
+        with self._lock:
+            self.rpcs += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _count_reads(self, count):
+        with self._lock:
+            self.reads += count
+
+    def _read(self, path):
+        self._round_trip()
+        with self._lock:
+            self.reads += 1
+            data = self._documents.get(path)
+            return dict(data) if data is not None else None
+
+    def _write(self, path, data, merge=False):
+        with self._lock:
+            current = self._documents.get(path) if merge else None
+            self._documents[path] = {**(current or {}), **data}
+            self._children.setdefault((path[:-2], path[-2]), set()).add(path)
+            self.writes += 1
+            watches = list(self._watches)
+        self._fire(watches, path)
+
+    def _delete(self, path):
+        with self._lock:
+            self._documents.pop(path, None)
+            self._children.get((path[:-2], path[-2]), set()).discard(path)
+            self.writes += 1
+            watches = list(self._watches)
+        self._fire(watches, path)
+
+    def _documents_in(self, parent_path, collection_id, group):
+        with self._lock:
+            if group:
+                items = list(self._documents.items())
+            else:
+                items = [(path, self._documents[path]) for path in self._children.get((parent_path, collection_id), ())]
+        for path, data in items:
+            if len(path) % 2 != 0 or path[-2] != collection_id:
+                continue
+            if not group and path[:-2] != parent_path:
+                continue
+            # 저장된 dict는 제자리에서 바뀌지 않고(_write가 새 dict로 교체) 스냅샷이 to_dict()에서 복사하므로 그대로 넘긴다.
+            yield path, data
+
+    def _add_watch(self, query, callback):
+        watch = FakeWatch(self, query, callback)
+        with self._lock:
+            self._watches.append(watch)
+        watch._notify()
+        return watch
+
+    def _remove_watch(self, watch):
+        with self._lock:
+            if watch in self._watches:
+                self._watches.remove(watch)
+
+    def _fire(self, watches, path):
+        for watch in watches:
+            query = watch._query
+            if path[-2] == query._collection_id and (query._group or path[:-2] == query._parent_path):
+                watch._notify()
+
+
+class FakeAsyncQuery:
+    """FakeQuery를 감싸 stream()을 async 이터레이터로 제공한다."""
+
+    def __init__(self, query):
+        self._query = query
+
+    def __getattr__(self, name):
+        attr = getattr(self._query, name)
+        if name in ("where", "select", "order_by", "limit", "start_after", "collection", "document"):
+            return lambda *args, **kwargs: FakeAsyncQuery(attr(*args, **kwargs))
+        return attr
+
+    async def stream(self, **kwargs):
+        for snapshot in self._query.stream(**kwargs):
+            yield snapshot
+
+    async def get(self, **kwargs):
+        return self._query.get(**kwargs)
+
+
+class FakeAsyncFirestore:
+    def __init__(self, db):
+        self._db = db
+
+    def collection(self, name):
+        return FakeAsyncQuery(self._db.collection(name))
+
+    def collection_group(self, collection_id):
+        return FakeAsyncQuery(self._db.collection_group(collection_id))
+
+
+def _project(data, field_paths):
+    if data is None or field_paths is None:
+        return dict(data) if data is not None else None
+    field_paths = [field for field in field_paths if field != "__name__"]
+    return {field: data[field] for field in field_paths if field in data}
@@ -0,0 +1,186 @@
+"""benchmarks/load_test.py
+동기/비동기 엔드포인트 부하 테스트
+----------------------------------
+스텁 SOLAPI 서버(benchmarks.stub_provider)와 uvicorn 앱 서버를 각각 별도 프로세스로 띄우고,
+동시 발송 요청을 보내면서 같은 시간 동안 헬스체크 응답 지연을 측정한다.
+
+- sync : 기존 방식 (def 엔드포인트 + SDK 동기 발송, 스레드풀에서 실행)
+- async: async def 엔드포인트 + async_solapi_client (연결 풀 재사용)
+
+    python -m benchmarks.load_test --requests 2000 --concurrency 200 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+_PHONE = "01012345678"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"port {port} did not open within {timeout}s")
+
+
+def _bench_env(tmp: str, stub_url: str) -> dict:
+    """앱 서버 프로세스 환경: 임시 파일 경로와 스텁 서버 주소를 지정한다."""
+    env = dict(os.environ)
+    env.setdefault("SOLAPI_API_KEY", "bench")
+    env.setdefault("SOLAPI_API_SECRET", "bench")
+    env.setdefault("SENDER_PHONE", "01000000000")
+    env.update({
+        "SOLAPI_BASE_URL": stub_url,
+        "SLACK_WEBHOOK_URL": f"{stub_url}/slack",
+        "SLACK_SPILL_FILE": "",
+        "RECIPIENT_BACKEND": "sqlite",
+        "RECIPIENT_DB": os.path.join(tmp, "recipients.db"),
+        "OUTBOX_DB": os.path.join(tmp, "outbox.db"),
+        "USAGE_ROLLUP_DB": os.path.join(tmp, "usage_rollup.db"),
+    })
+    return env
+
+
+def _serve(port: int) -> None:
+    """앱 서버 프로세스: 비교용 동기 엔드포인트를 추가한 main.app을 실행한다."""
+    import uvicorn
+
+    import main
+    from sms_sender import send_sms
+
+    app = main.app
+    # 스케줄러/outbox 워커는 이 측정과 무관하므로 시작하지 않는다.
+    app.router.on_startup.clear()
+    main.recipient_store.add(_PHONE)
+
+    # 비교용: 변경 전과 같은 동기(def) 엔드포인트
+    @app.post("/bench/sync/send/{phone}")
+    def sync_send(phone: str, payload: main.MessageBody):
+        return send_sms(phone, payload.body)
+
+    @app.get("/bench/sync/health")
+    def sync_health():
+        return {"status": "ok"}
+
+    uvicorn.run(app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def _percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def _run(base_url: str, mode: str, total: int, concurrency: int) -> dict:
+    send_path = "/bench/sync/send/" if mode == "sync" else "/send/"
+    health_path = "/bench/sync/health" if mode == "sync" else "/"
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    send_latencies, health_latencies = [], []
+    remaining = total
+    errors = 0
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        done = asyncio.Event()
+
+        async def sender():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await client.post(f"{send_path}{_PHONE}", json={"body": "load test"})
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                send_latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        async def health_checker():
+            while not done.is_set():
+                started = time.perf_counter()
+                await client.get(health_path)
+                health_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(0.01)
+
+        checker = asyncio.create_task(health_checker())
+        started = time.perf_counter()
+        await asyncio.gather(*(sender() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await checker
+
+    return {
+        "mode": mode,
+        "elapsed": elapsed,
+        "throughput": total / elapsed,
+        "send_p50": _percentile(send_latencies, 0.50),
+        "send_p99": _percentile(send_latencies, 0.99),
+        "health_p50": _percentile(health_latencies, 0.50),
+        "health_p99": _percentile(health_latencies, 0.99),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="동기/비동기 엔드포인트 부하 테스트")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.05, help="스텁 SOLAPI 응답 지연(초)")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--serve", type=int, metavar="PORT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        _serve(args.serve)
+        return
+
+    stub_port, app_port = _free_port(), _free_port()
+    with tempfile.TemporaryDirectory() as tmp:
+        stub = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.stub_provider", "--port", str(stub_port), "--latency", str(args.latency)],
+        )
+        server = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.load_test", "--serve", str(app_port)],
+            env=_bench_env(tmp, f"http://127.0.0.1:{stub_port}"),
+        )
+        try:
+            _wait_for_port(stub_port)
+            _wait_for_port(app_port)
+            modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+            for mode in modes:
+                result = asyncio.run(_run(f"http://127.0.0.1:{app_port}", mode, args.requests, args.concurrency))
+                print(
+                    f"{result['mode']:<6} {result['throughput']:8.1f} req/s "
+                    f"send p50={result['send_p50'] * 1000:7.1f}ms p99={result['send_p99'] * 1000:7.1f}ms "
+                    f"health p50={result['health_p50'] * 1000:7.1f}ms p99={result['health_p99'] * 1000:7.1f}ms "
+                    f"errors={result['errors']}",
+                    flush=True,
+                )
+        finally:
+            for process in (server, stub):
+                process.send_signal(signal.SIGINT)
+                process.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
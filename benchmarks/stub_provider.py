@@ -0,0 +1,221 @@
+"""benchmarks/stub_provider.py
+로컬 스텁 SOLAPI / Slack 서버
+------------------------------
+실제 SOLAPI와 Slack 대신 부하 테스트/벤치마크에서 사용하는 로컬 HTTP 서버.
+
+- POST /messages/v4/send-many/detail : SendMessageResponse 형식으로 응답 (SOLAPI_BASE_URL로 지정)
+- POST /slack                        : Slack Incoming Webhook처럼 "ok" 응답 (SLACK_WEBHOOK_URL로 지정)
+
+latency로 요청당 응답 지연을, error_rate로 5xx 응답 비율을, fail_rate로 메시지별 접수 실패 비율을 조절한다.
+reject_rate로 요청 단위 4xx 거절 비율을 조절한다. (상태 코드는 reject_status, 기본 429 = 요청 한도 초과)
+
+    with StubProvider(latency=0.05) as stub:
+        os.environ["SOLAPI_BASE_URL"] = stub.solapi_url
+
+부하 테스트에서는 측정 대상과 GIL을 나눠 쓰지 않도록 별도 프로세스로 실행한다.
+
+    python -m benchmarks.stub_provider --port 9100 --latency 0.05
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+__all__ = ["StubProvider"]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # 동시 연결이 몰려도 연결이 거부되지 않도록 listen backlog 확대
+
+    def handle_error(self, request, client_address):
+        # 벤치마크 프로세스가 Slack 전송 도중 종료되어 연결이 끊긴 경우는 정상 종료로 본다.
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def _group_info(total: int, failed: int) -> dict:
+    now = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+    cash = {"requested": 0, "replacement": 0, "refund": 0, "sum": 0}
+    return {
+        "count": {
+            "total": total, "sentTotal": 0, "sentSuccess": 0, "sentPending": 0, "sentReplacement": 0,
+            "refund": 0, "registeredFailed": failed, "registeredSuccess": total - failed,
+        },
+        "countForCharge": {},
+        "balance": cash,
+        "point": cash,
+        "app": {},
+        "log": [],
+        "status": "SENDING",
+        "allowDuplicates": True,
+        "isRefunded": False,
+        "accountId": "stub",
+        "masterAccountId": None,
+        "apiVersion": "4",
+        "groupId": f"G{uuid.uuid4().hex[:20].upper()}",
+        "price": {},
+        "dateCreated": now,
+        "dateUpdated": now,
+    }
+
+
+class StubProvider:
+    """
+    스텁 SOLAPI/Slack 서버를 백그라운드 스레드에서 실행한다.
+
+    Args:
+        latency: 요청당 응답 지연(초)
+        error_rate: 요청 단위 5xx 응답 비율 (네트워크/서버 장애 재현)
+        fail_rate: 메시지 단위 접수 실패 비율 (failedMessageList로 응답)
+        reject_rate: 요청 단위 4xx 거절 비율 (SOLAPI 오류 응답 형식, 접수하지 않음)
+        reject_status: 거절 응답의 HTTP 상태 코드 (기본 429)
+        seed: 난수 시드
+        port: 수신 포트 (0이면 임의의 빈 포트)
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, fail_rate: float = 0.0, seed: int = 42,
+                 port: int = 0, reject_rate: float = 0.0, reject_status: int = 429):
+        self.port = port
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fail_rate = fail_rate
+        self.reject_rate = reject_rate
+        self.reject_status = reject_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.messages = 0
+        self.slack_posts = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def solapi_url(self) -> str:
+        return self.url
+
+    @property
+    def slack_url(self) -> str:
+        return f"{self.url}/slack"
+
+    def _random(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def _send_many(self, payload: dict):
+        if self.error_rate and self._random() < self.error_rate:
+            return 500, "stub server error"
+        if self.reject_rate and self._random() < self.reject_rate:
+            # errorCode는 고정값: 재시도 여부는 상태 코드로만 판단해야 한다.
+            return self.reject_status, {"errorCode": "StubRejected", "errorMessage": "stub rejected request"}
+        messages = payload.get("messages", [])
+        with self._lock:
+            self.requests += 1
+            self.messages += len(messages)
+        message_list, failed_list = [], []
+        for message in messages:
+            message_id = f"M{uuid.uuid4().hex[:20].upper()}"
+            if self.fail_rate and self._random() < self.fail_rate:
+                failed_list.append({
+                    "to": message.get("to"), "from": message.get("from"), "type": "SMS",
+                    "statusMessage": "stub rejected", "country": "82", "messageId": message_id,
+                    "statusCode": "1062", "accountId": "stub", "customFields": message.get("customFields"),
+                })
+            else:
+                message_list.append({
+                    "messageId": message_id, "statusCode": "2000", "statusMessage": "정상 접수",
+                    "customFields": message.get("customFields"),
+                })
+        return 200, {
+            "groupInfo": _group_info(len(messages), len(failed_list)),
+            "messageList": message_list,
+            "failedMessageList": failed_list,
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # keep-alive 연결에서 헤더/본문 분할 전송 시 delayed ACK 지연 방지
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if self.path.startswith("/slack"):
+                    with stub._lock:
+                        stub.slack_posts += 1
+                    return self._reply(200, "ok")
+                if self.path.startswith("/messages/v4/send-many"):
+                    return self._reply(*stub._send_many(json.loads(body or b"{}")))
+                return self._reply(404, {"errorCode": "NotFound", "errorMessage": self.path})
+
+            def _reply(self, status, payload):
+                data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "text/plain" if isinstance(payload, str) else "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StubProvider":
+        self._server = _Server(("127.0.0.1", self.port), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-provider", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 스텁 SOLAPI/Slack 서버")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--reject-rate", type=float, default=0.0)
+    parser.add_argument("--reject-status", type=int, default=429)
+    args = parser.parse_args()
+
+    stub = StubProvider(args.latency, args.error_rate, args.fail_rate, port=args.port,
+                        reject_rate=args.reject_rate, reject_status=args.reject_status)
+    stub.start()
+    print(f"stub provider: {stub.url} (SLACK_WEBHOOK_URL={stub.slack_url})", flush=True)
+    try:
+        stub._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"stub: requests={stub.requests} messages={stub.messages} slack_posts={stub.slack_posts}", flush=True)
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""benchmarks/suite.py
+배포 전 회귀 확인용 벤치마크 모음
+--------------------------------
+실제 SMS를 보내지 않고 발송/조회 경로의 처리량을 잰다.
+
+- SOLAPI/Slack: 스텁 서버(benchmarks.stub_provider)를 별도 프로세스로 띄운다. (--latency/--error-rate/--fail-rate/--reject-rate)
+- Firestore  : 인메모리 가짜 Firestore(benchmarks.fake_firestore)에 사용자 N명과 당일 세션을 만든다. (--rpc-latency)
+
+시나리오 x 사용자 수마다 새 프로세스에서 1회 실행하므로 peak RSS가 실행별로 분리된다.
+
+- broadcast: 사용자 N명을 수신자로 등록하고 sms_sender.broadcast() 1회 (outbox 경유)
+- send     : POST /send/{phone} (min(N, --max-requests)건, --concurrency 동시)
+- firestore: /firestore/... 조회 엔드포인트 4종을 번갈아 min(N, --max-requests)건
+- morning / evening: 오전/오후 사용량 알림 캠페인 1회 (스케줄러 작업과 같은 run_campaign 경로)
+
+보고 항목: 처리량(msgs/s, firestore는 req/s), 지연 p50/p99, peak RSS, Firestore 문서 읽기 수.
+지연은 HTTP 시나리오(send/firestore)는 요청 1건의 응답 시간, 나머지는 SOLAPI 요청(그룹 발송) 1건의 시간이다.
+
+    python -m benchmarks.suite --sizes 100,1000,10000,100000 --output results.json
+    python -m benchmarks.suite --baseline results.json --tolerance 0.2   # 20% 넘게 나빠지면 종료 코드 1
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.load_test import _bench_env, _free_port, _percentile, _wait_for_port
+
+SCENARIOS = ("broadcast", "send", "firestore", "morning", "evening")
+_CAMPAIGNS = {"morning": "morning_usage_notification", "evening": "evening_usage_notification"}
+
+# 회귀 판정 항목: (결과 키, 클수록 좋은지)
+_CHECKS = (("throughput", True), ("p99", False), ("peak_rss_mb", False), ("firestore_reads", False))
+
+
+# -------------------------
+# 측정 프로세스 (--run)
+# -------------------------
+
+def _sent_total() -> float:
+    from sms_sender import sms_messages_sent
+    return sum(child.get() for _, child in sms_messages_sent._items())
+
+
+def _record_send_latencies():
+    """solapi_send_duration_seconds 기록을 가로채 SOLAPI 요청(단일/그룹)별 지연(초)을 모은다."""
+    from sms_sender import solapi_send_seconds
+
+    samples = []
+    for _, child in solapi_send_seconds._items():
+        def recording(value, observe=child.observe):
+            samples.append(value)
+            observe(value)
+        child.observe = recording
+    return samples
+
+
+async def _drive(app, paths, concurrency: int, method: str = "GET", json_body=None):
+    """앱에 ASGI로 직접 요청을 보내고 요청별 지연(초)과 오류 수를 반환한다. (네트워크/uvicorn 비용 제외)"""
+    import httpx
+
+    latencies, errors = [], 0
+    pending = iter(paths)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+        async def worker():
+            nonlocal errors
+            for path in pending:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=json_body)
+                    ok = response.status_code == 200
+                except httpx.HTTPError:
+                    ok = False
+                latencies.append(time.perf_counter() - started)
+                errors += not ok
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+def _firestore_paths(users: int, count: int, today: str):
+    """조회 엔드포인트 4종(페이지/사용자/필드 필터/사용량)을 사용자 전체에 고르게 퍼뜨린 경로 목록"""
+    step = max(1, users // max(1, count))
+    for request in range(count):
+        user_id = f"user{(request * step) % users:06d}"
+        kind = request % 4
+        if kind == 0:
+            yield f"/firestore/personal_dashboard?limit=100&start_after={user_id}"
+        elif kind == 1:
+            yield f"/firestore/personal_dashboard/user/{user_id}"
+        elif kind == 2:
+            yield f"/firestore/personal_dashboard/filter?field_name=name&field_value=사용자{(request * step) % users}"
+        else:
+            yield f"/firestore/user/{user_id}/usage?start_date={today}&end_date={today}"
+
+
+def _run(scenario: str, users: int, args) -> dict:
+    # 환경 변수를 정한 뒤에 앱 모듈을 불러온다. (부모 프로세스가 _bench_env로 지정)
+    import main
+    from benchmarks.bench_usage_notification import _seed
+    from benchmarks.fake_firestore import FakeFirestore
+    from campaigns import KST, campaigns, run_campaign
+    from firestore_client import set_async_firestore_client, set_firestore_client
+    from outbox import outbox
+    from sms_sender import broadcast
+
+    now_kst = datetime.now(KST)
+    db = FakeFirestore(latency=args.rpc_latency)
+    _seed(db, users, now_kst)
+    set_firestore_client(db)
+    set_async_firestore_client(db.async_view())
+    phones = [f"010{index:08d}" for index in range(users)]
+    if scenario in ("broadcast", "send"):
+        main.recipient_store.add_many(phones)
+    db.reset_counters()
+
+    send_latencies = _record_send_latencies()
+    latencies, errors, operations = None, 0, None
+    sent_before = _sent_total()
+    started = time.perf_counter()
+    try:
+        if scenario == "broadcast":
+            results = broadcast("benchmark")
+            errors = sum(1 for result in results if result["status"] != "success")
+        elif scenario == "send":
+            count = min(users, args.max_requests)
+            paths = (f"/send/{phones[index * users // count]}" for index in range(count))
+            latencies, errors = asyncio.run(
+                _drive(main.app, paths, args.concurrency, method="POST", json_body={"body": "benchmark"})
+            )
+        elif scenario == "firestore":
+            count = min(users, args.max_requests)
+            paths = _firestore_paths(users, count, now_kst.strftime("%Y-%m-%d"))
+            latencies, errors = asyncio.run(_drive(main.app, paths, args.concurrency))
+            operations = count
+        else:
+            result = run_campaign(campaigns[_CAMPAIGNS[scenario]])
+            errors = result["failed"]
+        elapsed = time.perf_counter() - started
+    finally:
+        outbox.stop()
+
+    sent = _sent_total() - sent_before
+    if operations is None:
+        operations = sent
+    if latencies is None:
+        latencies = send_latencies
+    return {
+        "scenario": scenario,
+        "users": users,
+        "elapsed": elapsed,
+        "operations": operations,
+        "messages": sent,
+        "errors": errors,
+        "throughput": operations / elapsed if elapsed else 0.0,
+        "p50": _percentile(latencies, 0.50),
+        "p99": _percentile(latencies, 0.99),
+        # Linux의 ru_maxrss 단위는 KiB
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "firestore_reads": db.reads,
+        "firestore_rpcs": db.rpcs,
+    }
+
+
+# -------------------------
+# 실행/보고 (부모 프로세스)
+# -------------------------
+
+def _format_row(result: dict) -> str:
+    unit = "req/s" if result["scenario"] == "firestore" else "msg/s"
+    return (
+        f"{result['scenario']:<10} users={result['users']:<7} elapsed={result['elapsed']:8.2f}s "
+        f"{result['throughput']:9.1f} {unit} "
+        f"p50={result['p50'] * 1000:7.1f}ms p99={result['p99'] * 1000:7.1f}ms "
+        f"rss={result['peak_rss_mb']:7.1f}MB reads={result['firestore_reads']:<7} errors={result['errors']}"
+    )
+
+
+def _regressions(results, baseline, tolerance: float):
+    """기준 결과보다 tolerance 비율을 넘게 나빠진 항목 목록"""
+    previous = {(entry["scenario"], entry["users"]): entry for entry in baseline}
+    found = []
+    for result in results:
+        before = previous.get((result["scenario"], result["users"]))
+        if before is None:
+            continue
+        for key, higher_is_better in _CHECKS:
+            old, new = before.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (-change if higher_is_better else change) > tolerance:
+                found.append(f"{result['scenario']} users={result['users']} {key}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return found
+
+
+def _child_env(tmp: str, stub_url: str, args) -> dict:
+    env = _bench_env(tmp, stub_url)
+    env.update({
+        "SCHEDULER_COORDINATION": "none",
+        "CAMPAIGN_SNAPSHOT_CAPTURE": "false",
+        # 스텁의 일시적 오류는 바로 재시도해 측정 시간이 재시도 대기로 늘어나지 않게 한다.
+        "OUTBOX_RETRY_BASE_SECONDS": "0.05",
+        "OUTBOX_WAIT_TIMEOUT": str(args.timeout),
+    })
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description="발송/조회 경로 벤치마크 모음 (스텁 SOLAPI/Slack, 가짜 Firestore)")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="사용자 수 목록 (쉼표 구분)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"실행할 시나리오 ({','.join(SCENARIOS)})")
+    parser.add_argument("--latency", type=float, default=0.05, help="스텁 SOLAPI 응답 지연(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="스텁 SOLAPI 5xx 응답 비율")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="스텁 SOLAPI 메시지별 접수 실패 비율")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="스텁 SOLAPI 요청 한도 초과(429) 응답 비율")
+    parser.add_argument("--rpc-latency", type=float, default=0.0, help="가짜 Firestore RPC당 지연(초)")
+    parser.add_argument("--concurrency", type=int, default=100, help="HTTP 시나리오 동시 요청 수")
+    parser.add_argument("--max-requests", type=int, default=1000, help="HTTP 시나리오 최대 요청 수")
+    parser.add_argument("--timeout", type=float, default=3600, help="실행 1회 제한 시간(초)")
+    parser.add_argument("--output", help="결과를 JSON으로 저장할 파일")
+    parser.add_argument("--baseline", help="비교할 이전 --output 결과 파일")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="회귀로 판정할 악화 비율")
+    parser.add_argument("--run", choices=SCENARIOS, help=argparse.SUPPRESS)
+    parser.add_argument("--users", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        result = _run(args.run, args.users, args)
+        with open(args.result_file, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"알 수 없는 시나리오: {', '.join(sorted(unknown))}")
+    child_options = [
+        "--rpc-latency", str(args.rpc_latency), "--concurrency", str(args.concurrency),
+        "--max-requests", str(args.max_requests), "--timeout", str(args.timeout),
+    ]
+
+    stub_port = _free_port()
+    stub = subprocess.Popen([
+        sys.executable, "-m", "benchmarks.stub_provider", "--port", str(stub_port), "--latency", str(args.latency),
+        "--error-rate", str(args.error_rate), "--fail-rate", str(args.fail_rate),
+        "--reject-rate", str(args.reject_rate),
+    ])
+    results = []
+    try:
+        _wait_for_port(stub_port)
+        for users in sizes:
+            for scenario in scenarios:
+                # 실행마다 새 임시 디렉터리(수신자/outbox DB)와 새 프로세스를 사용한다.
+                with tempfile.TemporaryDirectory() as tmp:
+                    result_file = os.path.join(tmp, "result.json")
+                    subprocess.run(
+                        [sys.executable, "-m", "benchmarks.suite", "--run", scenario, "--users", str(users),
+                         "--result-file", result_file, *child_options],
+                        env=_child_env(tmp, f"http://127.0.0.1:{stub_port}", args),
+                        check=True, timeout=args.timeout + 60,
+                    )
+                    with open(result_file, encoding="utf-8") as f:
+                        result = json.load(f)
+                results.append(result)
+                print(_format_row(result), flush=True)
+    finally:
+        stub.send_signal(signal.SIGINT)
+        stub.wait(timeout=30)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = _regressions(results, json.load(f), args.tolerance)
+        for line in found:
+            print(f"REGRESSION {line}", flush=True)
+        if found:
+            return 1
+        print(f"기준 결과 대비 {args.tolerance:.0%} 넘게 나빠진 항목 없음", flush=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+"""cache.py
+Firestore 조회용 read-through 캐시
+-----------------------------------
+(컬렉션, 조회 조건) 단위로 결과를 보관하는 TTL + LRU 캐시.
+- 컬렉션(namespace)별 TTL을 지정할 수 있고, TTL이 0 이하인 컬렉션은 캐시하지 않는다.
+- 최대 항목 수나 대략적인 메모리 예산(바이트)을 넘으면 가장 오래 사용되지 않은 항목부터 제거한다.
+- 값 하나가 항목당 상한을 넘으면(큰 컬렉션 전체 조회 등) 저장하지 않고 그대로 반환한다.
+- 같은 키에 대한 동시 miss는 한 번만 조회하고 나머지는 그 결과를 기다린다.
+
+캐시된 값은 여러 요청이 공유하므로 호출 측에서 수정하지 않는다.
+"""
+
+import asyncio
+import functools
+import inspect
+import sys
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from config import settings
+from metrics import register_collector
+
+__all__ = ["TTLCache", "firestore_cache", "read_through"]
+
+
+class _Pending:
+    """진행 중인 조회. 같은 키를 기다리는 요청들이 결과를 공유한다."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+def _approx_size(value: Any, limit: int) -> int:
+    """
+    값의 대략적인 메모리 크기(바이트). dict/list/tuple/set을 따라가며 sys.getsizeof를 더하고(공유 객체는 한 번만),
+    limit을 넘으면 더 세지 않고 그때까지의 합을 반환한다. (그 밖의 객체는 자신의 크기만 셈)
+    """
+    total = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        if total > limit:
+            break
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+    return total
+
+
+class TTLCache:
+    def __init__(self, max_entries: int, default_ttl: float, ttls: Optional[Dict[str, float]] = None,
+                 max_bytes: int = 0, max_value_bytes: int = 0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.ttls = dict(ttls or {})
+        self.max_bytes = max_bytes                  # 전체 값 크기 예산 (0이면 제한 없음)
+        # 항목 하나의 크기 상한 (0이면 제한 없음). 전체 예산보다 큰 값은 저장할 수 없으므로 예산으로 제한
+        self.max_value_bytes = min(filter(None, (max_value_bytes, max_bytes)), default=0)
+        self._entries = OrderedDict()   # (namespace, key) -> (expires_at, value, size)
+        self._bytes = 0
+        self._pending = {}              # (namespace, key) -> _Pending
+        self._async_pending = {}        # (namespace, key) -> asyncio.Future
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "oversized": 0})
+
+    def ttl_for(self, namespace: str) -> float:
+        return self.ttls.get(namespace, self.default_ttl)
+
+    def get_or_load(self, namespace: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """캐시에 유효한 값이 있으면 반환하고, 없으면 loader()로 조회해 저장한다."""
+        ttl = self.ttl_for(namespace)
+        if ttl <= 0:
+            return loader()
+
+        cache_key = (namespace, key)
+        with self._lock:
+            stats = self._stats[namespace]
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    stats["hits"] += 1
+                    return entry[1]
+                self._remove(cache_key)
+
+            pending = self._pending.get(cache_key)
+            if pending is not None:
+                stats["coalesced"] += 1
+                owner = False
+            else:
+                stats["misses"] += 1
+                pending = self._pending[cache_key] = _Pending()
+                owner = True
+
+        if not owner:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        try:
+            pending.value = loader()
+        except BaseException as e:
+            pending.error = e
+            raise
+        else:
+            self._store(namespace, cache_key, ttl, pending.value)
+            return pending.value
+        finally:
+            with self._lock:
+                self._pending.pop(cache_key, None)
+            pending.event.set()
+
+    async def get_or_load_async(self, namespace: str, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        get_or_load의 비동기 버전. 이벤트 루프를 막지 않도록 같은 키의 동시 miss는
+        asyncio.Future로 기다린다. (항목/통계는 동기 경로와 공유)
+        """
+        ttl = self.ttl_for(namespace)
+        if ttl <= 0:
+            return await loader()
+
+        cache_key = (namespace, key)
+        with self._lock:
+            stats = self._stats[namespace]
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(cache_key)
+                    stats["hits"] += 1
+                    return entry[1]
+                self._remove(cache_key)
+
+            pending = self._async_pending.get(cache_key)
+            if pending is not None and not pending.done():
+                stats["coalesced"] += 1
+                owner = False
+            else:
+                stats["misses"] += 1
+                pending = self._async_pending[cache_key] = asyncio.get_running_loop().create_future()
+                owner = True
+
+        if not owner:
+            return await asyncio.shield(pending)
+
+        try:
+            value = await loader()
+        except BaseException as e:
+            pending.set_exception(e)
+            # 기다리는 요청이 없어도 "exception was never retrieved" 경고가 남지 않도록 처리
+            pending.exception()
+            raise
+        else:
+            self._store(namespace, cache_key, ttl, value)
+            pending.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                if self._async_pending.get(cache_key) is pending:
+                    del self._async_pending[cache_key]
+
+    def _remove(self, cache_key: tuple) -> None:
+        """항목을 제거한다. (self._lock 보유 상태에서 호출)"""
+        entry = self._entries.pop(cache_key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _store(self, namespace: str, cache_key: tuple, ttl: float, value: Any) -> None:
+        # 크기 추정은 값 전체를 훑으므로 잠금 밖에서 한다. (제한이 없으면 생략)
+        size = _approx_size(value, self.max_value_bytes) if self.max_value_bytes else 0
+        with self._lock:
+            self._remove(cache_key)
+            if self.max_value_bytes and size > self.max_value_bytes:
+                self._stats[namespace]["oversized"] += 1
+                return
+            self._entries[cache_key] = (time.monotonic() + ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                (evicted_namespace, _), evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted[2]
+                self._stats[evicted_namespace]["evictions"] += 1
+
+    def invalidate(self, namespace: Optional[str] = None) -> int:
+        """namespace의 항목(지정하지 않으면 전체)을 제거하고 제거된 수를 반환한다."""
+        with self._lock:
+            if namespace is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self._bytes = 0
+                return removed
+            keys = [cache_key for cache_key in self._entries if cache_key[0] == namespace]
+            for cache_key in keys:
+                self._remove(cache_key)
+            return len(keys)
+
+    def stats(self) -> dict:
+        with self._lock:
+            namespaces = {namespace: dict(values) for namespace, values in self._stats.items()}
+            size = len(self._entries)
+            size_bytes = self._bytes
+        totals = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "oversized": 0}
+        for values in namespaces.values():
+            for name in totals:
+                totals[name] += values[name]
+        return {
+            **totals,
+            "size": size,
+            "max_entries": self.max_entries,
+            "bytes": size_bytes,
+            "max_bytes": self.max_bytes,
+            "max_value_bytes": self.max_value_bytes,
+            "namespaces": namespaces,
+        }
+
+
+firestore_cache = TTLCache(
+    max_entries=settings.firestore_cache_max_entries,
+    default_ttl=settings.firestore_cache_default_ttl,
+    ttls=settings.firestore_cache_ttls,
+    max_bytes=settings.firestore_cache_max_bytes,
+    max_value_bytes=settings.firestore_cache_max_value_bytes,
+)
+
+
+def read_through(namespace):
+    """
+    함수 결과를 firestore_cache에 보관하는 데코레이터.
+
+    Args:
+        namespace: 컬렉션 이름 문자열, 또는 함수 인자를 받아 컬렉션 이름을 돌려주는 callable
+
+    async 함수에 붙이면 get_or_load_async를 사용하는 async 래퍼를 만든다.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                name = namespace(*args, **kwargs) if callable(namespace) else namespace
+                key = (func.__name__, args, tuple(sorted(kwargs.items())))
+                return await firestore_cache.get_or_load_async(name, key, lambda: func(*args, **kwargs))
+            async_wrapper.uncached = func
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            name = namespace(*args, **kwargs) if callable(namespace) else namespace
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            return firestore_cache.get_or_load(name, key, lambda: func(*args, **kwargs))
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def _collect_metrics():
+    stats = firestore_cache.stats()
+    namespaces = stats["namespaces"]
+    for name, documentation in (
+        ("hits", "캐시에서 바로 응답한 조회 수"),
+        ("misses", "Firestore를 조회한 캐시 miss 수"),
+        ("coalesced", "진행 중인 같은 조회에 합류한 요청 수"),
+        ("evictions", "용량(항목 수/바이트 예산) 초과로 밀려난 항목 수"),
+        ("oversized", "항목당 크기 상한을 넘어 저장하지 않은 조회 수"),
+    ):
+        yield (f"firestore_cache_{name}_total", "counter", documentation,
+               [({"namespace": namespace}, values[name]) for namespace, values in namespaces.items()])
+    yield ("firestore_cache_entries", "gauge", "캐시에 저장된 항목 수", [({}, stats["size"])])
+    yield ("firestore_cache_bytes", "gauge", "캐시에 저장된 값의 대략적인 크기(바이트)", [({}, stats["bytes"])])
+
+
+register_collector(_collect_metrics)
@@ -0,0 +1,847 @@
+"""campaigns.py
+사용량 알림 캠페인 파이프라인
+----------------------------
+정기 사용량 알림은 캠페인 정의(발송 시각, 대상 날짜, role, 기준 시간, 메시지 템플릿)만 다르고 처리 과정은 같다.
+run_campaign()은 모든 캠페인을 같은 단계로 처리한다.
+
+    명단 조회 -> 참여 기간 필터 -> 사용량 조회 -> 기준 시간 판정 -> 메시지 생성 -> 발송 -> 결과 보고
+
+각 단계는 사용자 목록(청크) 단위로 동작하며, 사용량 조회/판정·생성/발송은 run_engine이 청크로 나눠 겹쳐서 처리한다.
+캠페인은 DEFAULT_CAMPAIGNS(오전 7시 전날 / 오후 7시 당일 사용량 알림)를 기본으로 하고,
+CAMPAIGNS_FILE(JSON 목록)을 지정하면 그 정의를 사용하므로 알림 시각이나 기준을 코드 수정 없이 추가/변경할 수 있다.
+
+    [{"name": "noon_usage_notification", "hour": 12, "day_offset": 0, "threshold_seconds": 3600,
+      "templates": {"used": "{username}님, 오늘 {formatted} 사용하셨어요.", "unused": "{username}님, 오늘도 화이팅!"}}]
+
+멱등 키와 outbox broadcast_id는 실행 ID(run_id)로 구분한다. 스케줄러 실행은 "캠페인:대상 날짜"를 쓰므로
+같은 날짜의 정기 실행은 한 번만 발송되고, 수동(테스트) 실행은 "manual:..." ID를 받아 정기 실행의 멱등 키를 쓰지 않는다.
+
+실행마다 단계별 소요 시간을 기록하고, 실행 입력(명단, 사용량, 실행 시각)을 스냅샷으로 저장한다.
+- dry_run_campaign: 실제 Firestore 데이터로 전체 파이프라인을 실행하되 발송은 NullSink로 보낸다.
+- replay_campaign: 지난 실행의 스냅샷으로 같은 입력을 다시 실행해 성능 변화를 비교한다.
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+import pytz
+
+from config import settings
+from coordination import shard_of
+from firestore_client import build_total_usage, get_users_with_phone
+from logging_setup import log_context
+from metrics import registry
+from outbox import outbox
+from run_engine import run_engine
+from slack_logger import slack_logger
+from usage_rollup import get_daily_totals
+
+if TYPE_CHECKING:
+    from apscheduler.triggers.cron import CronTrigger
+
+__all__ = [
+    "Campaign", "DEFAULT_CAMPAIGNS", "load_campaigns", "RunTrace", "LiveSource", "RosterSource", "SnapshotSource",
+    "OutboxSink", "NullSink", "scheduled_run_id", "shard_rosters", "save_snapshot", "load_snapshot", "list_snapshots", "run_campaign", "dry_run_campaign",
+    "replay_campaign", "campaigns",
+]
+
+logger = logging.getLogger(__name__)
+
+# 한국 시간대 명시적 설정
+KST = pytz.timezone('Asia/Seoul')
+
+# 기본 캠페인: 기존 오전/오후 사용량 알림
+DEFAULT_CAMPAIGNS = [
+    {
+        "name": "morning_usage_notification",
+        "hour": 7,
+        "minute": 0,
+        "day_offset": -1,
+        "role": "real",
+        "threshold_seconds": 7200,
+        "log_tag": "Morning Scheduler",
+        "day_label": "전날",
+        "templates": {
+            "used": "{username}님, 어제 {formatted} 동안 사용하셨네요. 오늘은 조금만 더 힘내봐요! 💪",
+            "unused": "{username}님, 어제는 앱을 사용하지 않으셨네요. 오늘은 앱을 꼭 사용해보세요! 💻",
+        },
+    },
+    {
+        "name": "evening_usage_notification",
+        "hour": 19,
+        "minute": 0,
+        "day_offset": 0,
+        "role": "real",
+        "threshold_seconds": 7200,
+        "log_tag": "Evening Scheduler",
+        "day_label": "당일",
+        "templates": {
+            "used": "{username}님, 오늘 현재까지 {formatted} 사용하셨어요. 남은 시간도 화이팅! 🔥",
+            "unused": "{username}님, 오늘은 아직 앱을 사용하지 않으셨네요. 지금부터 어플 실행 어떠세요? 💪",
+        },
+    },
+]
+
+
+class Campaign:
+    """
+    사용량 알림 캠페인 정의
+
+    Args:
+        name: 캠페인 이름 (실행 ID/멱등 키 접두어, 예: morning_usage_notification)
+        hour, minute: 발송 시각 (KST)
+        day_offset: 발송일 기준 사용량 대상 날짜 (-1이면 전날, 0이면 당일)
+        role: 대상 사용자 role
+        threshold_seconds: 대상 날짜 사용 시간이 이 값 미만인 사용자에게만 발송
+        templates: {"used": 사용 기록이 있을 때, "unused": 사용 기록이 없을 때} 메시지 템플릿
+                   ({username}, {formatted}, {total_seconds}, {target_date} 사용 가능)
+        log_tag: 실행 로그에 표시할 이름 (구조화 로그의 log_tag 필드)
+        day_label: 로그에 표시할 대상 날짜 이름 (전날/당일)
+        enabled: False면 스케줄에 등록하지 않음
+    """
+
+    def __init__(self, name: str, hour: int, minute: int = 0, day_offset: int = 0, role: str = "real",
+                 threshold_seconds: float = 7200, templates: Optional[Dict[str, str]] = None,
+                 log_tag: Optional[str] = None, day_label: Optional[str] = None, enabled: bool = True):
+        if not name:
+            raise ValueError("캠페인 name이 필요합니다.")
+        templates = templates or {}
+        if not templates.get("used") or not templates.get("unused"):
+            raise ValueError(f"캠페인 {name}: templates.used / templates.unused가 필요합니다.")
+        if not (0 <= int(hour) <= 23 and 0 <= int(minute) <= 59):
+            raise ValueError(f"캠페인 {name}: 발송 시각이 올바르지 않습니다. ({hour}:{minute})")
+        self.name = name
+        self.hour = int(hour)
+        self.minute = int(minute)
+        self.day_offset = int(day_offset)
+        self.role = role
+        self.threshold_seconds = float(threshold_seconds)
+        self.templates = dict(templates)
+        self.log_tag = log_tag or name
+        self.day_label = day_label or ("당일" if self.day_offset == 0 else f"{self.day_offset:+d}일")
+        self.enabled = bool(enabled)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Campaign":
+        unknown = set(data) - {"name", "hour", "minute", "day_offset", "role", "threshold_seconds", "templates",
+                               "log_tag", "day_label", "enabled"}
+        if unknown:
+            raise ValueError(f"캠페인 {data.get('name')}: 알 수 없는 항목 {sorted(unknown)}")
+        return cls(**data)
+
+    @property
+    def trigger(self) -> "CronTrigger":
+        # apscheduler는 스케줄러를 시작할 때만 필요하므로 모듈 import 시점에 불러오지 않는다.
+        from apscheduler.triggers.cron import CronTrigger
+        return CronTrigger(hour=self.hour, minute=self.minute, timezone=KST)
+
+    def target_date(self, fire_time: Optional[datetime] = None) -> str:
+        """발송 시각 기준 사용량 대상 날짜 (YYYY-MM-DD, KST)"""
+        fire_time = (fire_time or datetime.now(KST)).astimezone(KST)
+        return (fire_time + timedelta(days=self.day_offset)).strftime('%Y-%m-%d')
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "hour": self.hour, "minute": self.minute, "day_offset": self.day_offset,
+            "role": self.role, "threshold_seconds": self.threshold_seconds, "templates": dict(self.templates),
+            "log_tag": self.log_tag, "day_label": self.day_label, "enabled": self.enabled,
+        }
+
+
+def load_campaigns(path: Optional[str] = None) -> "OrderedDict[str, Campaign]":
+    """캠페인 정의를 불러온다. path가 비어 있으면 DEFAULT_CAMPAIGNS를 사용한다."""
+    definitions = DEFAULT_CAMPAIGNS
+    if path:
+        with open(path, encoding="utf-8") as f:
+            definitions = json.load(f)
+        if not isinstance(definitions, list):
+            raise ValueError(f"{path}: 캠페인 정의는 JSON 목록이어야 합니다.")
+    loaded = OrderedDict()
+    for data in definitions:
+        campaign = Campaign.from_dict(data)
+        if campaign.name in loaded:
+            raise ValueError(f"캠페인 이름이 중복되었습니다: {campaign.name}")
+        loaded[campaign.name] = campaign
+    return loaded
+
+
+# -------------------------
+# 실행 기록 (단계별 소요 시간 / 사용자별 판정)
+# -------------------------
+
+# 파이프라인 단계 이름 (응답/로그 표시 순서)
+STAGES = ("roster", "eligibility", "usage", "decide", "render", "dispatch", "report")
+
+
+class RunTrace:
+    """
+    캠페인 실행 1회의 단계별 소요 시간과 사용자별 판정 기록
+
+    청크 단위 단계(usage/decide/render/dispatch)는 청크끼리 겹쳐서 진행되므로 seconds는 청크별 소요 시간의 합이다.
+    record_decisions가 False면 소요 시간만 기록한다. (정기 실행)
+    """
+
+    def __init__(self, record_decisions: bool = False):
+        self.record_decisions = record_decisions
+        self.timings = OrderedDict((stage, {"seconds": 0.0, "calls": 0, "items": 0}) for stage in STAGES)
+        self.decisions = OrderedDict()  # user_id -> {"user_id", "decision", ...}
+        self.elapsed = None
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str, items: int = 0):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                timing = self.timings[name]
+                timing["seconds"] += elapsed
+                timing["calls"] += 1
+                timing["items"] += items
+
+    def record(self, user_id: str, decision: Optional[str] = None, **detail) -> None:
+        """사용자별 판정(decision)과 세부 정보(사용 시간, 메시지, 발송 결과 등)를 기록"""
+        if not self.record_decisions:
+            return
+        with self._lock:
+            entry = self.decisions.setdefault(user_id, {"user_id": user_id})
+            if decision is not None:
+                entry["decision"] = decision
+            entry.update(detail)
+
+    def finish(self) -> None:
+        self.elapsed = time.perf_counter() - self._started
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{stage} {timing['seconds']:.2f}s" for stage, timing in self.timings.items() if timing["calls"]
+        )
+
+    def to_dict(self, decision_limit: Optional[int] = None) -> dict:
+        decisions = list(self.decisions.values())
+        counts = OrderedDict()
+        for entry in decisions:
+            counts[entry.get("decision")] = counts.get(entry.get("decision"), 0) + 1
+        return {
+            "elapsed": round(self.elapsed if self.elapsed is not None else time.perf_counter() - self._started, 4),
+            "timings": {
+                stage: {"seconds": round(timing["seconds"], 4), "calls": timing["calls"], "items": timing["items"]}
+                for stage, timing in self.timings.items()
+            },
+            "decision_counts": counts,
+            "decisions": decisions if decision_limit is None else decisions[:decision_limit],
+        }
+
+
+# -------------------------
+# 데이터 소스 / 발송 대상
+# -------------------------
+
+def _shard_filter(users: list, shard: int, shard_count: int) -> list:
+    if shard_count <= 1:
+        return users
+    return [user_data for user_data in users if shard_of(user_data.get('user_id'), shard_count) == shard]
+
+
+class LiveSource:
+    """Firestore에서 명단과 사용량을 읽는다. (정기 실행/dry-run)"""
+
+    name = "firestore"
+
+    @property
+    def preload(self) -> bool:
+        # 컬렉션 그룹 쿼리는 한 번의 스캔으로 모든 사용자의 세션을 읽으므로 청크마다 반복하지 않고 미리 한 번만 집계
+        return settings.firestore_usage_query_mode == "collection_group"
+
+    def now(self) -> datetime:
+        return datetime.now(KST)
+
+    def roster(self, campaign: "Campaign", shard: int, shard_count: int) -> list:
+        return load_roster(campaign, shard, shard_count)
+
+    def usage(self, users: list, target_date: str) -> dict:
+        return fetch_usage(users, target_date)
+
+
+class RosterSource(LiveSource):
+    """
+    리더가 실행을 등록할 때 한 번 조회해 실행 기록에 저장한 샤드 명단(shard_rosters)을 쓰고,
+    사용량만 Firestore에서 읽는다. (coordination 샤드 실행, 샤드마다 전체 명단을 다시 읽지 않음)
+    """
+
+    def __init__(self, payload: list):
+        self.users = _decode(payload)
+
+    def roster(self, campaign: "Campaign", shard: int, shard_count: int) -> list:
+        return self.users
+
+
+class SnapshotSource:
+    """캡처해 둔 스냅샷의 명단/사용량/실행 시각으로 실행한다. (replay, 매번 같은 입력)"""
+
+    name = "snapshot"
+    preload = False
+
+    def __init__(self, snapshot: dict):
+        self.snapshot = snapshot
+
+    def now(self) -> datetime:
+        return self.snapshot["now"]
+
+    def roster(self, campaign: "Campaign", shard: int, shard_count: int) -> list:
+        return _shard_filter(self.snapshot["users"], shard, shard_count)
+
+    def usage(self, users: list, target_date: str) -> dict:
+        usage = self.snapshot["usage"]
+        return {user_id: usage[user_id] for user_id in _user_ids(users) if user_id in usage}
+
+
+class OutboxSink:
+    """outbox에 등록하고 SOLAPI 그룹 단위 일괄 발송이 끝날 때까지 기다린다. (정기 실행)"""
+
+    name = "outbox"
+
+    def send(self, campaign: "Campaign", outgoing: List[dict], run_id: str) -> List[dict]:
+        return outbox.submit(outgoing, run_id)
+
+
+class NullSink:
+    """
+    실제로 발송하지 않고 모든 메시지를 성공으로 처리한다. (dry-run/replay)
+    latency를 주면 SOLAPI 그룹 요청(batch_size건)마다 그만큼 대기해 발송 지연을 흉내 낸다.
+    """
+
+    name = "null"
+
+    def __init__(self, latency: float = 0.0, batch_size: int = settings.solapi_batch_size):
+        self.latency = latency
+        self.batch_size = batch_size
+
+    def send(self, campaign: "Campaign", outgoing: List[dict], run_id: str) -> List[dict]:
+        if self.latency:
+            for _ in range(0, len(outgoing), self.batch_size):
+                time.sleep(self.latency)
+        return [{"phone": item["phone"], "status": "success", "detail": "dry-run"} for item in outgoing]
+
+
+# -------------------------
+# 스냅샷 (replay 입력)
+# -------------------------
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"$datetime": value.isoformat()}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if set(value) == {"$datetime"}:
+            return datetime.fromisoformat(value["$datetime"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _mask_phone(phone: str) -> str:
+    """스냅샷에는 전화번호 끝 4자리만 남긴다. (replay는 실제로 발송하지 않음)"""
+    phone = (phone or '').strip()
+    return "*" * max(0, len(phone) - 4) + phone[-4:]
+
+
+def _mask_name(name) -> str:
+    """이름은 첫 글자만 남기고 길이는 유지한다. (replay 메시지 길이가 실제와 같도록)"""
+    name = str(name or '')
+    return name[:1] + "*" * max(0, len(name) - 1)
+
+
+# 스냅샷에 저장하는 personal_dashboard 필드 (참여 기간 판정에 필요한 값만, 전화번호/이름 등은 저장하지 않음)
+_SNAPSHOT_DASHBOARD_FIELDS = ("start_date", "end_date")
+
+
+def _snapshot_user(user_data: dict) -> dict:
+    """명단 항목에서 replay에 필요한 필드만 남긴다. (목록에 없는 필드는 중첩 값까지 모두 버림)"""
+    dashboard_data = user_data.get('dashboard_data') or {}
+    return {
+        "user_id": user_data.get('user_id'),
+        "phone": _mask_phone(user_data.get('phone')),
+        "name": _mask_name(user_data.get('name', user_data.get('user_id'))),
+        "role": user_data.get('role'),
+        "dashboard_data": {field: dashboard_data[field] for field in _SNAPSHOT_DASHBOARD_FIELDS if field in dashboard_data},
+    }
+
+
+# 스냅샷 파일 이름: {캠페인}_{대상 날짜}_{실행}_{샤드}of{샤드 수}.json
+# 실행(run)은 정기 실행이면 "scheduled", 그 밖의 실행(capture=true dry-run 등)은 실행 ID 해시다.
+# 실행 이름이 없는 파일은 이전 형식(_LEGACY_RUN)으로 읽는다.
+_SNAPSHOT_NAME = re.compile(r"^(?P<date>\d{4}-\d{2}-\d{2})_(?:(?P<run>[0-9a-z]+)_)?(?P<shard>\d+)of(?P<count>\d+)\.json$")
+_SCHEDULED_RUN = "scheduled"
+_LEGACY_RUN = "legacy"
+
+
+def _snapshot_run(campaign: "Campaign", target_date: str, run_id: Optional[str]) -> str:
+    if run_id is None or run_id == scheduled_run_id(campaign, target_date):
+        return _SCHEDULED_RUN
+    return hashlib.sha1(run_id.encode("utf-8")).hexdigest()[:12]
+
+
+def _snapshot_files(campaign_name: str, target_date: Optional[str] = None) -> List[dict]:
+    """
+    캠페인 이름이 정확히 같은 스냅샷 파일 목록 [{"path", "target_date", "run", "shard", "shard_count"}]
+    (이름이 다른 캠페인의 접두어여도 섞이지 않음, 대상 날짜 순)
+    """
+    directory = Path(settings.campaign_snapshot_dir)
+    prefix = f"{campaign_name}_"
+    files = []
+    for path in directory.glob(f"{glob.escape(campaign_name)}_*.json"):
+        if not path.name.startswith(prefix):
+            continue
+        match = _SNAPSHOT_NAME.match(path.name[len(prefix):])
+        if match is None or (target_date is not None and match["date"] != target_date):
+            continue
+        files.append({"path": path, "target_date": match["date"], "run": match["run"] or _LEGACY_RUN,
+                      "shard": int(match["shard"]), "shard_count": int(match["count"])})
+    return sorted(files, key=lambda file: (file["target_date"], file["run"], file["shard_count"], file["shard"]))
+
+
+def _snapshot_sets(files: List[dict]) -> List[dict]:
+    """파일을 실행/샤드 수별 묶음으로 나눈다. 모든 샤드(0..샤드 수-1)가 있어야 complete"""
+    sets = OrderedDict()
+    for file in files:
+        key = (file["target_date"], file["run"], file["shard_count"])
+        entry = sets.setdefault(key, {"target_date": key[0], "run": key[1], "shard_count": key[2], "files": []})
+        entry["files"].append(file)
+    for entry in sets.values():
+        entry["complete"] = {file["shard"] for file in entry["files"]} == set(range(entry["shard_count"]))
+        entry["mtime"] = max(file["path"].stat().st_mtime for file in entry["files"])
+    return list(sets.values())
+
+
+def save_snapshot(campaign: "Campaign", target_date: str, now_kst: datetime, users: list, usage_by_user: dict,
+                  shard: int = 0, shard_count: int = 1, run_id: Optional[str] = None) -> Path:
+    """실행 입력(명단, 사용량, 실행 시각)을 캠페인/대상 날짜/실행/샤드별 JSON 파일로 저장하고 오래된 날짜는 정리한다."""
+    directory = Path(settings.campaign_snapshot_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    run = _snapshot_run(campaign, target_date, run_id)
+    path = directory / f"{campaign.name}_{target_date}_{run}_{shard}of{shard_count}.json"
+    snapshot = {
+        "version": 1,
+        "campaign": campaign.to_dict(),
+        "target_date": target_date,
+        "now": now_kst,
+        "captured_at": datetime.now(KST),
+        "run": run,
+        "shard": shard,
+        "shard_count": shard_count,
+        "users": [_snapshot_user(user_data) for user_data in users],
+        "usage": {
+            user_id: [usage['total_usage']['total_seconds'], usage['session_count']]
+            for user_id, usage in usage_by_user.items()
+        },
+    }
+    temp_path = path.with_suffix(".tmp")
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(_encode(snapshot), f, ensure_ascii=False)
+    os.replace(temp_path, path)
+
+    # 캠페인별로 최근 CAMPAIGN_SNAPSHOT_KEEP개 대상 날짜만 보관
+    files = _snapshot_files(campaign.name)
+    dates = sorted({file["target_date"] for file in files})
+    expired = set(dates[:-settings.campaign_snapshot_keep])
+    for file in files:
+        if file["target_date"] in expired:
+            file["path"].unlink(missing_ok=True)
+    return path
+
+
+def load_snapshot(campaign_name: str, target_date: str, run: Optional[str] = None) -> dict:
+    """
+    캠페인/대상 날짜의 스냅샷을 읽는다. 샤드별로 나뉘어 있으면 합친다. (없으면 FileNotFoundError)
+
+    한 실행의 같은 샤드 수 파일끼리만 합치며, 샤드가 빠진 묶음은 쓰지 않는다.
+    run을 지정하지 않으면 정기 실행 묶음을, 없으면 가장 최근에 저장된 완전한 묶음을 사용한다.
+    """
+    sets = _snapshot_sets(_snapshot_files(campaign_name, target_date))
+    if run is not None:
+        sets = [entry for entry in sets if entry["run"] == run]
+    if not sets:
+        raise FileNotFoundError(f"스냅샷이 없습니다: {campaign_name} {target_date}" + (f" (run={run})" if run else ""))
+    complete = [entry for entry in sets if entry["complete"]]
+    if not complete:
+        found = ", ".join(f"{entry['run']} {len(entry['files'])}/{entry['shard_count']}" for entry in sets)
+        raise FileNotFoundError(f"모든 샤드가 저장된 스냅샷이 없습니다: {campaign_name} {target_date} ({found})")
+    chosen = max(complete, key=lambda entry: (entry["run"] == _SCHEDULED_RUN, entry["mtime"]))
+
+    snapshot = None
+    for file in chosen["files"]:
+        with open(file["path"], encoding="utf-8") as f:
+            part = _decode(json.load(f))
+        if snapshot is None:
+            snapshot = {**part, "run": chosen["run"], "users": [], "usage": {}, "shards": []}
+        snapshot["users"].extend(part["users"])
+        snapshot["usage"].update(part["usage"])
+        snapshot["shards"].append(f"{part['shard']}/{part['shard_count']}")
+    snapshot["usage"] = {
+        user_id: {'total_usage': build_total_usage(seconds), 'session_count': count}
+        for user_id, (seconds, count) in snapshot["usage"].items()
+    }
+    return snapshot
+
+
+def list_snapshots(campaign_name: str) -> List[dict]:
+    """캠페인의 스냅샷 목록 (최근 대상 날짜 순, 날짜별 실행 묶음과 완전 여부)"""
+    snapshots = OrderedDict()
+    for entry in reversed(_snapshot_sets(_snapshot_files(campaign_name))):
+        item = snapshots.setdefault(entry["target_date"],
+                                    {"target_date": entry["target_date"], "files": [], "bytes": 0, "runs": []})
+        names = [file["path"].name for file in entry["files"]]
+        item["files"].extend(names)
+        item["bytes"] += sum(file["path"].stat().st_size for file in entry["files"])
+        item["runs"].append({"run": entry["run"], "shard_count": entry["shard_count"],
+                             "shards": len(entry["files"]), "complete": entry["complete"]})
+    return list(snapshots.values())
+
+
+# -------------------------
+# 파이프라인 단계 (모두 사용자 목록 단위)
+# -------------------------
+
+def load_roster(campaign: Campaign, shard: int = 0, shard_count: int = 1) -> list:
+    """명단 조회: 캠페인 role 사용자 중 이 샤드(user_id 해시 구간)의 사용자"""
+    return _shard_filter(get_users_with_phone(role_filter=campaign.role), shard, shard_count)
+
+
+def shard_rosters(campaign: Campaign, shard_count: int) -> List[list]:
+    """
+    명단을 한 번 조회해 샤드별로 나눈다. 리더가 실행 기록에 함께 저장하는 샤드 입력이며
+    (datetime은 스냅샷과 같은 형식으로 인코딩), 샤드는 RosterSource로 읽는다.
+    """
+    rosters = [[] for _ in range(shard_count)]
+    for user_data in get_users_with_phone(role_filter=campaign.role):
+        rosters[shard_of(user_data.get('user_id'), shard_count)].append(_encode(user_data))
+    return rosters
+
+
+def _is_active_period(user_data: dict, now_kst: datetime) -> bool:
+    """
+    personal_dashboard의 start_date/end_date 기준으로 현재 참여 기간 중인 사용자인지 확인
+    (날짜 형식이 잘못되어 비교할 수 없으면 예외 - 호출 측에서 처리 실패로 집계)
+    """
+    dashboard_data = user_data.get('dashboard_data', {})
+    start_date = dashboard_data.get('start_date')
+    end_date = dashboard_data.get('end_date')
+
+    if isinstance(start_date, datetime):
+        start_date = start_date.astimezone(KST)
+    if isinstance(end_date, datetime):
+        end_date = end_date.astimezone(KST)
+
+    # 날짜 유효성 검사
+    return bool(start_date and start_date <= now_kst and (not end_date or end_date >= now_kst))
+
+
+def filter_eligible(users: list, now_kst: Optional[datetime] = None, trace: Optional[RunTrace] = None):
+    """
+    참여 기간 필터: 대시보드 start_date/end_date 기준으로 참여 중인 사용자만 남긴다.
+    참여 기간을 확인할 수 없는 사용자(잘못된 날짜 값)는 제외하고 처리 실패로 센다.
+    Returns: (참여 중인 사용자 목록, 처리 실패 수)
+    """
+    now_kst = now_kst or datetime.now(KST)
+    trace = trace or RunTrace()
+    eligible, failed_count = [], 0
+    for user_data in users:
+        user_id = user_data.get('user_id')
+        try:
+            active = _is_active_period(user_data, now_kst)
+        except Exception as e:
+            logger.warning("참여 기간 확인 실패: %s", e, extra={"user_id": user_id})
+            trace.record(user_id, "error", error=str(e))
+            failed_count += 1
+            continue
+        if active:
+            eligible.append(user_data)
+        else:
+            trace.record(user_id, "ineligible")
+    return eligible, failed_count
+
+
+def _user_ids(users: list) -> list:
+    return [user_data.get('user_id') for user_data in users if user_data.get('phone', '').strip()]
+
+
+def fetch_usage(users: list, target_date: str) -> dict:
+    """사용량 조회: 사용자들의 target_date 사용량을 한 번에 집계 (사용자별 쿼리 반복 방지)"""
+    return get_daily_totals(_user_ids(users), target_date)
+
+
+def decide(campaign: Campaign, users: list, usage_by_user: dict, trace: Optional[RunTrace] = None):
+    """
+    기준 시간 판정: 사용 시간이 campaign.threshold_seconds 미만인 사용자를 (user_data, usage_data) 목록으로 반환한다.
+    Returns: (발송 대상 목록, 처리 실패 수)
+    """
+    trace = trace or RunTrace()
+    targets, failed_count = [], 0
+    for user_data in users:
+        user_id = user_data.get('user_id')
+        try:
+            username = user_data.get('name', user_id or '사용자')
+            if not user_data.get('phone', '').strip():
+                logger.info("%s님의 전화번호가 없습니다.", username, extra={"user_id": user_id})
+                trace.record(user_id, "no_phone")
+                continue
+
+            usage_data = usage_by_user[user_id]
+            total_seconds = usage_data['total_usage']['total_seconds']
+            if total_seconds < campaign.threshold_seconds:
+                targets.append((user_data, usage_data))
+                trace.record(user_id, "send", total_seconds=total_seconds)
+            else:
+                # 기준 시간 이상 사용한 경우 건너뛰기
+                logger.info("%s님은 %s 목표 사용 시간을 달성하여 알림을 건너뜁니다.", username, campaign.day_label,
+                            extra={"user_id": user_id, "total_seconds": total_seconds})
+                trace.record(user_id, "goal_achieved", total_seconds=total_seconds)
+        except Exception as e:
+            logger.warning("사용자 처리 실패: %s", e, extra={"user_id": user_id})
+            trace.record(user_id, "error", error=str(e))
+            failed_count += 1
+    return targets, failed_count
+
+
+def render(campaign: Campaign, targets: list, target_date: str, run_id: str,
+           trace: Optional[RunTrace] = None) -> List[dict]:
+    """메시지 생성: 발송 대상별 개인화 메시지 (같은 실행 ID/사용자 메시지는 멱등 키로 한 번만 발송)"""
+    outgoing = []
+    for user_data, usage_data in targets:
+        user_id = user_data.get('user_id')
+        username = user_data.get('name', user_id or '사용자')
+        total_seconds = usage_data['total_usage']['total_seconds']
+        template = campaign.templates["used" if total_seconds > 0 else "unused"]
+        body = template.format(
+            username=username,
+            formatted=usage_data['total_usage']['formatted'],
+            total_seconds=total_seconds,
+            target_date=target_date,
+        )
+        outgoing.append({
+            "phone": user_data['phone'].strip(),
+            "body": body,
+            # 사용자 정보 (Slack 로깅용)
+            "user_info": f"사용자 ID: {user_id}, 이름: {username}, Role: {user_data.get('role', 'N/A')}",
+            "user_id": user_id,
+            "username": username,
+            "idempotency_key": f"{run_id}:{user_id}",
+        })
+        if trace is not None:
+            trace.record(user_id, body=body)
+    return outgoing
+
+
+def dispatch(campaign: Campaign, outgoing: List[dict], run_id: str, sink=None,
+             trace: Optional[RunTrace] = None) -> List[dict]:
+    """발송: sink(기본 outbox)로 보내고 메시지별 결과를 반환"""
+    results = (sink or OutboxSink()).send(campaign, outgoing, run_id)
+    for item, result in zip(outgoing, results):
+        if result["status"] == "success":
+            logger.info("%s님 %s 사용량 알림 전송 완료", item['username'], campaign.day_label,
+                        extra={"user_id": item['user_id']})
+        else:
+            logger.warning("%s님 SMS 전송 실패: %s", item['username'], result['detail'], extra={"user_id": item['user_id']})
+        if trace is not None:
+            trace.record(item['user_id'], status=result["status"], detail=result.get("detail"))
+    return results
+
+
+def report(campaign: Campaign, totals: dict) -> None:
+    """결과 보고: 합산 결과를 Slack에 로깅"""
+    slack_logger.log_broadcast_result(totals["total"], totals["success"], totals["failed"])
+
+
+campaign_runs = registry.counter("campaign_runs_total", "정기 알림 캠페인 실행(샤드) 수", ("campaign", "outcome"))
+campaign_run_seconds = registry.gauge("campaign_run_duration_seconds", "최근 캠페인 실행(샤드) 1회 소요 시간(초)", ("campaign",))
+campaign_stage_seconds = registry.gauge(
+    "campaign_stage_seconds", "최근 캠페인 실행의 단계별 소요 시간 합(초, 청크 병렬 처리 시간 합산)", ("campaign", "stage"),
+)
+campaign_last_run = registry.gauge(
+    "campaign_last_run_timestamp_seconds", "캠페인 실행(샤드)이 마지막으로 끝난 시각 (unix time)", ("campaign",),
+)
+
+
+def _record_run(campaign: Campaign, trace: RunTrace, outcome: str) -> None:
+    """실제 발송 실행(OutboxSink)의 소요 시간을 메트릭으로 남긴다. dry-run/replay는 기록하지 않는다."""
+    if trace.elapsed is None:
+        trace.finish()
+    campaign_runs.labels(campaign.name, outcome).inc()
+    campaign_run_seconds.labels(campaign.name).set(trace.elapsed)
+    campaign_last_run.labels(campaign.name).set(time.time())
+    for stage, timing in trace.timings.items():
+        if timing["calls"]:
+            campaign_stage_seconds.labels(campaign.name, stage).set(timing["seconds"])
+
+
+def scheduled_run_id(campaign: Campaign, target_date: str) -> str:
+    """스케줄러 실행 ID (같은 캠페인/대상 날짜의 정기 실행은 같은 멱등 키를 쓴다)"""
+    return f"{campaign.name}:{target_date}"
+
+
+def run_campaign(campaign: Campaign, target_date: Optional[str] = None, shard: int = 0, shard_count: int = 1,
+                 report_result: bool = True, engine=None, source=None, sink=None, trace: Optional[RunTrace] = None,
+                 capture: bool = settings.campaign_snapshot_capture, run_id: Optional[str] = None) -> dict:
+    """
+    캠페인 1회(또는 샤드 1개)를 실행하고 {"total", "success", "failed"}를 반환한다.
+
+    샤드 실행은 report_result=False로 호출되어 Slack 보고 없이 결과만 반환하며(모든 샤드가 끝난 뒤 합산 결과로 한 번 보고),
+    처리 중 오류가 나면 예외를 전달해 샤드를 재시도하게 한다. (이미 발송된 메시지는 멱등 키로 다시 보내지 않음)
+
+    Args:
+        source: 명단/사용량 출처 (기본 LiveSource, replay는 SnapshotSource)
+        sink: 발송 대상 (기본 OutboxSink, dry-run/replay는 NullSink)
+        trace: 단계별 소요 시간/사용자별 판정 기록 (없으면 새로 만들어 소요 시간만 로그로 남김)
+        capture: 실행 입력을 스냅샷으로 저장 (replay용)
+        run_id: 멱등 키/outbox broadcast_id에 쓰는 실행 ID. 스케줄러만 scheduled_run_id()를 넘기고,
+            지정하지 않은 실행(테스트 엔드포인트 등)은 매번 새 "manual:..." ID를 받아 정기 실행의 발송을 막지 않는다.
+    """
+    engine = engine or run_engine
+    source = source or LiveSource()
+    sink = sink or OutboxSink()
+    trace = trace or RunTrace()
+    live = isinstance(sink, OutboxSink)
+    with log_context(campaign=campaign.name, sink=sink.name, shard=shard, shard_count=shard_count):
+        try:
+            kst_now = source.now()
+            target_date = target_date or campaign.target_date(kst_now)
+            run_id = run_id or f"manual:{campaign.name}:{target_date}:{uuid.uuid4().hex[:12]}"
+
+            logger.info("%s 실행 시작 - 현재 KST 시간: %s, 조회 대상 날짜: %s", campaign.log_tag,
+                        kst_now.strftime('%Y-%m-%d %H:%M:%S %Z'), target_date,
+                        extra={"log_tag": campaign.log_tag, "target_date": target_date})
+
+            with trace.stage("roster"):
+                users_with_phone = source.roster(campaign, shard, shard_count)
+            trace.timings["roster"]["items"] = len(users_with_phone)
+            if not users_with_phone:
+                logger.info("%s role을 가진 사용자가 없습니다.", campaign.role)
+                if live:
+                    _record_run(campaign, trace, "success")
+                return {"total": 0, "success": 0, "failed": 0}
+
+            with trace.stage("eligibility", len(users_with_phone)):
+                active_users, ineligible_failed = filter_eligible(users_with_phone, kst_now, trace)
+
+            captured_usage = {}
+            capture_lock = threading.Lock()
+            preloaded = None
+            if source.preload:
+                with engine.reading(), trace.stage("usage", len(active_users)):
+                    preloaded = source.usage(active_users, target_date)
+                captured_usage = preloaded
+
+            def load(chunk):
+                if preloaded is not None:
+                    return preloaded
+                with trace.stage("usage", len(chunk)):
+                    usage_by_user = source.usage(chunk, target_date)
+                if capture:
+                    with capture_lock:
+                        captured_usage.update(usage_by_user)
+                return usage_by_user
+
+            def build(chunk, usage_by_user):
+                with trace.stage("decide", len(chunk)):
+                    targets, failed_count = decide(campaign, chunk, usage_by_user, trace)
+                with trace.stage("render", len(targets)):
+                    outgoing = render(campaign, targets, target_date, run_id, trace)
+                return outgoing, failed_count
+
+            def send(outgoing):
+                with trace.stage("dispatch", len(outgoing)):
+                    return dispatch(campaign, outgoing, run_id, sink, trace)
+
+            totals = engine.run(run_id, active_users, load, build, send)
+            if totals["errors"] and not report_result:
+                raise RuntimeError(f"청크 {len(totals['errors'])}개 처리 실패: {totals['errors'][0]}")
+
+            if capture:
+                try:
+                    path = save_snapshot(campaign, target_date, kst_now, users_with_phone, captured_usage, shard,
+                                         shard_count, run_id)
+                    logger.info("실행 입력 스냅샷 저장: %s", path)
+                except Exception as e:
+                    logger.warning("스냅샷 저장 실패: %s", e)
+
+            # total은 조회된 전체 사용자 수 유지
+            result = {"total": len(users_with_phone), "success": totals["success"],
+                      "failed": totals["failed"] + ineligible_failed}
+            logger.info("%s 사용량 기준 미달 %s 사용자 대상 알림 완료: %d명 전송 성공, %d명 실패",
+                        campaign.day_label, campaign.role, result['success'], result['failed'], extra=result)
+
+            if report_result:
+                with trace.stage("report"):
+                    report(campaign, result)
+            trace.finish()
+            logger.info("단계별 소요 시간: %s (전체 %.2fs)", trace.summary(), trace.elapsed,
+                        extra={"elapsed": round(trace.elapsed, 3)})
+            if live:
+                _record_run(campaign, trace, "success")
+            return result
+
+        except Exception as e:
+            logger.exception("캠페인 실행 중 오류 발생: %s", e)
+            if live:
+                _record_run(campaign, trace, "error")
+            if not report_result:
+                raise
+
+
+def dry_run_campaign(campaign: Campaign, target_date: Optional[str] = None, capture: bool = False,
+                     latency: float = 0.0, decision_limit: Optional[int] = None, engine=None) -> dict:
+    """
+    Firestore에서 실제 명단/사용량을 읽어 전체 파이프라인을 실행하되 발송은 NullSink로 보낸다.
+    결과, 단계별 소요 시간, 사용자별 판정(메시지 본문 포함)을 반환한다. capture=True면 스냅샷도 저장한다.
+    """
+    target_date = target_date or campaign.target_date()
+    trace = RunTrace(record_decisions=True)
+    result = run_campaign(campaign, target_date, report_result=False, engine=engine, source=LiveSource(),
+                          sink=NullSink(latency), trace=trace, capture=capture)
+    return {"campaign": campaign.name, "mode": "dry_run", "source": "firestore", "target_date": target_date,
+            "result": result, **trace.to_dict(decision_limit)}
+
+
+def replay_campaign(campaign_name: str, target_date: str, latency: float = 0.0,
+                    decision_limit: Optional[int] = None, engine=None, run: Optional[str] = None) -> dict:
+    """
+    캡처해 둔 스냅샷(명단, 사용량, 실행 시각, 캠페인 정의)으로 지난 실행을 발송 없이 다시 실행한다.
+    입력이 매번 같으므로 단계별 소요 시간을 비교해 성능 변화를 측정할 수 있다. (run: list_snapshots의 실행 이름)
+    """
+    snapshot = load_snapshot(campaign_name, target_date, run)
+    campaign = Campaign.from_dict(snapshot["campaign"])
+    trace = RunTrace(record_decisions=True)
+    result = run_campaign(campaign, target_date, report_result=False, engine=engine, source=SnapshotSource(snapshot),
+                          sink=NullSink(latency), trace=trace, capture=False)
+    return {"campaign": campaign.name, "mode": "replay", "source": "snapshot", "target_date": target_date,
+            "snapshot": {"now": snapshot["now"].isoformat(), "captured_at": snapshot["captured_at"].isoformat(),
+                         "run": snapshot["run"], "shards": snapshot["shards"], "users": len(snapshot["users"])},
+            "result": result, **trace.to_dict(decision_limit)}
+
+
+# 설정된 캠페인 (이름 -> Campaign)
+campaigns = load_campaigns(settings.campaigns_file)
@@ -1,48 +1,225 @@
 """config.py
 공통 설정 및 리소스 초기화 모듈
 --------------------------------
-환경 변수 로드, 경로 설정, SOLAPI 클라이언트 생성 등을 담당한다.
+환경 변수를 읽어 타입이 정해진 설정 객체(settings)를 만들고, 무거운 외부 클라이언트를 처음 사용할 때 생성한다.
+
+- 설정은 `from config import settings` 후 settings.solapi_base_url처럼 읽는다. (환경 변수 이름의 소문자)
+- SOLAPI SDK 클라이언트는 get_message_service()를 처음 호출할 때 만든다. (solapi 패키지 import도 이때)
+  Firestore 클라이언트(firestore_client)와 Slack HTTP 세션(slack_logger)도 같은 방식으로 첫 사용 시 생성한다.
+- 필수 환경 변수 확인(settings.validate())은 앱 시작(main)과 클라이언트 생성 시점에 한다.
 """
 
 import os
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
+from typing import Callable, Dict, Optional
 
+import pytz
 from dotenv import load_dotenv
-from solapi import SolapiMessageService
 
 # .env 파일 로드
 load_dotenv()
 
 # 기본 디렉터리(프로젝트 루트)
 BASE_DIR = Path(__file__).resolve().parent
-RECIPIENT_FILE = BASE_DIR / "recipients.json"
 
-# SOLAPI 환경 변수
-SOLAPI_API_KEY = os.getenv("SOLAPI_API_KEY")
-SOLAPI_API_SECRET = os.getenv("SOLAPI_API_SECRET")
-SENDER_PHONE = os.getenv("SENDER_PHONE")  # 발신번호 (01000000000 형식)
+# 타임존(Asia/Seoul)
+TIMEZONE = pytz.timezone("Asia/Seoul")
 
-# Slack 웹훅 URL
-SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL")
 
-if not SOLAPI_API_KEY:
-    raise RuntimeError("SOLAPI_API_KEY 환경 변수가 설정되어 있지 않습니다.")
-if not SOLAPI_API_SECRET:
-    raise RuntimeError("SOLAPI_API_SECRET 환경 변수가 설정되어 있지 않습니다.")
-if not SENDER_PHONE:
-    raise RuntimeError("SENDER_PHONE 환경 변수가 설정되어 있지 않습니다.")
+def _env(name: str, default, cast: Callable = str, minimum=None, maximum=None):
+    """환경 변수 name을 cast로 변환해 기본값으로 쓰는 필드 (Settings()를 만들 때 읽음)"""
 
-# SOLAPI 메시지 서비스 클라이언트 초기화
-message_service = SolapiMessageService(
-    api_key=SOLAPI_API_KEY, 
-    api_secret=SOLAPI_API_SECRET
-)
+    def read():
+        raw = os.getenv(name)
+        if raw is None and default is None:
+            return None
+        value = cast(raw if raw is not None else default)
+        if minimum is not None:
+            value = max(minimum, value)
+        if maximum is not None:
+            value = min(maximum, value)
+        return value
 
-# 타임존(Asia/Seoul)
-import pytz
-TIMEZONE = pytz.timezone("Asia/Seoul")
+    return field(default_factory=read)
+
+
+def _flag(name: str, default: str):
+    return _env(name, default, lambda value: value.lower() in ("1", "true", "yes"))
+
+
+def _mapping(name: str, default: str, cast: Callable):
+    """"키=값,키=값" 형식의 환경 변수를 dict로 읽는 필드"""
+
+    def parse(text: str) -> dict:
+        return {
+            key.strip(): cast(value.strip())
+            for key, value in (item.split("=", 1) for item in text.split(",") if "=" in item)
+        }
+
+    return _env(name, default, parse)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """환경 변수에서 읽은 설정 (필드 이름은 환경 변수 이름의 소문자)"""
+
+    # 수신자 저장소: file(recipients.json + append-only 로그) | sqlite(수신자 + 발송 이력, WAL)
+    recipient_file: Path = BASE_DIR / "recipients.json"
+    recipient_log_file: Path = _env("RECIPIENT_LOG_FILE", BASE_DIR / "recipients.log", Path)  # 수신자 추가 append-only 로그
+    recipient_backend: str = _env("RECIPIENT_BACKEND", "file", str.lower)
+    recipient_db: Path = _env("RECIPIENT_DB", BASE_DIR / "recipients.db", Path)  # sqlite 백엔드 파일
+    recipient_log_compact_threshold: int = _env("RECIPIENT_LOG_COMPACT_THRESHOLD", "1000", int, minimum=1)  # 로그가 이 줄 수를 넘으면 스냅샷으로 압축
+
+    # SOLAPI 환경 변수
+    solapi_api_key: Optional[str] = _env("SOLAPI_API_KEY", None)
+    solapi_api_secret: Optional[str] = _env("SOLAPI_API_SECRET", None)
+    sender_phone: Optional[str] = _env("SENDER_PHONE", None)  # 발신번호 (01000000000 형식)
+
+    solapi_base_url: str = _env("SOLAPI_BASE_URL", "https://api.solapi.com", lambda value: value.rstrip("/"))  # 부하 테스트 시 로컬 스텁 서버 주소로 변경
+    solapi_http_max_connections: int = _env("SOLAPI_HTTP_MAX_CONNECTIONS", "20", int, minimum=1)  # 비동기 HTTP 클라이언트 연결 풀 크기
+    solapi_http_timeout: float = _env("SOLAPI_HTTP_TIMEOUT", "10", float)  # 비동기 HTTP 요청 타임아웃(초)
+
+    # 그룹(send-many) 발송 시 요청 1건에 담을 메시지 수 (SOLAPI 최대 10,000건)
+    solapi_batch_size: int = _env("SOLAPI_BATCH_SIZE", "1000", int, minimum=1, maximum=10000)
+
+    # 동시 발송 디스패처 설정
+    sms_dispatch_workers: int = _env("SMS_DISPATCH_WORKERS", "4", int, minimum=1)  # 발송 스레드 수
+    sms_dispatch_max_in_flight: int = _env("SMS_DISPATCH_MAX_IN_FLIGHT", "8", int, minimum=1)  # 동시 진행 요청 수 상한
+    solapi_requests_per_sec: float = _env("SOLAPI_REQUESTS_PER_SEC", "10", float)  # 초당 SOLAPI 요청 수 (0 이하면 무제한)
+    solapi_requests_burst: Optional[float] = _env("SOLAPI_REQUESTS_BURST", "0", lambda value: float(value) or None)  # 순간 허용 요청 수 (미설정 시 초당 요청 수)
+
+    # 영속 발송 대기열(outbox): 재시도/멱등 키/dead-letter
+    outbox_db: Path = _env("OUTBOX_DB", BASE_DIR / "outbox.db", Path)  # 대기열 SQLite 파일
+    outbox_max_attempts: int = _env("OUTBOX_MAX_ATTEMPTS", "5", int, minimum=1)  # 최대 발송 시도 횟수 (초과 시 dead-letter)
+    outbox_retry_base_seconds: float = _env("OUTBOX_RETRY_BASE_SECONDS", "2", float)  # 첫 재시도 대기(초), 이후 2배씩 증가
+    outbox_retry_max_seconds: float = _env("OUTBOX_RETRY_MAX_SECONDS", "300", float)  # 재시도 대기 상한(초)
+    outbox_poll_interval: float = _env("OUTBOX_POLL_INTERVAL", "1", float)  # 워커 대기열 확인 주기(초)
+    outbox_wait_timeout: float = _env("OUTBOX_WAIT_TIMEOUT", "600", float)  # broadcast/스케줄러가 발송 완료를 기다리는 최대 시간(초)
+    outbox_sending_timeout: float = _env("OUTBOX_SENDING_TIMEOUT", "300", float)  # 발송 중 상태로 이 시간(초)이 지난 메시지는 워커가 죽은 것으로 보고 다시 대기열에 넣음
+
+    # 브로드캐스트 백그라운드 작업 (POST /send/broadcast → GET /jobs/{job_id})
+    job_workers: int = _env("JOB_WORKERS", "2", int, minimum=1)  # 동시에 진행할 수 있는 브로드캐스트 작업 수
+    job_history_limit: int = _env("JOB_HISTORY_LIMIT", "100", int, minimum=1)  # 메모리에 보관할 완료 작업 수
+
+    # 사용량 알림 캠페인 정의 파일(JSON 목록). 비어 있으면 기본 캠페인(오전 7시 전날 / 오후 7시 당일 사용량 알림)을 사용
+    campaigns_file: str = _env("CAMPAIGNS_FILE", "")
+
+    # 캠페인 실행 입력 스냅샷 (dry-run/replay용 명단·사용량 기록, 전화번호 끝 4자리·이름 첫 글자와 참여 기간만 저장)
+    campaign_snapshot_dir: Path = _env("CAMPAIGN_SNAPSHOT_DIR", BASE_DIR / "snapshots", Path)
+    campaign_snapshot_capture: bool = _flag("CAMPAIGN_SNAPSHOT_CAPTURE", "true")  # 정기 실행마다 저장
+    campaign_snapshot_keep: int = _env("CAMPAIGN_SNAPSHOT_KEEP", "14", int, minimum=1)  # 캠페인별로 보관할 최근 대상 날짜 수
+
+    # 정기 알림 병렬 실행 엔진 (명단을 청크로 나눠 읽기 -> 메시지 생성 -> 발송을 겹쳐서 진행)
+    run_workers: int = _env("RUN_WORKERS", "8", int, minimum=1)  # 동시에 처리할 청크 수
+    run_chunk_size: int = _env("RUN_CHUNK_SIZE", "500", int, minimum=1)  # 청크 1개의 사용자 수
+    run_read_concurrency: int = _env("RUN_READ_CONCURRENCY", "4", int, minimum=1)  # 동시에 Firestore 사용량을 읽는 청크 수
+    run_send_concurrency: int = _env("RUN_SEND_CONCURRENCY", "4", int, minimum=1)  # 동시에 발송(outbox 등록 후 완료 대기)하는 청크 수
+
+    # 스케줄러 조정(리더 선출 + 샤드 실행 기록): none(프로세스마다 스케줄러 실행) | sqlite(같은 서버의 워커 간) | firestore(여러 서버 간)
+    scheduler_coordination: str = _env("SCHEDULER_COORDINATION", "sqlite", str.lower)
+    scheduler_db: Path = _env("SCHEDULER_DB", BASE_DIR / "scheduler.db", Path)  # sqlite 방식 리스/실행 기록 파일
+    scheduler_firestore_collection: str = _env("SCHEDULER_FIRESTORE_COLLECTION", "scheduler_coordination")  # firestore 방식 컬렉션 접두어
+    scheduler_lease_ttl: float = _env("SCHEDULER_LEASE_TTL", "30", float)  # 리더 리스 유효 시간(초), 갱신이 끊기면 다른 프로세스가 인계
+    scheduler_heartbeat_interval: float = _env("SCHEDULER_HEARTBEAT_INTERVAL", "10", float)  # 리스 갱신/획득 시도 주기(초)
+    scheduler_run_shards: int = _env("SCHEDULER_RUN_SHARDS", "4", int, minimum=1)  # 정기 알림 1회 실행을 나눌 샤드 수 (user_id 해시 구간)
+    scheduler_shard_lease_ttl: float = _env("SCHEDULER_SHARD_LEASE_TTL", "300", float)  # 샤드 처리 리스(초), 처리 중 프로세스가 죽으면 만료 후 재할당
+    scheduler_shard_max_attempts: int = _env("SCHEDULER_SHARD_MAX_ATTEMPTS", "3", int, minimum=1)  # 샤드 최대 시도 횟수
+    scheduler_shard_poll_interval: float = _env("SCHEDULER_SHARD_POLL_INTERVAL", "5", float)  # 처리할 샤드 확인 주기(초)
+    scheduler_misfire_grace_seconds: float = _env("SCHEDULER_MISFIRE_GRACE_SECONDS", "900", float)  # 리더 인계 시 이 시간 안에 놓친 정기 실행은 바로 시작
+
+    # Slack 웹훅 URL
+    slack_webhook_url: Optional[str] = _env("SLACK_WEBHOOK_URL", None)
+
+    # Slack 로깅 파이프라인 설정 (백그라운드 큐 + 요약 메시지)
+    slack_queue_size: int = _env("SLACK_QUEUE_SIZE", "1000", int, minimum=1)  # 대기 이벤트 최대 개수
+    slack_digest_size: int = _env("SLACK_DIGEST_SIZE", "20", int, minimum=1)  # 요약 메시지 1건에 묶을 발송 이벤트 수
+    slack_digest_interval: float = _env("SLACK_DIGEST_INTERVAL", "5", float)  # 요약 메시지 최대 대기 시간(초)
+    slack_spill_file: str = _env("SLACK_SPILL_FILE", str(BASE_DIR / "slack_spill.jsonl"))  # 큐 포화 시 임시 저장 파일 (빈 값이면 버림)
+
+    # 애플리케이션 로그 (백그라운드 큐를 거쳐 stdout으로 출력)
+    log_format: str = _env("LOG_FORMAT", "json", str.lower)  # json(한 줄에 레코드 하나, journald/수집기용) | text(로컬 개발용)
+    log_level: str = _env("LOG_LEVEL", "INFO", str.upper)  # 기본 로그 레벨
+    # 모듈별 로그 레벨, "모듈=레벨,모듈=레벨" 형식 (예: campaigns=WARNING,firestore_client=DEBUG)
+    log_levels: Dict[str, str] = _mapping("LOG_LEVELS", "", str.upper)
+    log_queue_size: int = _env("LOG_QUEUE_SIZE", "10000", int, minimum=1)  # 출력 대기 레코드 최대 개수 (가득 차면 버림)
+    # 사용자별 INFO/DEBUG 로그(user_id가 있는 레코드)를 남길 사용자 비율 (0~1, 같은 사용자의 로그는 함께 남거나 빠짐)
+    log_user_sample_rate: float = _env("LOG_USER_SAMPLE_RATE", "1.0", float, minimum=0.0, maximum=1.0)
+
+    # 요청별 구간 추적(span tree), 기본은 꺼져 있고 GET /debug/traces로 조회
+    trace_header: str = _env("TRACE_HEADER", "X-Trace", str.lower)  # 이 헤더가 있는 요청은 항상 추적 (빈 값이면 헤더로 켜지 않음)
+    trace_sample_rate: float = _env("TRACE_SAMPLE_RATE", "0", float, minimum=0.0, maximum=1.0)  # 무작위로 추적할 요청 비율 (0~1)
+    trace_slow_ms: float = _env("TRACE_SLOW_MS", "0", float)  # 0보다 크면 모든 요청을 추적하고 이 시간(ms) 이상 걸린 요청만 보관
+    trace_buffer_size: int = _env("TRACE_BUFFER_SIZE", "200", int, minimum=1)  # 보관할 최근 추적 수 (오래된 것부터 버림)
+    trace_max_spans: int = _env("TRACE_MAX_SPANS", "1000", int, minimum=1)  # 추적 1건에 기록할 최대 구간 수
+
+    # Firestore 설정
+    firestore_project_id: str = _env("FIRESTORE_PROJECT_ID", "intention-computing-451401")
+    firestore_database_id: str = _env("FIRESTORE_DATABASE_ID", "intention-computing")
+    firestore_region: str = _env("FIRESTORE_REGION", "asia-northeast3")
+
+    # Firestore 클라이언트 풀/채널 설정
+    firestore_channel_pool_size: int = _env("FIRESTORE_CHANNEL_POOL_SIZE", "1", int, minimum=1)  # 프로세스당 gRPC 채널(클라이언트) 수
+    firestore_keepalive_time_ms: int = _env("FIRESTORE_KEEPALIVE_TIME_MS", "30000", int)  # keepalive ping 주기
+    firestore_keepalive_timeout_ms: int = _env("FIRESTORE_KEEPALIVE_TIMEOUT_MS", "10000", int)  # keepalive 응답 대기 시간
+    firestore_healthcheck_interval: float = _env("FIRESTORE_HEALTHCHECK_INTERVAL", "300", float)  # 헬스체크 주기(초)
+
+    # 여러 사용자 사용량 일괄 집계 방식: "collection_group"(sessions 컬렉션 그룹 쿼리 1회) 또는 "concurrent"(사용자별 동시 쿼리)
+    firestore_usage_query_mode: str = _env("FIRESTORE_USAGE_QUERY_MODE", "collection_group")
+    firestore_usage_concurrency: int = _env("FIRESTORE_USAGE_CONCURRENCY", "16", int, minimum=1)  # concurrent 방식 동시 쿼리 수
+
+    # 리스너 모드: personal_dashboard on_snapshot으로 명단을 메모리에 유지
+    firestore_listener_mode: bool = _flag("FIRESTORE_LISTENER_MODE", "false")
+    firestore_listener_check_interval: float = _env("FIRESTORE_LISTENER_CHECK_INTERVAL", "30", float)  # 리스너 연결 확인 주기(초)
+
+    # Firestore 조회 캐시 (TTL + LRU)
+    firestore_cache_max_entries: int = _env("FIRESTORE_CACHE_MAX_ENTRIES", "1024", int, minimum=1)  # 최대 캐시 항목 수
+    firestore_cache_default_ttl: float = _env("FIRESTORE_CACHE_DEFAULT_TTL", "10", float)  # 기본 TTL(초), 0 이하면 캐시 안 함
+    firestore_cache_max_bytes: int = _env("FIRESTORE_CACHE_MAX_BYTES", "67108864", int, minimum=0)  # 캐시 값 전체의 대략적인 크기 예산(바이트), 0이면 제한 없음
+    firestore_cache_max_value_bytes: int = _env("FIRESTORE_CACHE_MAX_VALUE_BYTES", "8388608", int, minimum=0)  # 항목 하나의 크기 상한(바이트), 넘으면 저장하지 않음
+    # 컬렉션별 TTL(초), "컬렉션=초,컬렉션=초" 형식
+    firestore_cache_ttls: Dict[str, float] = _mapping(
+        "FIRESTORE_CACHE_TTLS", "personal_dashboard=30,intention_app_user=10", float,
+    )
+
+    # 일별 사용량 사전 집계(rollup) 저장소
+    usage_rollup_db: str = _env("USAGE_ROLLUP_DB", str(BASE_DIR / "usage_rollup.db"))
+    usage_rollup_settle_hours: float = _env("USAGE_ROLLUP_SETTLE_HOURS", "6", float)  # 날짜 종료 후 마감으로 볼 때까지의 유예 시간
+
+    def validate(self) -> None:
+        """SMS 발송에 필요한 환경 변수가 없으면 RuntimeError"""
+        for name in ("SOLAPI_API_KEY", "SOLAPI_API_SECRET", "SENDER_PHONE"):
+            if not getattr(self, name.lower()):
+                raise RuntimeError(f"{name} 환경 변수가 설정되어 있지 않습니다.")
+
+
+settings = Settings()
+
+
+# -------------------------
+# SOLAPI 메시지 서비스 클라이언트 (첫 사용 시 생성)
+# -------------------------
+
+_message_service = None
+_message_service_lock = threading.Lock()
+
+
+def get_message_service():
+    """SOLAPI SDK 동기 클라이언트를 처음 호출할 때 만들고 이후에는 재사용한다."""
+    global _message_service
+    if _message_service is None:
+        with _message_service_lock:
+            if _message_service is None:
+                settings.validate()
+                # SDK import(pydantic 모델, HTTP 클라이언트 포함)가 무거워 첫 발송 시점으로 미룬다.
+                from solapi import SolapiMessageService
+                from solapi.services import message_service as sdk_message_service
+                from solapi_client import fetch
 
-# Firestore 설정
-FIRESTORE_PROJECT_ID = os.getenv("FIRESTORE_PROJECT_ID", "intention-computing-451401")
-FIRESTORE_DATABASE_ID = os.getenv("FIRESTORE_DATABASE_ID", "intention-computing")
-FIRESTORE_REGION = os.getenv("FIRESTORE_REGION", "asia-northeast3")
+                # 오류 응답의 HTTP 상태 코드를 남기도록 SDK의 전송 함수를 바꾼다. (요청 한도 초과 구분용)
+                sdk_message_service.default_fetcher = fetch
+                service = SolapiMessageService(api_key=settings.solapi_api_key, api_secret=settings.solapi_api_secret)
+                service.base_url = settings.solapi_base_url
+                _message_service = service
+    return _message_service
@@ -0,0 +1,775 @@
+"""coordination.py
+스케줄러 조정: 리더 선출 + 샤드 실행 기록(ledger)
+--------------------------------------------------
+uvicorn 워커가 여러 개이거나 서버가 여러 대여도 정기 알림이 한 번만 실행되도록 한다.
+
+- 리더 선출: 리스(lease)를 가진 프로세스 하나만 cron 작업을 실행한다. 리더는 SCHEDULER_HEARTBEAT_INTERVAL
+  마다 리스를 갱신하고, 갱신이 SCHEDULER_LEASE_TTL 동안 끊기면 다른 프로세스가 리스를 인계받는다.
+- 샤드 실행: 리더는 실행 1회를 run_id(작업:날짜)로 기록하고 사용자 목록을 user_id 해시 구간으로 나눈
+  샤드들을 등록한다. 모든 프로세스의 ShardWorker가 샤드를 하나씩 가져가 처리하고 결과를 기록하며,
+  마지막 샤드를 끝낸 프로세스가 실행 결과를 한 번만 합산(finalize)한다.
+- run_id가 같은 실행은 다시 등록되지 않으므로, 리더 인계 직후 놓친 실행을 다시 시작해도 중복 발송되지 않는다.
+- 리더는 실행을 등록할 때 샤드별 입력(정기 알림은 샤드의 명단)을 함께 저장할 수 있다. 샤드는 이를 읽어 처리하므로
+  샤드마다 전체 명단을 다시 조회하지 않는다. 저장된 입력은 실행을 합산(finalize)할 때 지운다.
+
+저장소는 SCHEDULER_COORDINATION으로 고른다.
+- sqlite   : 같은 서버의 워커 프로세스 간 조정 (SCHEDULER_DB 파일 공유)
+- firestore: 여러 서버 간 조정 (트랜잭션으로 리스/샤드 상태 변경)
+- none     : 조정 없이 프로세스마다 스케줄러 실행 (기존 방식)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from config import settings
+from logging_setup import log_context
+
+__all__ = [
+    "shard_of",
+    "SQLiteCoordinator",
+    "FirestoreCoordinator",
+    "LeaderElector",
+    "ShardWorker",
+    "coordinator",
+    "holder_id",
+]
+
+logger = logging.getLogger(__name__)
+
+# 샤드 상태
+SHARD_PENDING = "pending"
+SHARD_CLAIMED = "claimed"
+SHARD_DONE = "done"
+SHARD_FAILED = "failed"
+
+# Firestore 문서 크기 한도(1MiB)보다 작게 샤드 입력을 나눠 저장하는 문서당 크기
+_PAYLOAD_CHUNK_BYTES = 512 * 1024
+
+# 이 프로세스의 리스/샤드 소유자 ID
+holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def shard_of(key: str, shard_count: int) -> int:
+    """
+    key의 안정적인 32비트 해시를 shard_count개의 연속 구간으로 나눠 샤드 번호를 반환한다.
+    (프로세스/서버와 관계없이 같은 key는 항상 같은 샤드)
+    """
+    if shard_count <= 1:
+        return 0
+    digest = int.from_bytes(hashlib.md5(str(key).encode("utf-8")).digest()[:4], "big")
+    return digest * shard_count >> 32
+
+
+def _chunk_json(items: list, max_bytes: int) -> List[str]:
+    """목록을 각각 max_bytes 안팎의 JSON 배열 문자열로 나눈다. (항목 하나가 더 크면 그 항목만 담음)"""
+    chunks, current, size = [], [], 0
+    for item in items:
+        encoded = json.dumps(item, ensure_ascii=False)
+        encoded_size = len(encoded.encode("utf-8")) + 1
+        if current and size + encoded_size > max_bytes:
+            chunks.append("[" + ",".join(current) + "]")
+            current, size = [], 0
+        current.append(encoded)
+        size += encoded_size
+    if current or not chunks:
+        chunks.append("[" + ",".join(current) + "]")
+    return chunks
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _aggregate(run_id: str, job_name: str, shards: List[dict]) -> dict:
+    """샤드 결과(total/success/failed)를 합산한다."""
+    summary = {"run_id": run_id, "job_name": job_name, "total": 0, "success": 0, "failed": 0,
+               "failed_shards": [shard["shard"] for shard in shards if shard["status"] == SHARD_FAILED]}
+    for shard in shards:
+        for key in ("total", "success", "failed"):
+            summary[key] += (shard.get("result") or {}).get(key, 0)
+    return summary
+
+
+class SQLiteCoordinator:
+    """
+    SQLite 파일 하나로 같은 서버의 프로세스들을 조정한다.
+    읽고 바꾸는 작업은 BEGIN IMMEDIATE 트랜잭션으로 처리해 프로세스 간에도 원자적으로 동작한다.
+    """
+
+    def __init__(self, path: str, shard_max_attempts: int = settings.scheduler_shard_max_attempts):
+        self.path = str(path)
+        self.shard_max_attempts = shard_max_attempts
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS leases (
+                    name TEXT PRIMARY KEY,
+                    holder TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    acquired_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id TEXT PRIMARY KEY,
+                    job_name TEXT NOT NULL,
+                    shard_count INTEGER NOT NULL,
+                    params TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    finalized_at TEXT,
+                    summary TEXT
+                );
+                CREATE TABLE IF NOT EXISTS run_shards (
+                    run_id TEXT NOT NULL,
+                    shard INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    holder TEXT,
+                    lease_expires_at REAL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    result TEXT,
+                    error TEXT,
+                    updated_at TEXT NOT NULL,
+                    PRIMARY KEY (run_id, shard)
+                );
+                CREATE INDEX IF NOT EXISTS idx_run_shards_status ON run_shards (status, lease_expires_at);
+                CREATE TABLE IF NOT EXISTS run_shard_payloads (
+                    run_id TEXT NOT NULL,
+                    shard INTEGER NOT NULL,
+                    payload TEXT NOT NULL,
+                    PRIMARY KEY (run_id, shard)
+                );
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            else:
+                conn.execute("COMMIT")
+
+    # --- 리더 리스 ---
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """리스가 비었거나 만료되었거나 이미 holder 것이면 (갱신하여) 획득하고 True"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            if row is not None and row[0] != holder and row[1] > now:
+                return False
+            if row is not None and row[0] == holder:
+                conn.execute("UPDATE leases SET expires_at = ? WHERE name = ?", (now + ttl, name))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO leases (name, holder, expires_at, acquired_at) VALUES (?, ?, ?, ?)",
+                    (name, holder, now + ttl, _now_iso()),
+                )
+            return True
+
+    def release_lease(self, name: str, holder: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def lease(self, name: str) -> Optional[dict]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT holder, expires_at, acquired_at FROM leases WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return {"holder": row[0], "expires_in": round(row[1] - time.time(), 1), "acquired_at": row[2]}
+
+    # --- 실행 기록 ---
+
+    def has_run(self, run_id: str) -> bool:
+        with self._lock:
+            row = self._connection().execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return row is not None
+
+    def create_run(self, run_id: str, job_name: str, shard_count: int, params: dict,
+                   shard_payloads: Optional[List[list]] = None) -> bool:
+        """실행과 샤드들(과 샤드별 입력)을 등록한다. 같은 run_id가 이미 있으면 False"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, job_name, shard_count, params, created_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, job_name, shard_count, json.dumps(params, ensure_ascii=False), _now_iso()),
+            )
+            if not cursor.rowcount:
+                return False
+            conn.executemany(
+                "INSERT INTO run_shards (run_id, shard, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(run_id, shard, SHARD_PENDING, _now_iso()) for shard in range(shard_count)],
+            )
+            if shard_payloads is not None:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO run_shard_payloads (run_id, shard, payload) VALUES (?, ?, ?)",
+                    [(run_id, shard, json.dumps(payload, ensure_ascii=False))
+                     for shard, payload in enumerate(shard_payloads)],
+                )
+            return True
+
+    def shard_payload(self, run_id: str, shard: int) -> Optional[list]:
+        """실행 등록 시 저장한 샤드 입력. 저장하지 않았으면 None"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT payload FROM run_shard_payloads WHERE run_id = ? AND shard = ?", (run_id, shard)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def claim_shard(self, holder: str, ttl: float) -> Optional[dict]:
+        """처리할 샤드(대기 중이거나 리스가 만료된 샤드)를 하나 가져온다. 없으면 None"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT s.run_id, s.shard, s.attempts, r.job_name, r.shard_count, r.params "
+                "FROM run_shards s JOIN runs r ON r.run_id = s.run_id "
+                "WHERE s.status = ? OR (s.status = ? AND s.lease_expires_at <= ?) "
+                "ORDER BY r.created_at, s.shard LIMIT 1",
+                (SHARD_PENDING, SHARD_CLAIMED, now),
+            ).fetchone()
+            if row is None:
+                return None
+            run_id, shard, attempts, job_name, shard_count, params = row
+            if attempts >= self.shard_max_attempts:
+                # 처리 중 프로세스가 반복해서 죽은 샤드는 실패로 기록하고 넘어간다.
+                conn.execute(
+                    "UPDATE run_shards SET status = ?, error = ?, updated_at = ? WHERE run_id = ? AND shard = ?",
+                    (SHARD_FAILED, "최대 시도 횟수 초과", _now_iso(), run_id, shard),
+                )
+                return {"run_id": run_id, "shard": shard, "exhausted": True}
+            conn.execute(
+                "UPDATE run_shards SET status = ?, holder = ?, lease_expires_at = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE run_id = ? AND shard = ?",
+                (SHARD_CLAIMED, holder, now + ttl, _now_iso(), run_id, shard),
+            )
+        return {"run_id": run_id, "shard": shard, "shard_count": shard_count, "job_name": job_name,
+                "params": json.loads(params), "attempt": attempts + 1}
+
+    def renew_shard(self, run_id: str, shard: int, holder: str, ttl: float) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE run_shards SET lease_expires_at = ? WHERE run_id = ? AND shard = ? AND holder = ? AND status = ?",
+                (time.time() + ttl, run_id, shard, holder, SHARD_CLAIMED),
+            )
+        return cursor.rowcount == 1
+
+    def complete_shard(self, run_id: str, shard: int, holder: str, result: dict) -> bool:
+        """샤드 결과를 기록한다. 리스를 잃어 다른 프로세스가 가져간 샤드면 False"""
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE run_shards SET status = ?, result = ?, error = NULL, updated_at = ? "
+                "WHERE run_id = ? AND shard = ? AND holder = ? AND status = ?",
+                (SHARD_DONE, json.dumps(result), _now_iso(), run_id, shard, holder, SHARD_CLAIMED),
+            )
+        return cursor.rowcount == 1
+
+    def fail_shard(self, run_id: str, shard: int, holder: str, error: str) -> None:
+        """샤드 처리 실패: 시도 횟수가 남았으면 다시 대기 상태로, 아니면 실패로 기록한다."""
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE run_shards SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "holder = NULL, lease_expires_at = NULL, error = ?, updated_at = ? "
+                "WHERE run_id = ? AND shard = ? AND holder = ? AND status = ?",
+                (self.shard_max_attempts, SHARD_FAILED, SHARD_PENDING, error, _now_iso(),
+                 run_id, shard, holder, SHARD_CLAIMED),
+            )
+
+    def finalize_run(self, run_id: str) -> Optional[dict]:
+        """모든 샤드가 끝났고 아직 합산하지 않은 실행이면 합산 결과를 기록하고 반환한다. (실행당 한 번)"""
+        with self._transaction() as conn:
+            run = conn.execute("SELECT job_name, finalized_at FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            if run is None or run[1] is not None:
+                return None
+            rows = conn.execute(
+                "SELECT shard, status, result FROM run_shards WHERE run_id = ? ORDER BY shard", (run_id,)
+            ).fetchall()
+            if any(status not in (SHARD_DONE, SHARD_FAILED) for _, status, _ in rows):
+                return None
+            shards = [{"shard": shard, "status": status, "result": json.loads(result) if result else None}
+                      for shard, status, result in rows]
+            summary = _aggregate(run_id, run[0], shards)
+            conn.execute(
+                "UPDATE runs SET finalized_at = ?, summary = ? WHERE run_id = ?",
+                (_now_iso(), json.dumps(summary, ensure_ascii=False), run_id),
+            )
+            conn.execute("DELETE FROM run_shard_payloads WHERE run_id = ?", (run_id,))
+            return summary
+
+    def runs(self, limit: int = 10) -> List[dict]:
+        """최근 실행과 샤드 상태"""
+        with self._lock:
+            conn = self._connection()
+            runs = conn.execute(
+                "SELECT run_id, job_name, shard_count, created_at, finalized_at, summary FROM runs "
+                "ORDER BY created_at DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+            shards = {}
+            for run_id, *_ in runs:
+                shards[run_id] = [
+                    {"shard": shard, "status": status, "holder": holder, "attempts": attempts,
+                     "result": json.loads(result) if result else None, "error": error}
+                    for shard, status, holder, attempts, result, error in conn.execute(
+                        "SELECT shard, status, holder, attempts, result, error FROM run_shards "
+                        "WHERE run_id = ? ORDER BY shard",
+                        (run_id,),
+                    )
+                ]
+        return [
+            {"run_id": run_id, "job_name": job_name, "shard_count": shard_count, "created_at": created_at,
+             "finalized_at": finalized_at, "summary": json.loads(summary) if summary else None,
+             "shards": shards[run_id]}
+            for run_id, job_name, shard_count, created_at, finalized_at, summary in runs
+        ]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class FirestoreCoordinator:
+    """
+    Firestore 문서로 여러 서버의 프로세스들을 조정한다.
+    리스는 {collection}_leases/{name}, 실행은 {collection}_runs/{run_id} 문서(샤드 상태는 shards 맵)에 저장하고
+    모든 상태 변경은 트랜잭션으로 처리한다.
+    샤드 입력은 문서 크기 한도를 넘지 않도록 나눠 {collection}_runs/{run_id}/payloads 하위 문서에 저장하고,
+    실행 문서에는 저장 토큰과 샤드별 문서 수만 기록한다.
+    """
+
+    def __init__(self, collection: str, shard_max_attempts: int = settings.scheduler_shard_max_attempts):
+        self.collection = collection
+        self.shard_max_attempts = shard_max_attempts
+
+    def _db(self):
+        from firestore_client import get_firestore_client
+        return get_firestore_client()
+
+    def _lease_ref(self, name: str):
+        return self._db().collection(f"{self.collection}_leases").document(name)
+
+    def _run_ref(self, run_id: str):
+        return self._db().collection(f"{self.collection}_runs").document(run_id)
+
+    def _in_transaction(self, func, *args):
+        from google.cloud import firestore
+        return firestore.transactional(func)(self._db().transaction(), *args)
+
+    # --- 리더 리스 ---
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        def acquire(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            now = time.time()
+            data = snapshot.to_dict() if snapshot.exists else None
+            if data is not None and data["holder"] != holder and data["expires_at"] > now:
+                return False
+            acquired_at = data["acquired_at"] if data is not None and data["holder"] == holder else _now_iso()
+            transaction.set(ref, {"holder": holder, "expires_at": now + ttl, "acquired_at": acquired_at})
+            return True
+        return self._in_transaction(acquire, self._lease_ref(name))
+
+    def release_lease(self, name: str, holder: str) -> None:
+        def release(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            if snapshot.exists and snapshot.to_dict().get("holder") == holder:
+                transaction.delete(ref)
+        self._in_transaction(release, self._lease_ref(name))
+
+    def lease(self, name: str) -> Optional[dict]:
+        snapshot = self._lease_ref(name).get()
+        data = snapshot.to_dict() if snapshot.exists else None
+        if data is None or data["expires_at"] <= time.time():
+            return None
+        return {"holder": data["holder"], "expires_in": round(data["expires_at"] - time.time(), 1),
+                "acquired_at": data["acquired_at"]}
+
+    # --- 실행 기록 ---
+
+    def has_run(self, run_id: str) -> bool:
+        return self._run_ref(run_id).get().exists
+
+    def _write_payloads(self, run_ref, token: str, shard_payloads: List[list]) -> Dict[str, int]:
+        """샤드 입력을 나눠 payloads 하위 문서로 저장하고 샤드별 문서 수를 반환한다."""
+        collection = run_ref.collection("payloads")
+        counts, batch, pending = {}, self._db().batch(), 0
+        for shard, payload in enumerate(shard_payloads):
+            chunks = _chunk_json(payload, _PAYLOAD_CHUNK_BYTES)
+            counts[str(shard)] = len(chunks)
+            for index, chunk in enumerate(chunks):
+                batch.set(collection.document(f"{token}-{shard}-{index}"), {"data": chunk})
+                pending += 1
+                if pending >= 100:
+                    batch.commit()
+                    batch, pending = self._db().batch(), 0
+        if pending:
+            batch.commit()
+        return counts
+
+    def _delete_payloads(self, run_ref, token: str, counts: Dict[str, int]) -> None:
+        collection = run_ref.collection("payloads")
+        for shard, count in counts.items():
+            for index in range(count):
+                collection.document(f"{token}-{shard}-{index}").delete()
+
+    def create_run(self, run_id: str, job_name: str, shard_count: int, params: dict,
+                   shard_payloads: Optional[List[list]] = None) -> bool:
+        ref = self._run_ref(run_id)
+        payload = None
+        if shard_payloads is not None:
+            # 트랜잭션 쓰기 한도를 넘지 않도록 입력은 먼저 저장하고, 실행 문서를 만들지 못하면 지운다.
+            token = uuid.uuid4().hex[:12]
+            payload = {"token": token, "chunks": self._write_payloads(ref, token, shard_payloads)}
+
+        def create(transaction, ref):
+            if ref.get(transaction=transaction).exists:
+                return False
+            transaction.set(ref, {
+                "job_name": job_name,
+                "shard_count": shard_count,
+                "params": params,
+                "payload": payload,
+                "created_at": _now_iso(),
+                "finalized": False,
+                "finalized_at": None,
+                "summary": None,
+                "shards": {
+                    str(shard): {"status": SHARD_PENDING, "holder": None, "lease_expires_at": None,
+                                 "attempts": 0, "result": None, "error": None}
+                    for shard in range(shard_count)
+                },
+            })
+            return True
+
+        created = self._in_transaction(create, ref)
+        if not created and payload is not None:
+            self._delete_payloads(ref, payload["token"], payload["chunks"])
+        return created
+
+    def shard_payload(self, run_id: str, shard: int) -> Optional[list]:
+        """실행 등록 시 저장한 샤드 입력. 저장하지 않았으면 None"""
+        ref = self._run_ref(run_id)
+        snapshot = ref.get()
+        payload = (snapshot.to_dict() or {}).get("payload") if snapshot.exists else None
+        if not payload or str(shard) not in payload["chunks"]:
+            return None
+        collection = ref.collection("payloads")
+        refs = [collection.document(f"{payload['token']}-{shard}-{index}")
+                for index in range(payload["chunks"][str(shard)])]
+        chunks = {chunk.id: chunk.to_dict()["data"] for chunk in self._db().get_all(refs) if chunk.exists}
+        if len(chunks) != len(refs):
+            return None
+        return [item for chunk_ref in refs for item in json.loads(chunks[chunk_ref.id])]
+
+    def claim_shard(self, holder: str, ttl: float) -> Optional[dict]:
+        def claim(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            data = snapshot.to_dict()
+            now = time.time()
+            for key in sorted(data["shards"], key=int):
+                shard = data["shards"][key]
+                if shard["status"] == SHARD_PENDING or (
+                        shard["status"] == SHARD_CLAIMED and shard["lease_expires_at"] <= now):
+                    if shard["attempts"] >= self.shard_max_attempts:
+                        transaction.update(ref, {f"shards.`{key}`.status": SHARD_FAILED,
+                                                 f"shards.`{key}`.error": "최대 시도 횟수 초과"})
+                        return {"run_id": ref.id, "shard": int(key), "exhausted": True}
+                    transaction.update(ref, {
+                        f"shards.`{key}`.status": SHARD_CLAIMED,
+                        f"shards.`{key}`.holder": holder,
+                        f"shards.`{key}`.lease_expires_at": now + ttl,
+                        f"shards.`{key}`.attempts": shard["attempts"] + 1,
+                    })
+                    return {"run_id": ref.id, "shard": int(key), "shard_count": data["shard_count"],
+                            "job_name": data["job_name"], "params": data["params"], "attempt": shard["attempts"] + 1}
+            return None
+
+        runs = self._db().collection(f"{self.collection}_runs").where("finalized", "==", False).stream()
+        for snapshot in sorted(runs, key=lambda snapshot: snapshot.get("created_at")):
+            claimed = self._in_transaction(claim, snapshot.reference)
+            if claimed is not None:
+                return claimed
+        return None
+
+    def _update_own_shard(self, run_id: str, shard: int, holder: str, changes: Callable[[dict], dict]) -> bool:
+        def update(transaction, ref):
+            data = ref.get(transaction=transaction).to_dict()
+            current = data["shards"][str(shard)]
+            if current["holder"] != holder or current["status"] != SHARD_CLAIMED:
+                return False
+            transaction.update(ref, {f"shards.`{shard}`.{field}": value for field, value in changes(current).items()})
+            return True
+        return self._in_transaction(update, self._run_ref(run_id))
+
+    def renew_shard(self, run_id: str, shard: int, holder: str, ttl: float) -> bool:
+        return self._update_own_shard(run_id, shard, holder, lambda _: {"lease_expires_at": time.time() + ttl})
+
+    def complete_shard(self, run_id: str, shard: int, holder: str, result: dict) -> bool:
+        return self._update_own_shard(run_id, shard, holder,
+                                      lambda _: {"status": SHARD_DONE, "result": result, "error": None})
+
+    def fail_shard(self, run_id: str, shard: int, holder: str, error: str) -> None:
+        self._update_own_shard(run_id, shard, holder, lambda current: {
+            "status": SHARD_FAILED if current["attempts"] >= self.shard_max_attempts else SHARD_PENDING,
+            "holder": None,
+            "lease_expires_at": None,
+            "error": error,
+        })
+
+    def finalize_run(self, run_id: str) -> Optional[dict]:
+        def finalize(transaction, ref):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            data = snapshot.to_dict()
+            if data["finalized"]:
+                return None
+            shards = [{"shard": int(key), **value} for key, value in sorted(data["shards"].items(), key=lambda kv: int(kv[0]))]
+            if any(shard["status"] not in (SHARD_DONE, SHARD_FAILED) for shard in shards):
+                return None
+            summary = _aggregate(run_id, data["job_name"], shards)
+            transaction.update(ref, {"finalized": True, "finalized_at": _now_iso(), "summary": summary,
+                                     "payload": None})
+            return summary, data.get("payload")
+
+        ref = self._run_ref(run_id)
+        finalized = self._in_transaction(finalize, ref)
+        if finalized is None:
+            return None
+        summary, payload = finalized
+        if payload:
+            try:
+                self._delete_payloads(ref, payload["token"], payload["chunks"])
+            except Exception as e:
+                logger.warning("샤드 입력 삭제 실패 (%s): %s", run_id, e)
+        return summary
+
+    def runs(self, limit: int = 10) -> List[dict]:
+        from google.cloud import firestore
+        query = (self._db().collection(f"{self.collection}_runs")
+                 .order_by("created_at", direction=firestore.Query.DESCENDING).limit(limit))
+        runs = []
+        for snapshot in query.stream():
+            data = snapshot.to_dict()
+            runs.append({
+                "run_id": snapshot.id,
+                "job_name": data["job_name"],
+                "shard_count": data["shard_count"],
+                "created_at": data["created_at"],
+                "finalized_at": data.get("finalized_at"),
+                "summary": data.get("summary"),
+                "shards": [
+                    {"shard": int(key), "status": value["status"], "holder": value["holder"],
+                     "attempts": value["attempts"], "result": value["result"], "error": value["error"]}
+                    for key, value in sorted(data["shards"].items(), key=lambda kv: int(kv[0]))
+                ],
+            })
+        return runs
+
+    def close(self) -> None:
+        pass
+
+
+class LeaderElector:
+    """
+    heartbeat_interval마다 리스를 획득/갱신하고, 리더가 되거나 리더 자격을 잃으면 콜백을 호출한다.
+
+    Args:
+        coordinator: 리스 저장소
+        name: 리스 이름
+        on_elected / on_demoted: 리더가 될 때 / 리더 자격을 잃을 때 호출 (heartbeat 스레드에서 실행)
+    """
+
+    def __init__(self, coordinator, name: str, on_elected: Callable[[], None], on_demoted: Callable[[], None],
+                 ttl: float = settings.scheduler_lease_ttl,
+                 heartbeat_interval: float = settings.scheduler_heartbeat_interval,
+                 holder: str = holder_id):
+        self.coordinator = coordinator
+        self.name = name
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.ttl = ttl
+        self.heartbeat_interval = heartbeat_interval
+        self.holder = holder
+        self.is_leader = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self) -> None:
+        try:
+            held = self.coordinator.acquire_lease(self.name, self.holder, self.ttl)
+        except Exception as e:
+            # 저장소에 접근할 수 없으면 리스를 갱신했다고 볼 수 없으므로 리더 자격을 내려놓는다.
+            logger.warning("리스 갱신 실패: %s", e)
+            held = False
+        if held and not self.is_leader:
+            self.is_leader = True
+            logger.info("%s 가 스케줄러 리더가 되었습니다.", self.holder)
+            self.on_elected()
+        elif not held and self.is_leader:
+            self.is_leader = False
+            logger.warning("%s 가 스케줄러 리더 자격을 잃었습니다.", self.holder)
+            self.on_demoted()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._heartbeat()
+            self._stop.wait(self.heartbeat_interval)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.heartbeat_interval + 5)
+        if self.is_leader:
+            self.is_leader = False
+            self.on_demoted()
+            try:
+                self.coordinator.release_lease(self.name, self.holder)
+            except Exception as e:
+                logger.warning("리스 반환 실패: %s", e)
+
+
+class ShardWorker:
+    """
+    실행 기록에서 샤드를 가져와 작업별 처리 함수로 실행하고 결과를 기록한다. 모든 프로세스에서 실행된다.
+
+    Args:
+        coordinator: 실행 기록 저장소
+        handlers: job_name -> handler(params, shard, shard_count) -> {"total", "success", "failed"}
+        on_finalized: 실행의 모든 샤드가 끝났을 때 합산 결과로 한 번 호출
+    """
+
+    def __init__(self, coordinator, handlers: Dict[str, Callable], on_finalized: Callable[[dict], None],
+                 lease_ttl: float = settings.scheduler_shard_lease_ttl,
+                 poll_interval: float = settings.scheduler_shard_poll_interval,
+                 holder: str = holder_id):
+        self.coordinator = coordinator
+        self.handlers = handlers
+        self.on_finalized = on_finalized
+        self.lease_ttl = lease_ttl
+        self.poll_interval = poll_interval
+        self.holder = holder
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="shard-worker", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        """새 실행이 등록되었을 때 다음 확인 주기를 기다리지 않고 샤드를 가져가게 한다."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                while not self._stop.is_set() and self.run_once():
+                    pass
+            except Exception as e:
+                logger.exception("샤드 처리 중 오류 발생: %s", e)
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def run_once(self) -> bool:
+        """샤드 하나를 가져와 처리한다. 처리할 샤드가 없으면 False"""
+        claim = self.coordinator.claim_shard(self.holder, self.lease_ttl)
+        if claim is None:
+            return False
+        if not claim.get("exhausted"):
+            self._process(claim)
+        self._finalize(claim["run_id"])
+        return True
+
+    def _process(self, claim: dict) -> None:
+        # 샤드 처리 중 남기는 로그(캠페인/사용자별 포함)에 run_id/shard를 붙인다.
+        with log_context(run_id=claim["run_id"], shard=claim["shard"], attempt=claim["attempt"]):
+            self._process_claim(claim)
+
+    def _process_claim(self, claim: dict) -> None:
+        run_id, shard, shard_count = claim["run_id"], claim["shard"], claim["shard_count"]
+        handler = self.handlers.get(claim["job_name"])
+        renewer_stop = threading.Event()
+
+        def renew():
+            # 처리 시간이 리스보다 길어져도 다른 프로세스가 가져가지 않도록 주기적으로 연장
+            while not renewer_stop.wait(self.lease_ttl / 3):
+                try:
+                    self.coordinator.renew_shard(run_id, shard, self.holder, self.lease_ttl)
+                except Exception as e:
+                    logger.warning("샤드 리스 연장 실패 (%s #%d): %s", run_id, shard, e)
+
+        renewer = threading.Thread(target=renew, name="shard-lease-renewer", daemon=True)
+        renewer.start()
+        logger.info("샤드 처리 시작: %s #%d/%d (시도 %d)", run_id, shard, shard_count, claim['attempt'])
+        try:
+            if handler is None:
+                raise RuntimeError(f"등록되지 않은 작업입니다: {claim['job_name']}")
+            result = handler(claim["params"], shard, shard_count)
+        except Exception as e:
+            logger.error("샤드 처리 실패: %s #%d: %s", run_id, shard, e)
+            self.coordinator.fail_shard(run_id, shard, self.holder, str(e))
+        else:
+            if not self.coordinator.complete_shard(run_id, shard, self.holder, result):
+                logger.warning("샤드 리스를 잃어 결과를 기록하지 못했습니다: %s #%d", run_id, shard)
+        finally:
+            renewer_stop.set()
+
+    def _finalize(self, run_id: str) -> None:
+        summary = self.coordinator.finalize_run(run_id)
+        if summary is not None:
+            self.on_finalized(summary)
+
+    def stop(self) -> None:
+        """처리 중인 샤드가 끝나면 멈춘다. (끝나지 않은 샤드는 리스 만료 후 다른 프로세스가 이어받음)"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(30)
+
+
+def _create_coordinator():
+    if settings.scheduler_coordination == "sqlite":
+        return SQLiteCoordinator(settings.scheduler_db)
+    if settings.scheduler_coordination == "firestore":
+        return FirestoreCoordinator(settings.scheduler_firestore_collection)
+    if settings.scheduler_coordination != "none":
+        logger.warning("알 수 없는 SCHEDULER_COORDINATION 값입니다: %s (none으로 동작)", settings.scheduler_coordination)
+    return None
+
+
+# 조정 저장소 (none이면 None: 프로세스마다 스케줄러를 직접 실행)
+coordinator = _create_coordinator()
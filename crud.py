@@ -1,20 +1,614 @@
 """crud.py
 수신자(전화번호) 로컬 저장/로드 헬퍼
+-------------------------------------
+수신자 목록은 프로세스 시작 후 한 번만 읽어 메모리에 보관한다.
+- 등록 순서 목록과 번호 → 위치 dict를 함께 보관 (중복/존재 확인과 페이지 커서 위치 찾기 O(1))
+- 추가는 append-only 로그(RECIPIENT_LOG_FILE)에 한 줄씩 기록 (전체 파일을 다시 쓰지 않음)
+- 로그가 RECIPIENT_LOG_COMPACT_THRESHOLD 줄을 넘으면 백그라운드에서 스냅샷(RECIPIENT_FILE)으로 압축
+- 스냅샷은 임시 파일에 쓴 뒤 rename하여 원자적으로 교체
+
+시작 시 복구 순서: 스냅샷 → 압축 중이던 로그(.compacting) → 현재 로그.
+
+여러 워커 프로세스(uvicorn --workers N)가 같은 파일을 쓸 수 있도록 모든 읽기/쓰기는 파일 잠금(.lock, flock) 안에서 하고,
+그 전에 다른 프로세스가 남긴 변경을 반영한다. (로그에 추가된 줄만 이어 읽고, 압축/교체되었으면 다시 읽음)
+
+RECIPIENT_BACKEND=sqlite 이면 같은 인터페이스의 SQLite 저장소(SQLiteRecipientStore)를 사용하며,
+수신자 메타데이터/수신 거부 여부와 메시지별 발송 이력(deliveries)을 함께 보관한다.
 """
 
+import csv
 import json
-from typing import List
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:     # Windows: 프로세스 간 잠금 없이 동작 (단일 워커 전용)
+    fcntl = None
+
+from config import settings
+from models import normalize_phone_numbers
+
+__all__ = ["RecipientStore", "SQLiteRecipientStore", "recipient_store", "load_recipients", "save_recipients",
+           "import_recipients"]
+
+logger = logging.getLogger(__name__)
+
+
+# 로그 한 줄 인코더 (json.dumps에 옵션을 주면 호출마다 인코더를 새로 만드므로 재사용)
+_log_encoder = json.JSONEncoder(ensure_ascii=False)
+
+
+def _stat_key(path: Path) -> Optional[tuple]:
+    """파일이 바뀌었는지 비교하기 위한 (inode, mtime, 크기). 파일이 없으면 None"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+def _index_extend(recipients: dict, order: List[str], phones: Iterable[str]) -> List[str]:
+    """등록되지 않은 번호를 목록 끝에 추가하고 위치를 기록한다. 새로 추가된 번호를 입력 순서대로 반환"""
+    added = []
+    for phone in phones:
+        if phone not in recipients:
+            recipients[phone] = len(order)
+            order.append(phone)
+            added.append(phone)
+    return added
+
+
+def _write_atomic(path: Path, recipients: List[str]) -> None:
+    """임시 파일에 기록한 뒤 rename하여 파일을 원자적으로 교체한다."""
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(recipients, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class RecipientStore:
+    def __init__(self, snapshot_path: Path, log_path: Path, compact_threshold: int):
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = Path(log_path)
+        self.compact_threshold = compact_threshold
+        self._recipients = None      # phone -> 등록 순서 목록(self._order)에서의 위치
+        self._order = None
+        self._log = None
+        self._log_lines = 0
+        self._log_inode = None       # 열어 둔 로그 파일 (다른 프로세스가 압축/교체했는지 확인용)
+        self._log_offset = 0         # 메모리에 반영한 로그 바이트 수
+        self._snapshot_key = None    # 마지막으로 읽거나 쓴 스냅샷의 (inode, mtime, 크기)
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+
+    @property
+    def _compacting_path(self) -> Path:
+        return self.log_path.with_name(self.log_path.name + ".compacting")
+
+    @contextmanager
+    def _file_lock(self):
+        """
+        같은 파일을 쓰는 다른 프로세스(uvicorn --workers N)와의 배타 잠금. (self._lock 보유 상태에서 사용)
+        flock은 열린 파일 단위로 걸리므로 스레드 간 배타는 self._lock이 맡는다.
+        """
+        if fcntl is None:
+            yield
+            return
+        if self._lock_file is None:
+            self._lock_file = open(self.log_path.with_name(self.log_path.name + ".lock"), "a")
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _sync(self) -> None:
+        """
+        메모리 인덱스를 파일과 맞춘다. (self._lock과 파일 잠금 보유 상태에서 호출)
+        다른 프로세스가 로그에 추가한 줄은 이어서 반영하고, 스냅샷이 바뀌었거나
+        로그가 교체/축소(압축, replace_all)되었으면 처음부터 다시 읽는다.
+        """
+        if self._recipients is not None and _stat_key(self.snapshot_path) == self._snapshot_key:
+            try:
+                log_stat = os.stat(self.log_path)
+            except FileNotFoundError:
+                log_stat = None
+            if (log_stat is not None and log_stat.st_ino == self._log_inode
+                    and log_stat.st_size >= self._log_offset):
+                if log_stat.st_size > self._log_offset:
+                    lines, self._log_offset = self._replay(
+                        self.log_path, self._recipients, self._order, self._log_offset
+                    )
+                    self._log_lines += lines
+                return
+        self._load()
+
+    def _load(self) -> None:
+        """스냅샷과 로그를 읽어 메모리 인덱스를 새로 만든다. (self._lock과 파일 잠금 보유 상태에서 호출)"""
+        recipients, order = {}, []
+        if self.snapshot_path.exists():
+            with open(self.snapshot_path, "r", encoding="utf-8") as f:
+                _index_extend(recipients, order, json.load(f))
+        if self._compacting_path.exists():
+            # 이전 압축이 끝나지 못한 경우: 반영 후 바로 스냅샷으로 저장
+            self._replay(self._compacting_path, recipients, order)
+            _write_atomic(self.snapshot_path, order)
+            self._compacting_path.unlink()
+        self._log_lines, self._log_offset = self._replay(self.log_path, recipients, order)
+        self._recipients, self._order = recipients, order
+        self._snapshot_key = _stat_key(self.snapshot_path)
+        self._open_log()
+
+    def _open_log(self, truncate: bool = False) -> None:
+        # 항상 추가 모드로 연다. (다른 프로세스가 같은 로그 끝에 쓰므로 "w" 핸들의 위치에 쓰면 덮어씀)
+        if self._log is not None:
+            self._log.close()
+        if truncate:
+            open(self.log_path, "w").close()
+            self._log_offset = 0
+            self._log_lines = 0
+        self._log = open(self.log_path, "a", encoding="utf-8")
+        self._log_inode = os.fstat(self._log.fileno()).st_ino
+
+    def _append(self, phones: List[str]) -> None:
+        """로그에 추가 기록을 남긴다. (self._lock과 파일 잠금 보유 상태에서 호출)"""
+        self._log.write("".join(_log_encoder.encode({"op": "add", "phone": phone}) + "\n" for phone in phones))
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self._log_offset = os.fstat(self._log.fileno()).st_size
+        self._log_lines += len(phones)
+
+    @staticmethod
+    def _replay(path: Path, recipients: dict, order: List[str], offset: int = 0) -> Tuple[int, int]:
+        """로그를 offset 바이트부터 반영한다. (반영한 줄 수, 읽은 끝 위치)"""
+        if not path.exists():
+            return 0, 0
+        lines = 0
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 비정상 종료로 잘린 마지막 줄은 무시
+                    continue
+                if entry.get("op") == "add":
+                    _index_extend(recipients, order, (entry["phone"],))
+                lines += 1
+            return lines, f.tell()
+
+    def add(self, phone: str) -> bool:
+        """수신자를 추가한다. 이미 등록된 번호면 False"""
+        with self._lock, self._file_lock():
+            self._sync()
+            if phone in self._recipients:
+                return False
+            self._append([phone])
+            _index_extend(self._recipients, self._order, (phone,))
+            needs_compaction = self._log_lines >= self.compact_threshold
+        if needs_compaction:
+            self._schedule_compaction()
+        return True
+
+    def add_many(self, phones: Iterable[str]) -> List[str]:
+        """여러 수신자를 한 번의 로그 기록으로 추가하고, 새로 추가된 번호를 입력 순서대로 반환한다."""
+        with self._lock, self._file_lock():
+            self._sync()
+            added = _index_extend(self._recipients, self._order, phones)
+            if added:
+                self._append(added)
+            needs_compaction = self._log_lines >= self.compact_threshold
+        if needs_compaction:
+            self._schedule_compaction()
+        return added
+
+    def __contains__(self, phone: str) -> bool:
+        with self._lock, self._file_lock():
+            self._sync()
+            return phone in self._recipients
+
+    def __len__(self) -> int:
+        with self._lock, self._file_lock():
+            self._sync()
+            return len(self._recipients)
+
+    def list(self) -> List[str]:
+        with self._lock, self._file_lock():
+            self._sync()
+            return list(self._order)
+
+    def page(self, limit: int, start_after: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """등록 순서대로 start_after 다음부터 limit개를 반환한다. (목록, 다음 커서)"""
+        with self._lock, self._file_lock():
+            self._sync()
+            start = 0
+            if start_after:
+                # 위치 dict로 커서를 바로 찾고 필요한 구간만 복사한다. (없는 커서면 빈 페이지)
+                start = self._recipients.get(start_after, len(self._order) - 1) + 1
+            page = self._order[start:start + limit]
+            has_more = start + limit < len(self._order)
+        return page, (page[-1] if has_more and page else None)
+
+    def record_deliveries(self, results: List[dict], broadcast_id: Optional[str] = None) -> None:
+        """파일 백엔드는 발송 이력을 저장하지 않는다."""
+
+    def deliveries(self, broadcast_id: Optional[str] = None, status: Optional[str] = None,
+                   limit: int = 100) -> Optional[dict]:
+        """파일 백엔드는 발송 이력을 저장하지 않으므로 None"""
+        return None
+
+    def replace_all(self, recipients: Iterable[str]) -> None:
+        """목록 전체를 교체하고 스냅샷으로 바로 저장한다."""
+        with self._compact_lock, self._lock, self._file_lock():
+            self._sync()
+            self._recipients, self._order = {}, []
+            _index_extend(self._recipients, self._order, recipients)
+            _write_atomic(self.snapshot_path, self._order)
+            self._snapshot_key = _stat_key(self.snapshot_path)
+            self._open_log(truncate=True)
+
+    def _schedule_compaction(self) -> None:
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._compactor = threading.Thread(target=self.compact, name="recipient-compactor", daemon=True)
+            self._compactor.start()
+
+    def compact(self) -> None:
+        """
+        로그를 스냅샷으로 압축한다.
+        다른 프로세스가 압축 중인 로그를 다시 반영하거나 로그를 교체하지 않도록 스냅샷 기록까지 파일 잠금 안에서 한다.
+        """
+        with self._compact_lock, self._lock, self._file_lock():
+            self._sync()
+            if self._log_lines == 0:
+                return
+            self._log.close()
+            self._log = None
+            os.replace(self.log_path, self._compacting_path)
+            self._open_log(truncate=True)
+            try:
+                _write_atomic(self.snapshot_path, self._order)
+                self._snapshot_key = _stat_key(self.snapshot_path)
+                self._compacting_path.unlink()
+            except Exception as e:
+                # .compacting 로그는 남겨 두고 다음 시작 시 다시 반영
+                logger.warning("스냅샷 압축 실패: %s", e)
+
+    def close(self) -> None:
+        """남은 로그를 압축하고 파일을 닫는다."""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        if self._recipients is not None:
+            self.compact()
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            if self._lock_file is not None:
+                self._lock_file.close()
+                self._lock_file = None
+            self._recipients = None
+            self._order = None
 
-from config import RECIPIENT_FILE
+
+class SQLiteRecipientStore:
+    """
+    수신자/발송 이력을 SQLite(WAL)에 보관하는 저장소. RecipientStore와 같은 인터페이스를 제공한다.
+
+    - recipients: 전화번호(고유 인덱스), 이름, 메타데이터(JSON), 수신 거부 여부
+    - deliveries: 메시지별 발송 결과 (broadcast_id, group_id, message_id, status, 시각)
+
+    수신 거부(opted_out)된 번호는 목록/존재 확인에서 제외되지만 등록 상태는 유지된다.
+    처음 열 때 수신자가 비어 있고 recipients.json이 있으면 그 내용을 가져온다.
+    """
+
+    def __init__(self, path: Path, import_from: Optional[Path] = None):
+        self.path = str(path)
+        self.import_from = Path(import_from) if import_from else None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS recipients (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone TEXT NOT NULL UNIQUE,
+                    name TEXT,
+                    metadata TEXT,
+                    opted_out INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS deliveries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    phone TEXT NOT NULL,
+                    broadcast_id TEXT,
+                    group_id TEXT,
+                    message_id TEXT,
+                    status TEXT NOT NULL,
+                    detail TEXT,
+                    created_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_deliveries_broadcast ON deliveries (broadcast_id, status);
+                CREATE INDEX IF NOT EXISTS idx_deliveries_phone ON deliveries (phone, created_at);
+                """
+            )
+            if (self.import_from is not None and self.import_from.exists()
+                    and conn.execute("SELECT COUNT(*) FROM recipients").fetchone()[0] == 0):
+                with open(self.import_from, "r", encoding="utf-8") as f:
+                    phones = json.load(f)
+                with conn:
+                    self._insert(conn, phones)
+                logger.info("%s에서 수신자 %d명을 가져왔습니다.", self.import_from.name, len(phones))
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    def _insert(self, conn: sqlite3.Connection, phones: Iterable[str]) -> None:
+        now = self._now()
+        conn.executemany(
+            "INSERT OR IGNORE INTO recipients (phone, created_at) VALUES (?, ?)",
+            [(phone, now) for phone in phones],
+        )
+
+    def _existing(self, conn: sqlite3.Connection, phones: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(phones), 500):
+            chunk = phones[start:start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = conn.execute(f"SELECT phone FROM recipients WHERE phone IN ({placeholders})", chunk)
+            existing.update(row[0] for row in rows)
+        return existing
+
+    def add(self, phone: str, name: Optional[str] = None, metadata: Optional[dict] = None) -> bool:
+        """수신자를 추가한다. 이미 등록된(수신 거부 포함) 번호면 False"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO recipients (phone, name, metadata, created_at) VALUES (?, ?, ?, ?)",
+                    (phone, name, json.dumps(metadata, ensure_ascii=False) if metadata else None, self._now()),
+                )
+            return cursor.rowcount == 1
+
+    def add_many(self, phones: Iterable[str]) -> List[str]:
+        """여러 수신자를 한 트랜잭션으로 추가하고, 새로 추가된 번호를 입력 순서대로 반환한다."""
+        phones = list(dict.fromkeys(phones))
+        with self._lock:
+            conn = self._connection()
+            existing = self._existing(conn, phones)
+            added = [phone for phone in phones if phone not in existing]
+            with conn:
+                self._insert(conn, added)
+        return added
+
+    def set_opt_out(self, phone: str, opted_out: bool = True) -> bool:
+        """수신 거부 여부를 변경한다. 등록되지 않은 번호면 False"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE recipients SET opted_out = ? WHERE phone = ?", (int(opted_out), phone)
+                )
+            return cursor.rowcount == 1
+
+    def __contains__(self, phone: str) -> bool:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT 1 FROM recipients WHERE phone = ? AND opted_out = 0", (phone,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM recipients WHERE opted_out = 0"
+            ).fetchone()[0]
+
+    def list(self) -> List[str]:
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT phone FROM recipients WHERE opted_out = 0 ORDER BY id"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def page(self, limit: int, start_after: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """등록 순서대로 start_after 다음부터 limit개를 반환한다. (목록, 다음 커서)"""
+        with self._lock:
+            conn = self._connection()
+            after_id = 0
+            if start_after:
+                row = conn.execute("SELECT id FROM recipients WHERE phone = ?", (start_after,)).fetchone()
+                after_id = row[0] if row else -1
+            if after_id < 0:
+                return [], None
+            rows = conn.execute(
+                "SELECT phone FROM recipients WHERE opted_out = 0 AND id > ? ORDER BY id LIMIT ?",
+                (after_id, limit + 1),
+            ).fetchall()
+        page = [row[0] for row in rows[:limit]]
+        return page, (page[-1] if len(rows) > limit else None)
+
+    def replace_all(self, recipients: Iterable[str]) -> None:
+        """수신자 목록 전체를 교체한다. (발송 이력은 유지)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM recipients")
+                self._insert(conn, recipients)
+
+    def record_deliveries(self, results: List[dict], broadcast_id: Optional[str] = None) -> None:
+        """send_sms/send_bulk의 메시지별 결과를 deliveries에 기록한다."""
+        if not results:
+            return
+        now = self._now()
+        rows = [
+            (result.get("phone"), broadcast_id, result.get("group_id"), result.get("message_id"),
+             result.get("status"), result.get("detail"), now)
+            for result in results
+        ]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT INTO deliveries (phone, broadcast_id, group_id, message_id, status, detail, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+
+    def deliveries(self, broadcast_id: Optional[str] = None, status: Optional[str] = None,
+                   limit: int = 100) -> Optional[dict]:
+        """
+        발송 이력을 조회한다. broadcast_id를 지정하지 않으면 가장 최근 브로드캐스트를 대상으로 한다.
+        예: deliveries(status="failed") → 마지막 브로드캐스트에서 실패한 번호들
+        """
+        with self._lock:
+            conn = self._connection()
+            if broadcast_id is None:
+                row = conn.execute(
+                    "SELECT broadcast_id FROM deliveries WHERE broadcast_id IS NOT NULL ORDER BY id DESC LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return {"broadcast_id": None, "deliveries": []}
+                broadcast_id = row[0]
+            sql = ("SELECT phone, group_id, message_id, status, detail, created_at "
+                   "FROM deliveries WHERE broadcast_id = ?")
+            params = [broadcast_id]
+            if status:
+                sql += " AND status = ?"
+                params.append(status)
+            rows = conn.execute(sql + " ORDER BY id LIMIT ?", (*params, limit)).fetchall()
+        columns = ("phone", "group_id", "message_id", "status", "detail", "created_at")
+        return {
+            "broadcast_id": broadcast_id,
+            "deliveries": [dict(zip(columns, row)) for row in rows],
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+if settings.recipient_backend == "sqlite":
+    recipient_store = SQLiteRecipientStore(settings.recipient_db, import_from=settings.recipient_file)
+else:
+    recipient_store = RecipientStore(
+        settings.recipient_file, settings.recipient_log_file, settings.recipient_log_compact_threshold,
+    )
 
 
 def load_recipients() -> List[str]:
-    if not RECIPIENT_FILE.exists():
-        return []
-    with open(RECIPIENT_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
+    return recipient_store.list()
 
 
 def save_recipients(recipients: List[str]):
-    with open(RECIPIENT_FILE, "w", encoding="utf-8") as f:
-        json.dump(recipients, f, ensure_ascii=False, indent=2)
+    recipient_store.replace_all(recipients)
+
+
+# -------------------------
+# 대량 등록 (CSV / NDJSON)
+# -------------------------
+
+# 정규화를 한 번에 처리할 행 수
+_IMPORT_BATCH_SIZE = 10000
+
+
+def _iter_csv_rows(lines: Iterable[str]):
+    """CSV 행을 (행 번호, 원본 값, 오류) 로 생성한다. 헤더에 phone 열이 있으면 그 열을, 없으면 첫 열을 사용한다."""
+    column = 0
+    for row_number, row in enumerate(csv.reader(lines), start=1):
+        if row_number == 1:
+            header = [cell.strip().lower() for cell in row]
+            if "phone" in header:
+                column = header.index("phone")
+                continue
+        if not row:
+            continue
+        yield row_number, (row[column] if column < len(row) else ""), None
+
+
+def _iter_ndjson_rows(lines: Iterable[str]):
+    """NDJSON 행을 (행 번호, 원본 값, 오류) 로 생성한다. 각 줄은 {"phone": ...} 객체 또는 문자열"""
+    for row_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except ValueError:
+            yield row_number, line.rstrip("\n"), "JSON 형식이 올바르지 않습니다."
+            continue
+        if isinstance(value, dict):
+            value = value.get("phone")
+        if not isinstance(value, str):
+            yield row_number, line.rstrip("\n"), "phone 값이 없습니다."
+            continue
+        yield row_number, value, None
+
+
+def import_recipients(lines: Iterable[str], fmt: str = "csv") -> dict:
+    """
+    CSV/NDJSON 줄 이터레이터에서 전화번호를 읽어 수신자로 일괄 등록한다.
+
+    - 행을 _IMPORT_BATCH_SIZE 단위로 모아 normalize_phone_numbers로 정규화/검증
+    - 파일 내 중복과 기존 등록 번호를 한 번에 걸러 recipient_store.add_many로 한 번만 기록
+
+    Returns:
+        {"total_rows", "added", "duplicates", "rejected_count", "rejected": [{"row", "value", "reason"}]}
+    """
+    rows = _iter_ndjson_rows(lines) if fmt == "ndjson" else _iter_csv_rows(lines)
+    unique = {}
+    rejected = []
+    total_rows = 0
+
+    def flush(batch):
+        valid, invalid = normalize_phone_numbers([value for _, value in batch])
+        for index, value, reason in invalid:
+            rejected.append({"row": batch[index][0], "value": value, "reason": reason})
+        unique.update(dict.fromkeys(valid))
+        return len(valid)
+
+    valid_count = 0
+    batch = []
+    for row_number, value, error in rows:
+        total_rows += 1
+        if error is not None:
+            rejected.append({"row": row_number, "value": value, "reason": error})
+            continue
+        batch.append((row_number, value))
+        if len(batch) >= _IMPORT_BATCH_SIZE:
+            valid_count += flush(batch)
+            batch = []
+    if batch:
+        valid_count += flush(batch)
+
+    added = recipient_store.add_many(unique)
+    rejected.sort(key=lambda item: item["row"])
+    return {
+        "total_rows": total_rows,
+        "added": len(added),
+        "duplicates": valid_count - len(added),
+        "rejected_count": len(rejected),
+        "rejected": rejected,
+    }
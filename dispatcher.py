@@ -0,0 +1,118 @@
+"""dispatcher.py
+동시 발송 디스패처
+-------------------
+SOLAPI 요청을 스레드 풀에서 동시에 처리하되, 초당 요청 수(토큰 버킷)와
+동시 진행 요청 수(in-flight)를 제한한다. 제출 측은 한도에 도달하면 대기하므로
+(backpressure) 대량 브로드캐스트에서도 대기 작업이 무한히 쌓이지 않는다.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, List, Optional
+
+from config import settings
+from metrics import register_collector
+
+__all__ = ["TokenBucket", "Dispatcher", "sms_dispatcher"]
+
+
+class TokenBucket:
+    """초당 rate 개의 토큰을 채우고 최대 capacity 개까지 모아 두는 토큰 버킷"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """토큰이 확보될 때까지 대기한다. rate <= 0 이면 제한하지 않는다."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class Dispatcher:
+    """
+    토큰 버킷 + in-flight 제한이 걸린 스레드 풀 디스패처
+
+    Args:
+        max_workers: 작업 스레드 수
+        max_in_flight: 동시에 진행(제출)될 수 있는 최대 작업 수
+        rate_per_sec: 초당 시작할 수 있는 작업 수 (0 이하면 무제한)
+        burst: 순간적으로 허용할 최대 작업 수
+    """
+
+    def __init__(self, max_workers: int, max_in_flight: int, rate_per_sec: float, burst: Optional[float] = None):
+        self.max_workers = max_workers
+        self.max_in_flight = max_in_flight
+        self.limiter = TokenBucket(rate_per_sec, burst or max(1.0, rate_per_sec))
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="sms-dispatch"
+                )
+            return self._executor
+
+    def map(self, fn: Callable, items: Iterable) -> List:
+        """
+        items 각각에 fn을 동시에 적용하고 입력 순서대로 결과를 반환한다.
+        in-flight 한도에 도달하면 이전 작업이 끝날 때까지 제출을 멈춘다.
+        """
+        executor = self._get_executor()
+        futures = []
+        for item in items:
+            self._slots.acquire()
+            self.limiter.acquire()
+            try:
+                future = executor.submit(fn, item)
+            except Exception:
+                self._slots.release()
+                raise
+            future.add_done_callback(lambda _: self._slots.release())
+            futures.append(future)
+        return [future.result() for future in futures]
+
+    @property
+    def in_flight(self) -> int:
+        """현재 제출되어 끝나지 않은 작업 수"""
+        return self.max_in_flight - self._slots._value
+
+    def shutdown(self) -> None:
+        """작업 스레드를 정리한다. 이후 map() 호출 시 다시 생성된다."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+# SOLAPI 발송용 전역 디스패처
+sms_dispatcher = Dispatcher(
+    max_workers=settings.sms_dispatch_workers,
+    max_in_flight=settings.sms_dispatch_max_in_flight,
+    rate_per_sec=settings.solapi_requests_per_sec,
+    burst=settings.solapi_requests_burst,
+)
+
+
+def _collect_metrics():
+    yield ("sms_dispatch_in_flight", "gauge", "진행 중인 SOLAPI 요청(묶음) 수", [({}, sms_dispatcher.in_flight)])
+
+
+register_collector(_collect_metrics)
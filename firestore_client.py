@@ -1,24 +1,296 @@
-import os
-from google.cloud import firestore
-from config import FIRESTORE_PROJECT_ID, FIRESTORE_DATABASE_ID, FIRESTORE_REGION
+import asyncio
+import functools
+import inspect
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+from cache import firestore_cache, read_through
+from metrics import registry
+from tracing import span
+from config import settings, TIMEZONE as KST
+
+logger = logging.getLogger(__name__)
+
+# FieldPath.document_id()와 같은 값 (문서 ID 정렬/선택용, google.cloud 패키지 import 없이 사용)
+_DOCUMENT_ID = "__name__"
+
+
+class _TunedChannelMixin:
+    """
+    gRPC 채널 옵션(keepalive 등)을 설정값으로 지정하는 Firestore 클라이언트 믹스인.
+    기본 클라이언트는 keepalive 30초가 하드코딩되어 있어 채널 생성 부분만 재정의한다.
+    """
+
+    def _firestore_api_helper(self, transport, client_class, client_module):
+        if self._firestore_api_internal is None and self._emulator_host is None:
+            channel = transport.create_channel(
+                self._target,
+                credentials=self._credentials,
+                options=[
+                    ("grpc.keepalive_time_ms", settings.firestore_keepalive_time_ms),
+                    ("grpc.keepalive_timeout_ms", settings.firestore_keepalive_timeout_ms),
+                    ("grpc.keepalive_permit_without_calls", 1),
+                ],
+            )
+            self._transport = transport(host=self._target, channel=channel)
+            self._firestore_api_internal = client_class(
+                transport=self._transport, client_options=self._client_options
+            )
+            client_module._client_info = self._client_info
+        return super()._firestore_api_helper(transport, client_class, client_module)
+
+
+@functools.lru_cache(maxsize=None)
+def _tuned_client_classes():
+    """
+    채널 옵션을 조정한 (동기, 비동기) Firestore 클라이언트 클래스를 반환합니다.
+    google.cloud.firestore(gRPC, protobuf 포함) import가 무거워 클라이언트를 처음 만들 때 불러옵니다.
+    """
+    from google.cloud import firestore
+
+    class _TunedFirestoreClient(_TunedChannelMixin, firestore.Client):
+        """채널 옵션을 조정한 동기 Firestore 클라이언트"""
+
+    class _TunedAsyncFirestoreClient(_TunedChannelMixin, firestore.AsyncClient):
+        """채널 옵션을 조정한 비동기(grpc.aio) Firestore 클라이언트"""
+
+    return _TunedFirestoreClient, _TunedAsyncFirestoreClient
+
 
 def initialize_firestore():
     """
-    Firestore 클라이언트를 초기화합니다.
+    Firestore 클라이언트를 새로 생성합니다.
     GOOGLE_APPLICATION_CREDENTIALS 환경 변수에 서비스 계정 키 파일의 경로가 설정되어 있어야 합니다.
+
+    호출할 때마다 gRPC 채널과 인증 정보를 새로 만들므로, 일반적인 조회에는
+    프로세스 공유 클라이언트를 돌려주는 get_firestore_client()를 사용합니다.
     """
     try:
         # Google Cloud Firestore 클라이언트 생성
         # database 매개변수로 특정 데이터베이스 지정
-        client = firestore.Client(
-            project=FIRESTORE_PROJECT_ID,
-            database=FIRESTORE_DATABASE_ID
+        client_class, _ = _tuned_client_classes()
+        client = client_class(
+            project=settings.firestore_project_id,
+            database=settings.firestore_database_id
         )
         return client
     except Exception as e:
-        print(f"Firestore 클라이언트 초기화 실패: {e}")
+        logger.error("Firestore 클라이언트 초기화 실패: %s", e)
         raise e
 
+
+# -------------------------
+# 프로세스 공유 클라이언트 풀
+# -------------------------
+
+_pool_lock = threading.Lock()
+_client_pool = []          # FIRESTORE_CHANNEL_POOL_SIZE 개의 클라이언트
+_last_health_check = 0.0
+_round_robin = itertools.count()
+
+
+@functools.lru_cache(maxsize=None)
+def _channel_failures() -> tuple:
+    """채널 장애로 간주하여 클라이언트를 재생성할 예외들 (예외가 발생했을 때만 불러옴)"""
+    from google.api_core import exceptions as gcp_exceptions
+    return gcp_exceptions.ServiceUnavailable, gcp_exceptions.Unauthenticated
+
+
+def _failed_precondition() -> type:
+    """컬렉션 그룹 인덱스가 없을 때 쿼리가 거부되며 발생하는 예외"""
+    from google.api_core import exceptions as gcp_exceptions
+    return gcp_exceptions.FailedPrecondition
+
+
+def _close_client(client) -> None:
+    """클라이언트의 gRPC 채널을 닫습니다. (채널이 아직 생성되지 않았으면 무시)"""
+    transport = getattr(client, "_transport", None)
+    if transport is None:
+        return
+    try:
+        transport.close()
+    except Exception as e:
+        logger.warning("Firestore 채널 종료 실패: %s", e)
+
+
+def _ping(client) -> bool:
+    """존재하지 않는 문서 1건을 읽어 채널 상태를 확인합니다."""
+    try:
+        client.collection('personal_dashboard').document('_healthcheck').get()
+        return True
+    except Exception as e:
+        logger.warning("Firestore 헬스체크 실패: %s", e)
+        return False
+
+
+def get_firestore_client():
+    """
+    프로세스 전역에서 공유하는 Firestore 클라이언트를 반환합니다.
+
+    - 최초 호출 시 지연 생성되며 이후 모든 스레드가 같은 클라이언트를 사용합니다.
+    - FIRESTORE_CHANNEL_POOL_SIZE > 1 이면 여러 채널을 라운드로빈으로 나눠 씁니다.
+    - FIRESTORE_HEALTHCHECK_INTERVAL 마다 헬스체크를 수행하고, 실패한 클라이언트는 재생성합니다.
+      헬스체크(네트워크 왕복)와 재생성은 잠금 밖에서 한 스레드만 수행하고, 그동안 다른 스레드는 기존 클라이언트를 씁니다.
+    """
+    global _last_health_check
+
+    if not _client_pool or time.monotonic() - _last_health_check > settings.firestore_healthcheck_interval:
+        checking = None
+        with _pool_lock:
+            if not _client_pool:
+                _client_pool.extend(initialize_firestore() for _ in range(settings.firestore_channel_pool_size))
+                _last_health_check = time.monotonic()
+            elif time.monotonic() - _last_health_check > settings.firestore_healthcheck_interval:
+                # 이번 헬스체크를 맡았다고 표시해 다른 스레드가 중복으로 점검하지 않게 한다.
+                _last_health_check = time.monotonic()
+                checking = list(_client_pool)
+        if checking:
+            _replace_unhealthy(checking)
+
+    return _client_pool[next(_round_robin) % len(_client_pool)]
+
+
+def _replace_unhealthy(clients: list) -> None:
+    """헬스체크에 실패한 클라이언트를 새로 만들어 풀에서 교체합니다. (_pool_lock 없이 호출)"""
+    replacements = {index: initialize_firestore() for index, client in enumerate(clients) if not _ping(client)}
+    stale = []
+    with _pool_lock:
+        for index, replacement in replacements.items():
+            # 점검하는 동안 풀이 교체/초기화되었으면 새 클라이언트는 버린다.
+            if index < len(_client_pool) and _client_pool[index] is clients[index]:
+                stale.append(_client_pool[index])
+                _client_pool[index] = replacement
+            else:
+                stale.append(replacement)
+    for client in stale:
+        _close_client(client)
+
+
+def set_firestore_client(client) -> None:
+    """
+    공유 클라이언트를 지정한 객체로 교체합니다.
+    벤치마크/로컬 점검에서 에뮬레이터 클라이언트나 인메모리 가짜 Firestore를 주입할 때 사용합니다.
+    """
+    global _last_health_check
+    reset_firestore_client()
+    with _pool_lock:
+        _client_pool.append(client)
+        _last_health_check = time.monotonic()
+
+
+def reset_firestore_client() -> None:
+    """공유 클라이언트를 모두 닫습니다. 다음 get_firestore_client() 호출 시 새로 생성됩니다."""
+    with _pool_lock:
+        clients = list(_client_pool)
+        _client_pool.clear()
+    for client in clients:
+        _close_client(client)
+
+
+def close_firestore_client() -> None:
+    """애플리케이션 종료 시 공유 클라이언트의 채널을 정리합니다."""
+    reset_firestore_client()
+
+
+# -------------------------
+# 비동기(AsyncClient) 공유 클라이언트
+# -------------------------
+
+_async_client = None
+_async_client_loop = None
+
+
+def get_async_firestore_client():
+    """
+    async 엔드포인트에서 사용하는 공유 AsyncClient를 반환합니다.
+    grpc.aio 채널은 생성된 이벤트 루프에 묶이므로 루프가 바뀌면 새로 생성합니다.
+    """
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or (_async_client_loop is not None and _async_client_loop is not loop):
+        _, async_client_class = _tuned_client_classes()
+        _async_client = async_client_class(
+            project=settings.firestore_project_id,
+            database=settings.firestore_database_id
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+def set_async_firestore_client(client) -> None:
+    """공유 AsyncClient를 지정한 객체로 교체합니다. 지정한 객체는 이벤트 루프와 관계없이 사용됩니다. (벤치마크/로컬 점검용)"""
+    global _async_client, _async_client_loop
+    _async_client = client
+    _async_client_loop = None
+
+
+async def close_async_firestore_client() -> None:
+    """공유 AsyncClient의 채널을 닫습니다. 다음 호출 시 새로 생성됩니다."""
+    global _async_client, _async_client_loop
+    client, _async_client, _async_client_loop = _async_client, None, None
+    transport = getattr(client, "_transport", None)
+    if transport is None:
+        return
+    try:
+        await transport.close()
+    except Exception as e:
+        logger.warning("Firestore 비동기 채널 종료 실패: %s", e)
+
+
+firestore_call_seconds = registry.histogram(
+    "firestore_call_duration_seconds", "firestore_client 조회 함수 1회 소요 시간(초, 캐시 hit 제외)", ("function", "outcome"),
+)
+
+
+@contextmanager
+def _timed_call(timings: dict, function: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("firestore", function=function):
+            yield
+        outcome = "success"
+    finally:
+        timings[outcome].observe(time.perf_counter() - started)
+
+
+def _with_channel_recovery(func):
+    """
+    채널 장애로 실패하면 공유 클라이언트를 재생성한 뒤 한 번 더 시도합니다. (async 함수 지원)
+    재시도를 포함한 호출 1회의 소요 시간을 firestore_call_duration_seconds에 기록합니다. (추적 중인 요청이면 firestore 구간)
+    """
+    timings = {outcome: firestore_call_seconds.labels(func.__name__, outcome) for outcome in ("success", "error")}
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            with _timed_call(timings, func.__name__):
+                try:
+                    return await func(*args, **kwargs)
+                except _channel_failures() as e:
+                    logger.warning("Firestore 채널 오류로 비동기 클라이언트를 재생성합니다: %s", e)
+                    await close_async_firestore_client()
+                    return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with _timed_call(timings, func.__name__):
+            try:
+                return func(*args, **kwargs)
+            except _channel_failures() as e:
+                logger.warning("Firestore 채널 오류로 클라이언트를 재생성합니다: %s", e)
+                reset_firestore_client()
+                return func(*args, **kwargs)
+    return wrapper
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
 def get_collection_data(collection_name: str):
     """
     지정된 컬렉션의 모든 문서를 가져옵니다.
@@ -26,7 +298,7 @@ def get_collection_data(collection_name: str):
     :param collection_name: 조회할 컬렉션의 이름
     :return: 컬렉션의 문서 리스트
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     docs_ref = db.collection(collection_name).stream()
 
     documents = []
@@ -37,6 +309,52 @@ def get_collection_data(collection_name: str):
 
     return documents
 
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
+def get_collection_page(collection_name: str, limit: int, start_after: str = None):
+    """
+    지정된 컬렉션의 문서를 document ID 순으로 limit개씩 가져옵니다. (커서 기반 페이지네이션)
+
+    :param collection_name: 조회할 컬렉션의 이름
+    :param limit: 한 페이지의 최대 문서 수
+    :param start_after: 이전 페이지의 next_cursor (이 document ID 다음부터 조회)
+    :return: {'documents': 문서 리스트, 'next_cursor': 다음 페이지 커서 (마지막 페이지면 None)}
+    """
+    db = get_firestore_client()
+    query = db.collection(collection_name).order_by(_DOCUMENT_ID)
+    if start_after:
+        query = query.start_after({_DOCUMENT_ID: start_after})
+
+    # 다음 페이지 존재 여부를 알기 위해 1건 더 조회
+    documents = []
+    for doc in query.limit(limit + 1).stream():
+        doc_data = doc.to_dict()
+        doc_data['id'] = doc.id
+        documents.append(doc_data)
+
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    return {
+        'documents': documents,
+        'next_cursor': documents[-1]['id'] if has_more else None
+    }
+
+def iter_collection_data(collection_name: str):
+    """
+    지정된 컬렉션의 문서를 하나씩 생성(yield)합니다.
+    결과를 리스트로 모으지 않으므로 컬렉션 크기와 관계없이 메모리 사용량이 일정합니다.
+
+    :param collection_name: 조회할 컬렉션의 이름
+    :return: 문서 딕셔너리 제너레이터 (id 포함)
+    """
+    db = get_firestore_client()
+    for doc in db.collection(collection_name).stream():
+        doc_data = doc.to_dict()
+        doc_data['id'] = doc.id
+        yield doc_data
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
 def get_user_data(collection_name: str, user_id: str):
     """
     특정 사용자의 데이터를 조회합니다.
@@ -45,7 +363,7 @@ def get_user_data(collection_name: str, user_id: str):
     :param user_id: 조회할 사용자 ID
     :return: 해당 사용자의 문서 리스트
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     # user_id 필드로 필터링하여 조회
     docs_ref = db.collection(collection_name).where('user_id', '==', user_id).stream()
     
@@ -57,6 +375,8 @@ def get_user_data(collection_name: str, user_id: str):
     
     return documents
 
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
 def get_user_data_by_field(collection_name: str, field_name: str, field_value: str):
     """
     특정 필드 값으로 사용자 데이터를 조회합니다.
@@ -66,7 +386,7 @@ def get_user_data_by_field(collection_name: str, field_name: str, field_value: s
     :param field_value: 필터링할 필드 값
     :return: 조건에 맞는 문서 리스트
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     # 지정된 필드로 필터링하여 조회
     docs_ref = db.collection(collection_name).where(field_name, '==', field_value).stream()
     
@@ -78,6 +398,7 @@ def get_user_data_by_field(collection_name: str, field_name: str, field_value: s
     
     return documents
 
+@_with_channel_recovery
 def get_user_daily_usage(user_id: str, start_date: str, end_date: str):
     """
     특정 사용자의 지정된 날짜 범위 내 총 사용 시간을 계산합니다.
@@ -87,59 +408,44 @@ def get_user_daily_usage(user_id: str, start_date: str, end_date: str):
     :param end_date: 종료 날짜 (YYYY-MM-DD 형식) 
     :return: 총 사용 시간 정보 (초 단위 및 시간/분/초 형식)
     """
-    from datetime import datetime, timezone
-    import pytz
-    
-    db = initialize_firestore()
+    db = get_firestore_client()
     
     # 날짜 문자열을 datetime 객체로 변환 (KST 기준)
-    kst = pytz.timezone('Asia/Seoul')
-    start_datetime = datetime.strptime(start_date, '%Y-%m-%d').replace(tzinfo=kst)
-    end_datetime = datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59, tzinfo=kst)
+    start_datetime, end_datetime = _kst_date_range(start_date, end_date)
     
     # 사용자 문서의 sessions 서브컬렉션 조회
     sessions_ref = db.collection('intention_app_user').document(user_id).collection('sessions')
     
     # 지정된 날짜 범위 내의 세션들을 쿼리
     sessions_query = sessions_ref.where('start_time', '>=', start_datetime).where('start_time', '<=', end_datetime)
-    sessions = sessions_query.stream()
-    
+    return _summarize_sessions(user_id, start_date, end_date, sessions_query.stream())
+
+def _summarize_sessions(user_id: str, start_date: str, end_date: str, sessions):
+    """세션 스냅샷들을 get_user_daily_usage 응답 형식으로 집계합니다."""
     total_seconds = 0
     session_count = 0
     session_details = []
     
     for session in sessions:
         session_data = session.to_dict()
+        duration_seconds = _session_duration_seconds(session_data)
         
-        # start_time과 end_time이 모두 존재하는지 확인
-        if 'start_time' in session_data and 'end_time' in session_data:
+        # 음수/누락 시간은 제외
+        if duration_seconds > 0:
             start_time = session_data['start_time']
             end_time = session_data['end_time']
+            total_seconds += duration_seconds
+            session_count += 1
             
-            # None이 아닌지 확인
-            if start_time and end_time:
-                # 세션 지속 시간 계산 (초 단위)
-                duration_seconds = (end_time - start_time).total_seconds()
-                
-                # 음수 시간 방지 (end_time이 start_time보다 이른 경우)
-                if duration_seconds > 0:
-                    total_seconds += duration_seconds
-                    session_count += 1
-                    
-                    session_details.append({
-                        'session_id': session.id,
-                        'task_name': session_data.get('task_name', ''),
-                        'start_time': start_time.isoformat(),
-                        'end_time': end_time.isoformat(),
-                        'duration_seconds': int(duration_seconds),
-                        'duration_formatted': format_duration_korean(int(duration_seconds)),
-                        'duration_hms': format_duration(int(duration_seconds))
-                    })
-    
-    # 총 사용 시간을 시간/분/초로 변환
-    total_hours = int(total_seconds // 3600)
-    total_minutes = int((total_seconds % 3600) // 60)
-    remaining_seconds = int(total_seconds % 60)
+            session_details.append({
+                'session_id': session.id,
+                'task_name': session_data.get('task_name', ''),
+                'start_time': start_time.isoformat(),
+                'end_time': end_time.isoformat(),
+                'duration_seconds': int(duration_seconds),
+                'duration_formatted': format_duration_korean(int(duration_seconds)),
+                'duration_hms': format_duration(int(duration_seconds))
+            })
     
     return {
         'user_id': user_id,
@@ -147,18 +453,220 @@ def get_user_daily_usage(user_id: str, start_date: str, end_date: str):
             'start_date': start_date,
             'end_date': end_date
         },
-        'total_usage': {
-            'total_seconds': int(total_seconds),
-            'formatted': format_duration_korean(int(total_seconds)),
-            'formatted_hms': f"{total_hours:02d}:{total_minutes:02d}:{remaining_seconds:02d}",
-            'hours': total_hours,
-            'minutes': total_minutes,
-            'seconds': remaining_seconds
-        },
+        'total_usage': build_total_usage(total_seconds),
         'session_count': session_count,
         'sessions': session_details
     }
 
+# -------------------------
+# 비동기 조회 (async 엔드포인트용, AsyncClient 사용)
+# -------------------------
+
+def _doc_with_id(doc) -> dict:
+    doc_data = doc.to_dict()
+    doc_data['id'] = doc.id
+    return doc_data
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
+async def get_collection_data_async(collection_name: str):
+    """get_collection_data의 비동기 버전"""
+    db = get_async_firestore_client()
+    return [_doc_with_id(doc) async for doc in db.collection(collection_name).stream()]
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
+async def get_collection_page_async(collection_name: str, limit: int, start_after: str = None):
+    """get_collection_page의 비동기 버전"""
+    db = get_async_firestore_client()
+    query = db.collection(collection_name).order_by(_DOCUMENT_ID)
+    if start_after:
+        query = query.start_after({_DOCUMENT_ID: start_after})
+
+    documents = [_doc_with_id(doc) async for doc in query.limit(limit + 1).stream()]
+    has_more = len(documents) > limit
+    documents = documents[:limit]
+    return {
+        'documents': documents,
+        'next_cursor': documents[-1]['id'] if has_more else None
+    }
+
+async def iter_collection_data_async(collection_name: str):
+    """iter_collection_data의 비동기 버전 (async 제너레이터)"""
+    db = get_async_firestore_client()
+    async for doc in db.collection(collection_name).stream():
+        yield _doc_with_id(doc)
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
+async def get_user_data_async(collection_name: str, user_id: str):
+    """get_user_data의 비동기 버전"""
+    db = get_async_firestore_client()
+    query = db.collection(collection_name).where('user_id', '==', user_id)
+    return [_doc_with_id(doc) async for doc in query.stream()]
+
+@read_through(lambda collection_name, *args, **kwargs: collection_name)
+@_with_channel_recovery
+async def get_user_data_by_field_async(collection_name: str, field_name: str, field_value: str):
+    """get_user_data_by_field의 비동기 버전"""
+    db = get_async_firestore_client()
+    query = db.collection(collection_name).where(field_name, '==', field_value)
+    return [_doc_with_id(doc) async for doc in query.stream()]
+
+@_with_channel_recovery
+async def get_user_daily_usage_async(user_id: str, start_date: str, end_date: str):
+    """get_user_daily_usage의 비동기 버전"""
+    db = get_async_firestore_client()
+    start_datetime, end_datetime = _kst_date_range(start_date, end_date)
+    sessions_ref = db.collection('intention_app_user').document(user_id).collection('sessions')
+    sessions_query = sessions_ref.where('start_time', '>=', start_datetime).where('start_time', '<=', end_datetime)
+    sessions = [session async for session in sessions_query.stream()]
+    return _summarize_sessions(user_id, start_date, end_date, sessions)
+
+@_with_channel_recovery
+def get_daily_usage_for_users(user_ids, date: str):
+    """
+    여러 사용자의 특정 날짜(KST) 사용 시간을 한 번에 집계합니다.
+    
+    FIRESTORE_USAGE_QUERY_MODE가 "collection_group"이면 모든 사용자의 sessions 서브컬렉션을
+    start_time 범위로 한 번에 조회(컬렉션 그룹 쿼리)한 뒤 상위 사용자 ID로 묶습니다.
+    컬렉션 그룹 인덱스가 없어 쿼리가 거부되면 사용자별 쿼리를 동시에 실행하는 방식으로 대체합니다.
+    
+    :param user_ids: 집계할 사용자 ID 목록
+    :param date: 조회 날짜 (YYYY-MM-DD 형식)
+    :return: {user_id: {'total_usage': {...}, 'session_count': int}} (세션이 없는 사용자도 0으로 포함)
+    """
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    
+    start_datetime, end_datetime = _kst_date_range(date, date)
+    totals = {user_id: [0.0, 0] for user_id in user_ids}
+    
+    if settings.firestore_usage_query_mode == "collection_group":
+        try:
+            _collect_usage_by_collection_group(totals, start_datetime, end_datetime)
+        except _failed_precondition() as e:
+            logger.warning("sessions 컬렉션 그룹 쿼리 실패, 사용자별 동시 조회로 대체합니다: %s", e)
+            totals = {user_id: [0.0, 0] for user_id in user_ids}
+            _collect_usage_concurrently(totals, start_datetime, end_datetime)
+    else:
+        _collect_usage_concurrently(totals, start_datetime, end_datetime)
+    
+    return {
+        user_id: {
+            'total_usage': build_total_usage(total_seconds),
+            'session_count': session_count,
+        }
+        for user_id, (total_seconds, session_count) in totals.items()
+    }
+
+@_with_channel_recovery
+def get_user_usage_by_day(user_id: str, start_date: str, end_date: str):
+    """
+    특정 사용자의 날짜 범위 내 사용 시간을 KST 날짜별로 나누어 집계합니다.
+    세션은 start_time이 속한 날짜에 집계됩니다. (get_user_daily_usage와 같은 기준)
+    
+    :param user_id: 사용자 ID (sanitized_user_id)
+    :param start_date: 시작 날짜 (YYYY-MM-DD 형식)
+    :param end_date: 종료 날짜 (YYYY-MM-DD 형식)
+    :return: {'YYYY-MM-DD': (total_seconds, session_count)} (세션이 있는 날짜만 포함)
+    """
+    db = get_firestore_client()
+    start_datetime, end_datetime = _kst_date_range(start_date, end_date)
+    
+    sessions = (
+        db.collection('intention_app_user').document(user_id).collection('sessions')
+        .where('start_time', '>=', start_datetime)
+        .where('start_time', '<=', end_datetime)
+        .select(['start_time', 'end_time'])
+        .stream()
+    )
+    
+    buckets = {}
+    for session in sessions:
+        session_data = session.to_dict()
+        duration_seconds = _session_duration_seconds(session_data)
+        if duration_seconds > 0:
+            day = session_data['start_time'].astimezone(KST).strftime('%Y-%m-%d')
+            total_seconds, session_count = buckets.get(day, (0.0, 0))
+            buckets[day] = (total_seconds + duration_seconds, session_count + 1)
+    return buckets
+
+def _collect_usage_by_collection_group(totals, start_datetime, end_datetime):
+    """sessions 컬렉션 그룹 쿼리 1회로 기간 내 세션을 읽어 totals에 사용자별로 누적합니다."""
+    db = get_firestore_client()
+    sessions = (
+        db.collection_group('sessions')
+        .where('start_time', '>=', start_datetime)
+        .where('start_time', '<=', end_datetime)
+        .select(['start_time', 'end_time'])
+        .stream()
+    )
+    for session in sessions:
+        user_ref = session.reference.parent.parent
+        if user_ref is None or user_ref.parent.id != 'intention_app_user':
+            continue
+        bucket = totals.get(user_ref.id)
+        if bucket is None:
+            continue
+        duration_seconds = _session_duration_seconds(session.to_dict())
+        if duration_seconds > 0:
+            bucket[0] += duration_seconds
+            bucket[1] += 1
+
+def _collect_usage_concurrently(totals, start_datetime, end_datetime):
+    """사용자별 sessions 범위 쿼리를 스레드 풀에서 동시에 실행해 totals에 누적합니다."""
+    db = get_firestore_client()
+    
+    def fetch(user_id):
+        sessions = (
+            db.collection('intention_app_user').document(user_id).collection('sessions')
+            .where('start_time', '>=', start_datetime)
+            .where('start_time', '<=', end_datetime)
+            .select(['start_time', 'end_time'])
+            .stream()
+        )
+        total_seconds, session_count = 0.0, 0
+        for session in sessions:
+            duration_seconds = _session_duration_seconds(session.to_dict())
+            if duration_seconds > 0:
+                total_seconds += duration_seconds
+                session_count += 1
+        return user_id, total_seconds, session_count
+    
+    with ThreadPoolExecutor(max_workers=settings.firestore_usage_concurrency) as executor:
+        for user_id, total_seconds, session_count in executor.map(fetch, list(totals)):
+            totals[user_id] = [total_seconds, session_count]
+
+def _kst_date_range(start_date: str, end_date: str):
+    """YYYY-MM-DD 날짜 범위를 KST 기준 시작(00:00:00)/종료(23:59:59) datetime으로 변환합니다."""
+    start_datetime = KST.localize(datetime.strptime(start_date, '%Y-%m-%d'))
+    end_datetime = KST.localize(datetime.strptime(end_date, '%Y-%m-%d').replace(hour=23, minute=59, second=59))
+    return start_datetime, end_datetime
+
+def _session_duration_seconds(session_data) -> float:
+    """세션의 지속 시간(초). start_time/end_time이 없거나 역전된 경우 0을 반환합니다."""
+    start_time = session_data.get('start_time')
+    end_time = session_data.get('end_time')
+    if not (start_time and end_time):
+        return 0.0
+    return max(0.0, (end_time - start_time).total_seconds())
+
+def build_total_usage(total_seconds):
+    """총 사용 시간(초)을 응답용 시간/분/초 정보로 변환합니다."""
+    total_hours = int(total_seconds // 3600)
+    total_minutes = int((total_seconds % 3600) // 60)
+    remaining_seconds = int(total_seconds % 60)
+    return {
+        'total_seconds': int(total_seconds),
+        'formatted': format_duration_korean(int(total_seconds)),
+        'formatted_hms': f"{total_hours:02d}:{total_minutes:02d}:{remaining_seconds:02d}",
+        'hours': total_hours,
+        'minutes': total_minutes,
+        'seconds': remaining_seconds
+    }
+
 def format_duration(seconds):
     """
     초를 시:분:초 형식으로 변환합니다.
@@ -184,15 +692,17 @@ def format_duration_korean(seconds):
     else:
         return "1분 미만"
 
+@_with_channel_recovery
 def get_all_users():
     """
     intention_app_user 컬렉션의 모든 사용자 ID를 가져옵니다.
     
     :return: 사용자 ID 리스트
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     users_ref = db.collection('intention_app_user')
-    users = users_ref.stream()
+    # 문서 ID만 필요하므로 필드 없이(__name__만) 조회
+    users = users_ref.select([_DOCUMENT_ID]).stream()
     
     user_ids = []
     for user in users:
@@ -200,13 +710,14 @@ def get_all_users():
     
     return user_ids
 
+@_with_channel_recovery
 def get_all_users_with_info():
     """
     intention_app_user 컬렉션의 모든 사용자 정보를 가져옵니다.
     
     :return: 사용자 정보 딕셔너리 리스트 (user_id, 사용자 데이터 포함)
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     users_ref = db.collection('intention_app_user')
     users = users_ref.stream()
     
@@ -218,6 +729,8 @@ def get_all_users_with_info():
     
     return user_list
 
+@read_through('intention_app_user')
+@_with_channel_recovery
 def get_user_info(user_id: str):
     """
     특정 사용자의 정보를 가져옵니다.
@@ -225,7 +738,7 @@ def get_user_info(user_id: str):
     :param user_id: 사용자 ID
     :return: 사용자 정보 딕셔너리
     """
-    db = initialize_firestore()
+    db = get_firestore_client()
     user_ref = db.collection('intention_app_user').document(user_id)
     user_doc = user_ref.get()
     
@@ -236,45 +749,243 @@ def get_user_info(user_id: str):
     else:
         return None
 
+# 명단 조회 시 personal_dashboard에서 가져올 필드 (스케줄러가 사용하는 값만 전송받음)
+_ROSTER_FIELDS = ['name', 'phone', 'role', 'start_date', 'end_date']
+# intention_app_user 존재 여부를 한 번의 get_all로 확인할 문서 수
+_EXISTENCE_BATCH_SIZE = 100
+
+
+def iter_users_with_phone(role_filter: str = None):
+    """
+    personal_dashboard에서 유효한 전화번호가 있고 intention_app_user에도 존재하는 사용자를
+    순차적으로 생성(yield)합니다.
+    
+    - role 필터는 서버 측 where 쿼리로 적용합니다. 앞뒤 공백이 붙은 role 값(정규화 전 데이터)도 놓치지 않도록
+      공백 변형을 찾는 범위 쿼리를 함께 실행하고, 리스너 명단과 같은 _matches_role(공백 제거 후 비교)로 확인합니다.
+    - personal_dashboard는 _ROSTER_FIELDS만 프로젝션하여 읽습니다.
+    - intention_app_user는 전체를 읽지 않고, 필요한 ID만 get_all로 묶어 필드 없이 존재 여부만 확인합니다.
+    
+    :param role_filter: 특정 role을 가진 사용자만 필터링 (예: "real")
+    :return: 사용자 정보 딕셔너리 제너레이터 (user_id, phone, name, role, dashboard_data)
+    """
+    db = get_firestore_client()
+    
+    collection = db.collection('personal_dashboard')
+    queries = _role_queries(collection, role_filter) if role_filter is not None else [collection]
+    
+    page = []
+    seen = set()
+    unnormalized = []
+    for query in queries:
+        for user in query.select(_ROSTER_FIELDS).stream():
+            if user.id in seen:
+                continue
+            seen.add(user.id)
+            entry = _roster_entry(user.id, user.to_dict())  # document ID가 user_id
+            if entry is None or not _matches_role(entry, role_filter):
+                continue
+            if role_filter is not None and entry['dashboard_data'].get('role') != entry['role']:
+                unnormalized.append(user.id)
+            
+            page.append(entry)
+            if len(page) >= _EXISTENCE_BATCH_SIZE:
+                yield from _filter_existing_app_users(db, page)
+                page = []
+    
+    if unnormalized:
+        logger.warning("role 값에 앞뒤 공백이 있는 사용자 %d명 (공백을 제거한 값으로 포함): %s",
+                       len(unnormalized), ", ".join(unnormalized[:20]),
+                       extra={"role": role_filter, "user_count": len(unnormalized)})
+    
+    if page:
+        yield from _filter_existing_app_users(db, page)
+
+
+def _roster_entry(user_id: str, user_data: dict):
+    """personal_dashboard 문서를 명단 항목으로 변환합니다. 전화번호가 없으면 None"""
+    # 전화번호가 있고 빈 문자열이 아닌 경우만 확인
+    phone = (user_data.get('phone') or '').strip()
+    if not phone:
+        return None
+    return {
+        'user_id': user_id,
+        'phone': phone,
+        'name': user_data.get('name', user_id),
+        'role': (user_data.get('role') or '').strip(),
+        'dashboard_data': {field: user_data[field] for field in _ROSTER_FIELDS if field in user_data}
+    }
+
+
+def _matches_role(entry: dict, role_filter: str = None) -> bool:
+    """
+    명단 항목이 role 필터에 맞는지 확인합니다. (조회 경로와 리스너 명단이 같은 기준을 쓰도록 공유)
+    명단 항목의 role은 앞뒤 공백을 제거한 값이므로 "real "처럼 저장된 사용자도 "real"에 포함됩니다.
+    """
+    return role_filter is None or entry['role'] == role_filter
+
+
+def _role_queries(collection, role_filter: str) -> list:
+    """
+    role 필터 쿼리들: 정확히 같은 값 + 뒤에 공백이 붙은 값 + 공백으로 시작하는 값.
+    공백/제어 문자(\t ~ ' ')는 '!'보다 앞에 정렬되므로 범위 쿼리로 찾는다. (정상 데이터면 결과가 없음)
+    범위에 걸리는 다른 값은 _matches_role에서 걸러진다.
+    """
+    return [
+        collection.where('role', '==', role_filter),
+        collection.where('role', '>=', role_filter + '\t').where('role', '<', role_filter + '!'),
+        collection.where('role', '>=', '\t').where('role', '<', '!'),
+    ]
+
+
+def _filter_existing_app_users(db, users):
+    """intention_app_user에 실제 존재하는 사용자만 남깁니다. (문서 필드는 내려받지 않음)"""
+    app_users_ref = db.collection('intention_app_user')
+    refs = [app_users_ref.document(user['user_id']) for user in users]
+    existing_user_ids = {snapshot.id for snapshot in db.get_all(refs, field_paths=[]) if snapshot.exists}
+    return [user for user in users if user['user_id'] in existing_user_ids]
+
+
+@_with_channel_recovery
 def get_users_with_phone(role_filter: str = None):
     """
     personal_dashboard 컬렉션에서 유효한 전화번호가 있는 사용자들과
     intention_app_user 컬렉션의 사용자 ID를 매핑하여 가져옵니다.
+    리스너 모드(FIRESTORE_LISTENER_MODE)가 켜져 있고 초기 동기화가 끝났다면 메모리 명단을 사용합니다.
     
     :param role_filter: 특정 role을 가진 사용자만 필터링 (예: "real")
     :return: 전화번호가 있는 사용자 정보 딕셔너리 리스트 (user_id, phone, name 등 포함)
     """
-    db = initialize_firestore()
+    if roster_watcher.is_ready():
+        return roster_watcher.users_with_phone(role_filter)
+    return list(iter_users_with_phone(role_filter))
+
+
+# -------------------------
+# 리스너 모드: on_snapshot 기반 메모리 명단
+# -------------------------
+
+class RosterWatcher:
+    """
+    personal_dashboard와 intention_app_user에 각각 on_snapshot 리스너를 붙여 전화번호/role/이름/참여 기간 명단을
+    메모리에 최신 상태로 유지합니다.
     
-    # personal_dashboard에서 전화번호가 있는 사용자들 조회
-    dashboard_users_ref = db.collection('personal_dashboard')
-    dashboard_users = dashboard_users_ref.stream()
+    - 스냅샷 콜백은 매번 전체 결과 집합을 전달하므로 대시보드 항목과 앱 사용자 ID 집합을 통째로 교체합니다.
+    - 명단은 두 집합의 교집합이라, 앱 사용자가 삭제되거나 대시보드보다 늦게 생성되어도 바로 반영되고
+      존재 여부 확인(get_all)을 따로 하지 않습니다. (리스너는 필드 마스크를 지원하지 않아 문서 ID만 사용)
+    - 변경이 들어오면 해당 컬렉션의 조회 캐시를 무효화합니다.
+    - 주기적으로 리스너 상태를 확인하고, 스트림이 하나라도 끊겼으면 둘 다 다시 연결해 전체를 재동기화합니다.
+    """
     
-    # intention_app_user에서 실제 존재하는 사용자 ID들 조회
-    app_users_ref = db.collection('intention_app_user')
-    app_users = app_users_ref.stream()
-    existing_user_ids = set()
-    for user in app_users:
-        existing_user_ids.add(user.id)
+    def __init__(self, client_factory=None, check_interval: float = settings.firestore_listener_check_interval):
+        self._client_factory = client_factory or get_firestore_client
+        self.check_interval = check_interval
+        self._roster = {}                # user_id -> 명단 항목
+        self._entries = None             # personal_dashboard의 전화번호가 있는 항목 (첫 스냅샷 전에는 None)
+        self._app_user_ids = None        # intention_app_user 문서 ID (첫 스냅샷 전에는 None)
+        self._watches = []
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._monitor = None
+        self.resync_count = 0
     
-    users_with_phone = []
-    for user in dashboard_users_ref.stream():
-        user_data = user.to_dict()
-        user_id = user.id  # document ID가 user_id
-        
-        # 전화번호가 있고 빈 문자열이 아닌 경우만 확인
-        phone = user_data.get('phone', '').strip()
-        if phone and user_id in existing_user_ids:
-            # role 필터링 적용
-            user_role = user_data.get('role', '').strip()
-            if role_filter is None or user_role == role_filter:
-                # intention_app_user에 실제 존재하는 사용자만 포함
-                users_with_phone.append({
-                    'user_id': user_id,
-                    'phone': phone,
-                    'name': user_data.get('name', user_id),
-                    'role': user_role,
-                    'dashboard_data': user_data
-                })
-    
-    return users_with_phone 
\ No newline at end of file
+    def start(self) -> None:
+        """리스너를 연결하고 재연결 감시 스레드를 시작합니다."""
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._stop.clear()
+            self._attach()
+            self._monitor = threading.Thread(target=self._watch_loop, name="roster-watcher", daemon=True)
+            self._monitor.start()
+    
+    def stop(self) -> None:
+        self._stop.set()
+        with self._lock:
+            monitor, self._monitor = self._monitor, None
+            self._detach()
+            self._ready.clear()
+        if monitor is not None:
+            monitor.join(timeout=self.check_interval + 1)
+    
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+    
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+    
+    def users_with_phone(self, role_filter: str = None) -> list:
+        roster = self._roster
+        return [entry for entry in roster.values() if _matches_role(entry, role_filter)]
+    
+    def _attach(self) -> None:
+        with self._state_lock:
+            # 재연결 시 두 컬렉션의 첫 스냅샷을 모두 받을 때까지 명단을 새로 만들지 않는다.
+            self._entries = None
+            self._app_user_ids = None
+        db = self._client_factory()
+        self._watches = [
+            db.collection('personal_dashboard').on_snapshot(self._on_dashboard_snapshot),
+            db.collection('intention_app_user').on_snapshot(self._on_app_user_snapshot),
+        ]
+    
+    def _detach(self) -> None:
+        watches, self._watches = self._watches, []
+        for watch in watches:
+            try:
+                watch.unsubscribe()
+            except Exception as e:
+                logger.warning("명단 리스너 해제 실패: %s", e)
+    
+    def _watch_loop(self) -> None:
+        while not self._stop.wait(self.check_interval):
+            with self._lock:
+                if self._stop.is_set():
+                    return
+                if self._watches and all(getattr(watch, 'is_active', True) for watch in self._watches):
+                    continue
+                logger.warning("명단 리스너 연결이 끊어져 재연결 후 재동기화합니다.")
+                self._ready.clear()
+                self._detach()
+                try:
+                    self._attach()
+                    self.resync_count += 1
+                except Exception as e:
+                    logger.warning("명단 리스너 재연결 실패: %s", e)
+    
+    def _rebuild(self) -> None:
+        """대시보드 항목 중 앱 사용자인 항목으로 명단을 통째로 교체합니다. (self._state_lock 보유 상태에서 호출)"""
+        if self._entries is None or self._app_user_ids is None:
+            return
+        self._roster = {
+            user_id: entry for user_id, entry in self._entries.items() if user_id in self._app_user_ids
+        }
+        self._ready.set()
+    
+    def _on_dashboard_snapshot(self, docs, changes, read_time) -> None:
+        try:
+            entries = {}
+            for doc in docs:
+                entry = _roster_entry(doc.id, doc.to_dict() or {})
+                if entry is not None:
+                    entries[doc.id] = entry
+            with self._state_lock:
+                self._entries = entries
+                self._rebuild()
+            firestore_cache.invalidate('personal_dashboard')
+        except Exception as e:
+            logger.exception("명단 리스너 스냅샷 처리 실패: %s", e)
+    
+    def _on_app_user_snapshot(self, docs, changes, read_time) -> None:
+        try:
+            app_user_ids = {doc.id for doc in docs}
+            with self._state_lock:
+                self._app_user_ids = app_user_ids
+                self._rebuild()
+            firestore_cache.invalidate('intention_app_user')
+        except Exception as e:
+            logger.exception("앱 사용자 리스너 스냅샷 처리 실패: %s", e)
+
+
+roster_watcher = RosterWatcher()
@@ -0,0 +1,223 @@
+"""jobs.py
+브로드캐스트 백그라운드 작업
+----------------------------
+POST /send/broadcast는 작업을 등록하고 job_id를 바로 반환한다. 작업은 JOB_WORKERS개의 스레드 풀에서
+수신자를 outbox에 나눠 등록한 뒤 발송이 끝날 때까지 진행 상황을 추적한다.
+
+- 진행 상황(sent/failed/remaining/rate)과 메시지별 결과는 outbox의 broadcast_id 기준으로 조회하므로
+  재시작 후에도 GET /jobs/{job_id}로 확인할 수 있다. (작업 메타데이터는 메모리에만 보관)
+- 취소하면 아직 보내지 않은 메시지는 cancelled로 바뀌고, 이미 전송 중인 요청만 끝까지 처리된다.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Optional
+
+from config import settings
+from crud import recipient_store
+from logging_setup import log_context
+from outbox import outbox, PENDING, SENDING, SENT, DEAD, CANCELLED
+from slack_logger import slack_logger
+
+__all__ = ["JobManager", "job_manager"]
+
+logger = logging.getLogger(__name__)
+
+# 작업 상태
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+FAILED = "failed"
+
+# outbox 등록 단위 (등록 도중에도 취소를 확인하고 워커가 먼저 발송을 시작할 수 있도록 나눠 등록)
+_ENQUEUE_BATCH_SIZE = 10000
+
+
+def _broadcast_id(job_id: str) -> str:
+    return f"broadcast:{job_id}"
+
+
+class _Job:
+    def __init__(self, job_id: str, body: str):
+        self.id = job_id
+        self.body = body
+        self.status = QUEUED
+        self.total = None
+        self.error = None
+        self.created_at = datetime.now(timezone.utc).isoformat()
+        self.started_at = None      # time.monotonic()
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+
+
+class JobManager:
+    """
+    브로드캐스트 작업을 스레드 풀에서 실행하고 상태를 조회/취소한다.
+
+    Args:
+        max_workers: 동시에 진행할 작업 수
+        history_limit: 메모리에 보관할 작업 수 (오래된 완료 작업부터 제거)
+        poll_interval: 진행 상황 확인 주기(초)
+    """
+
+    def __init__(self, max_workers: int = settings.job_workers, history_limit: int = settings.job_history_limit,
+                 poll_interval: float = settings.outbox_poll_interval):
+        self.max_workers = max_workers
+        self.history_limit = history_limit
+        self.poll_interval = poll_interval
+        self._jobs = OrderedDict()      # job_id -> _Job
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stop = threading.Event()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._stop.clear()
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="broadcast-job")
+            return self._executor
+
+    def submit_broadcast(self, body: str) -> dict:
+        """등록된 모든 수신자에게 보낼 브로드캐스트 작업을 등록하고 작업 상태를 반환한다."""
+        job = _Job(uuid.uuid4().hex, body)
+        executor = self._get_executor()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        executor.submit(self._run, job)
+        return self._describe(job, outbox.progress(_broadcast_id(job.id)))
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished_at is not None]
+        for job_id in finished[:max(0, len(self._jobs) - self.history_limit)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: _Job) -> None:
+        with log_context(job_id=job.id):
+            self._run_job(job)
+
+    def _run_job(self, job: _Job) -> None:
+        broadcast_id = _broadcast_id(job.id)
+        job.status = RUNNING
+        job.started_at = time.monotonic()
+        try:
+            recipients = recipient_store.list()
+            job.total = len(recipients)
+            for start in range(0, len(recipients), _ENQUEUE_BATCH_SIZE):
+                if job.cancel_event.is_set() or self._stop.is_set():
+                    break
+                batch = recipients[start:start + _ENQUEUE_BATCH_SIZE]
+                outbox.enqueue([{"phone": phone, "body": job.body} for phone in batch], broadcast_id)
+            if job.cancel_event.is_set():
+                outbox.cancel(broadcast_id)
+
+            # 발송이 모두 끝날 때까지 대기 (종료 시에는 남은 메시지를 outbox에 두고 빠져나옴)
+            while not self._stop.is_set():
+                progress = outbox.progress(broadcast_id)
+                if progress[PENDING] + progress[SENDING] == 0:
+                    break
+                outbox.wait_for_progress(self.poll_interval)
+            else:
+                return
+        except Exception as e:
+            job.status, job.error = FAILED, str(e)
+            logger.exception("브로드캐스트 작업 %s 실패: %s", job.id, e)
+        else:
+            progress = outbox.progress(broadcast_id)
+            job.status = JOB_CANCELLED if job.cancel_event.is_set() else COMPLETED
+            slack_logger.log_broadcast_result(job.total, progress[SENT], progress[DEAD])
+        finally:
+            job.finished_at = time.monotonic()
+
+    def cancel(self, job_id: str) -> Optional[dict]:
+        """작업을 취소한다. 없는 작업이면 None"""
+        broadcast_id = _broadcast_id(job_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # 재시작 등으로 메타데이터가 없는 작업도 outbox에 남은 메시지는 취소할 수 있다.
+            if not any(outbox.progress(broadcast_id).values()):
+                return None
+            outbox.cancel(broadcast_id)
+            return self.get(job_id)
+        job.cancel_event.set()
+        outbox.cancel(broadcast_id)
+        return self.get(job_id)
+
+    def get(self, job_id: str, limit: int = 0, start_after: Optional[int] = None,
+            status: Optional[str] = None) -> Optional[dict]:
+        """
+        작업 상태와 진행 상황을 반환한다. limit > 0 이면 메시지별 결과 한 페이지를 results에 담는다.
+        없는 작업이면 None
+        """
+        broadcast_id = _broadcast_id(job_id)
+        progress = outbox.progress(broadcast_id)
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            if not any(progress.values()):
+                return None
+            job = self._restored(job_id, progress)
+        data = self._describe(job, progress)
+        if limit > 0:
+            data["results"] = outbox.broadcast_results(broadcast_id, limit, start_after, status)
+        return data
+
+    @staticmethod
+    def _restored(job_id: str, progress: dict) -> _Job:
+        """메모리에 없는 작업(재시작 이전 작업)의 상태를 outbox 기록으로 추정한다."""
+        job = _Job(job_id, None)
+        job.total = sum(progress.values())
+        if progress[PENDING] + progress[SENDING]:
+            job.status = RUNNING
+        else:
+            job.status = JOB_CANCELLED if progress[CANCELLED] else COMPLETED
+        job.created_at = None
+        return job
+
+    @staticmethod
+    def _describe(job: _Job, progress: dict) -> dict:
+        done = progress[SENT] + progress[DEAD]
+        elapsed = None
+        if job.started_at is not None:
+            elapsed = (job.finished_at or time.monotonic()) - job.started_at
+        total = job.total if job.total is not None else sum(progress.values())
+        cancelled = progress[CANCELLED]
+        if job.status == JOB_CANCELLED:
+            # 등록 전에 취소된 수신자도 취소 건수에 포함
+            cancelled = max(cancelled, total - done)
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "created_at": job.created_at,
+            "error": job.error,
+            "progress": {
+                "total": total,
+                "sent": progress[SENT],
+                "failed": progress[DEAD],
+                "cancelled": cancelled,
+                "remaining": max(0, total - done - cancelled),
+                "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+                "rate_per_sec": round(done / elapsed, 2) if elapsed else None,
+            },
+        }
+
+    def shutdown(self) -> None:
+        """
+        진행 중인 작업의 추적을 멈춘다. outbox에 등록된 메시지는 다음 시작 시 이어서 발송되며,
+        아직 시작하지 않은 작업은 버려진다.
+        """
+        self._stop.set()
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+job_manager = JobManager()
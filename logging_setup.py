@@ -0,0 +1,188 @@
+"""logging_setup.py
+구조화 로그
+-----------
+모듈은 logging.getLogger(__name__)으로 로그를 남기고, 앱 시작 시 configure_logging()이 출력 경로를 구성한다.
+
+- 호출 스레드에서는 레코드를 크기 제한 큐에 넣기만 한다. (QueueHandler, 큐가 가득 차면 기다리지 않고 버림)
+  stdout 출력과 JSON 직렬화는 백그라운드 QueueListener 스레드가 맡는다.
+- LOG_FORMAT=json이면 한 줄에 레코드 하나를 JSON으로 출력한다.
+  log_context()로 묶은 run_id/job_id/campaign 등과 extra로 넘긴 user_id 같은 필드가 키로 함께 실린다.
+- 기본 레벨은 LOG_LEVEL, 모듈별 레벨은 LOG_LEVELS("campaigns=WARNING,...")로 정한다.
+- user_id가 있는 INFO 이하 레코드는 LOG_USER_SAMPLE_RATE 비율의 사용자만 남긴다.
+  사용자 ID 해시로 고르므로 한 사용자의 로그는 모두 남거나 모두 빠진다.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from config import settings
+from metrics import register_collector
+
+__all__ = ["configure_logging", "shutdown_logging", "log_context", "JsonFormatter", "TextFormatter"]
+
+# 요청마다 로그를 남기는 HTTP 클라이언트 라이브러리는 LOG_LEVELS로 따로 지정하지 않으면 경고 이상만 남긴다.
+_QUIET_LOGGERS = {"httpx": "WARNING", "httpcore": "WARNING", "urllib3": "WARNING"}
+
+# extra/컨텍스트로 붙인 필드만 출력하기 위해 LogRecord 기본 속성은 제외한다.
+_RESERVED = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+_context = contextvars.ContextVar("log_context", default={})
+
+
+@contextmanager
+def log_context(**fields):
+    """
+    with 구간(같은 스레드/코루틴)에서 남기는 로그에 fields를 붙인다. 중첩하면 바깥 필드와 합쳐진다.
+    예) with log_context(run_id=run_id, shard=shard): ...
+    """
+    token = _context.set({**_context.get(), **fields})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _extra_fields(record: logging.LogRecord) -> Dict[str, object]:
+    return {key: value for key, value in record.__dict__.items() if key not in _RESERVED and not key.startswith("_")}
+
+
+class JsonFormatter(logging.Formatter):
+    """레코드 하나를 JSON 한 줄로 출력 (ts, level, logger, message + 컨텍스트/extra 필드)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            payload["exc"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """사람이 읽는 한 줄 형식 (로컬 개발용), 컨텍스트/extra 필드는 key=value로 뒤에 붙인다."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class UserSampler(logging.Filter):
+    """user_id가 있는 INFO 이하 레코드를 사용자 단위로 샘플링 (WARNING 이상은 항상 남김)"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.threshold = int(rate * 10000)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.threshold >= 10000 or record.levelno >= logging.WARNING:
+            return True
+        user_id = getattr(record, "user_id", None)
+        if user_id is None:
+            return True
+        return zlib.crc32(str(user_id).encode("utf-8")) % 10000 < self.threshold
+
+
+class _NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """호출 스레드에서는 메시지/컨텍스트만 확정해 큐에 넣고, 큐가 가득 차면 기다리지 않고 버린다."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 컨텍스트는 호출 스레드에서만 읽을 수 있으므로 큐에 넣기 전에 붙인다. (extra로 넘긴 값이 우선)
+        for key, value in _context.get().items():
+            record.__dict__.setdefault(key, value)
+        # 인자/예외 객체를 다른 스레드로 넘기지 않도록 문자열로 확정
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = settings.log_level, levels: Dict[str, str] = settings.log_levels,
+                      fmt: str = settings.log_format, queue_size: int = settings.log_queue_size,
+                      sample_rate: float = settings.log_user_sample_rate,
+                      stream=None) -> None:
+    """루트 로거에 큐 핸들러를 달고 stdout 출력 스레드를 시작한다. (이미 구성되어 있으면 아무것도 하지 않음)"""
+    global _handler, _listener
+    if _listener is not None:
+        return
+
+    # 출력하지 않는 호출 위치(파일/줄)와 프로세스 정보는 레코드 생성 시 수집하지 않는다. (logging HOWTO 최적화 항목)
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+
+    handler = _NonBlockingQueueHandler(log_queue)
+    handler.addFilter(UserSampler(sample_rate))
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(level)
+    for name, module_level in {**_QUIET_LOGGERS, **levels}.items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener = logging.handlers.QueueListener(log_queue, output)
+    listener.start()
+    _handler, _listener = handler, listener
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """큐에 남은 레코드를 모두 출력한 뒤 출력 스레드를 멈춘다."""
+    global _handler, _listener
+    handler, listener, _handler, _listener = _handler, _listener, None, None
+    if handler is not None:
+        logging.getLogger().removeHandler(handler)
+    if listener is not None:
+        try:
+            listener.stop()
+        except queue.Full:
+            # 종료 표시를 넣을 자리가 없으면 출력 스레드(daemon)는 프로세스와 함께 끝난다.
+            pass
+
+
+def _collect_metrics():
+    dropped = _handler.dropped if _handler is not None else 0
+    yield ("log_records_dropped_total", "counter", "로그 큐 포화로 버려진 레코드 수", [({}, dropped)])
+
+
+register_collector(_collect_metrics)
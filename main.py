@@ -2,16 +2,59 @@
 FastAPI 애플리케이션 엔트리포인트
 """
 
-from fastapi import FastAPI, HTTPException
+import codecs
+import json
+import logging
+from typing import Optional
+
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 
 from models import PhoneNumber, MessageBody
-from crud import load_recipients, save_recipients
-from sms_sender import send_sms, broadcast
-from scheduler import start_scheduler
-from firestore_client import get_collection_data, get_user_data, get_user_data_by_field, get_user_daily_usage
+from crud import recipient_store, import_recipients
+from sms_sender import send_sms_async
+from jobs import job_manager
+from dispatcher import sms_dispatcher
+from outbox import outbox
+from slack_logger import slack_logger
+from usage_rollup import get_usage_summary, usage_rollup_store
+from cache import firestore_cache
+from scheduler import start_scheduler, stop_scheduler, scheduler_status
+from campaigns import campaigns, run_campaign, dry_run_campaign, replay_campaign, list_snapshots
+from firestore_client import (
+    get_collection_data_async,
+    get_collection_page_async,
+    iter_collection_data_async,
+    get_user_data_async,
+    get_user_data_by_field_async,
+    get_user_daily_usage_async,
+    close_firestore_client,
+    close_async_firestore_client,
+    roster_watcher,
+)
+from solapi_client import async_solapi_client
+from metrics import CONTENT_TYPE, MetricsMiddleware, render as render_metrics
+from tracing import TracedRoute, TracingMiddleware, trace_buffer
+from logging_setup import configure_logging, shutdown_logging
+from config import settings
+
+# SOLAPI 인증 정보/발신번호가 없으면 클라이언트를 처음 쓸 때가 아니라 서버 시작 시 바로 실패
+settings.validate()
+
+# 로그 출력 구성 (JSON 레코드를 백그라운드 스레드에서 stdout으로 출력)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="SMS Notification Server", version="1.0.0")
+# 엔드포인트별 요청 처리 시간 (GET /metrics)
+app.add_middleware(MetricsMiddleware)
+# 선택한 요청의 구간 추적 (X-Trace 헤더/샘플링/느린 요청, GET /debug/traces)
+app.add_middleware(TracingMiddleware)
+# 라우트 등록 전에 지정해야 엔드포인트 실행/직렬화 구간이 나뉘어 기록된다.
+app.router.route_class = TracedRoute
 
 
 # -------------------------
@@ -20,43 +63,212 @@ app = FastAPI(title="SMS Notification Server", version="1.0.0")
 
 @app.post("/recipients", summary="수신자 전화번호 등록", status_code=201)
 def add_recipient(item: PhoneNumber):
-    recipients = load_recipients()
-    if item.phone in recipients:
+    if not recipient_store.add(item.phone):
         raise HTTPException(status_code=409, detail="이미 등록된 번호입니다.")
-    recipients.append(item.phone)
-    save_recipients(recipients)
-    return {"count": len(recipients), "phone": item.phone}
+    return {"count": len(recipient_store), "phone": item.phone}
+
+
+@app.post("/recipients/bulk", summary="수신자 전화번호 대량 등록 (CSV/NDJSON)")
+def add_recipients_bulk(file: UploadFile = File(...), format: Optional[str] = Query(None, pattern="^(csv|ndjson)$")):
+    """
+    CSV 또는 NDJSON 파일로 수신자를 대량 등록합니다.
+    
+    - CSV: 헤더에 phone 열이 있으면 그 열을, 없으면 첫 번째 열을 사용
+    - NDJSON: 한 줄에 {"phone": "010-1234-5678"} 객체 또는 "01012345678" 문자열
+    - format을 생략하면 파일 확장자(.ndjson/.jsonl → ndjson, 그 외 csv)로 판단
+    
+    기존 번호/파일 내 중복은 건너뛰고, 형식이 잘못된 행은 rejected에 행 번호와 사유를 담아 반환합니다.
+    
+    Example:
+    curl -F "file=@recipients.csv" http://127.0.0.1:8000/recipients/bulk
+    """
+    fmt = format or ("ndjson" if (file.filename or "").lower().endswith((".ndjson", ".jsonl")) else "csv")
+    # 업로드 파일을 한 줄씩 디코딩 (전체를 메모리에 읽지 않음, BOM 제거)
+    lines = codecs.getreader("utf-8-sig")(file.file, errors="replace")
+    return import_recipients(lines, fmt)
 
 
 @app.get("/recipients", summary="등록된 수신자 목록 조회")
-def list_recipients():
-    return load_recipients()
+def list_recipients(limit: Optional[int] = Query(None, ge=1, le=10000), start_after: Optional[str] = None):
+    """
+    등록된 수신자 목록을 조회합니다.
+    limit을 지정하면 등록 순서대로 페이지 단위로 반환합니다. ({"recipients": [...], "next_cursor": ...})
+    """
+    if limit is None and not start_after:
+        return recipient_store.list()
+    recipients, next_cursor = recipient_store.page(limit or 1000, start_after)
+    return {"recipients": recipients, "next_cursor": next_cursor}
 
 
-@app.post("/send/broadcast", summary="모든 수신자에게 브로드캐스트")
+@app.get("/deliveries", summary="브로드캐스트 발송 이력 조회")
+def list_deliveries(broadcast_id: Optional[str] = None, status: Optional[str] = None,
+                    limit: int = Query(100, ge=1, le=10000)):
+    """
+    메시지별 발송 결과를 조회합니다. (RECIPIENT_BACKEND=sqlite 에서만 기록)
+    broadcast_id를 생략하면 가장 최근 브로드캐스트(스케줄러 작업 포함)를 조회합니다.
+    
+    Example:
+    GET /deliveries?status=failed      (마지막 브로드캐스트에서 실패한 번호)
+    """
+    data = recipient_store.deliveries(broadcast_id, status, limit)
+    if data is None:
+        raise HTTPException(status_code=404, detail="발송 이력은 RECIPIENT_BACKEND=sqlite 에서만 저장됩니다.")
+    return data
+
+
+@app.post("/send/broadcast", summary="모든 수신자에게 브로드캐스트", status_code=202)
 def broadcast_now(payload: MessageBody):
-    return broadcast(payload.body)
+    """
+    브로드캐스트 작업을 등록하고 job_id를 바로 반환합니다.
+    진행 상황과 메시지별 결과는 GET /jobs/{job_id}로 조회합니다.
+    """
+    if len(recipient_store) == 0:
+        raise HTTPException(status_code=400, detail="수신자 목록이 비어 있습니다.")
+    return job_manager.submit_broadcast(payload.body)
+
+
+@app.get("/jobs/{job_id}", summary="브로드캐스트 작업 진행 상황 조회")
+def get_job(job_id: str, limit: int = Query(100, ge=0, le=1000), start_after: Optional[int] = None,
+            status: Optional[str] = Query(None, pattern="^(success|failed|pending|sending|cancelled)$")):
+    """
+    작업 상태(queued/running/completed/cancelled/failed)와 진행 상황(sent/failed/remaining/rate_per_sec),
+    메시지별 결과 한 페이지를 조회합니다. 다음 페이지는 results.next_cursor를 start_after로 전달합니다.
+    limit=0 이면 결과 없이 진행 상황만 반환합니다.
+    
+    Example:
+    GET /jobs/3f2a...?limit=0                 (진행 상황만)
+    GET /jobs/3f2a...?status=failed&limit=100 (실패한 메시지)
+    """
+    job = job_manager.get(job_id, limit, start_after, status)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job
+
+
+@app.post("/jobs/{job_id}/cancel", summary="브로드캐스트 작업 취소")
+def cancel_job(job_id: str):
+    """아직 보내지 않은 메시지를 취소합니다. 이미 전송 중인 SOLAPI 요청은 끝까지 처리됩니다."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="작업을 찾을 수 없습니다.")
+    return job
 
 
 @app.post("/send/{phone}", summary="특정 수신자에게 SMS 전송")
-def send_to_one(phone: str, payload: MessageBody):
-    if phone not in load_recipients():
+async def send_to_one(phone: str, payload: MessageBody):
+    if phone not in recipient_store:
         raise HTTPException(status_code=404, detail="수신자 목록에 없는 번호입니다.")
-    return send_sms(phone, payload.body)
+    return await send_sms_async(phone, payload.body)
+
+
+@app.get("/outbox/stats", summary="발송 대기열 상태별 메시지 수")
+def outbox_stats():
+    return outbox.stats()
+
+
+@app.get("/outbox/dead-letters", summary="발송 대기열 dead-letter 조회")
+def list_dead_letters(limit: int = Query(100, ge=1, le=1000), start_after: Optional[int] = None):
+    """
+    재시도 한도를 넘겼거나 SOLAPI가 접수를 거부한 메시지를 조회합니다.
+    다음 페이지는 응답의 next_cursor를 start_after로 전달합니다.
+    """
+    return outbox.dead_letters(limit, start_after)
+
+
+@app.post("/outbox/dead-letters/{message_id}/retry", summary="dead-letter 메시지 재발송")
+def retry_dead_letter(message_id: int):
+    if not outbox.retry_dead_letter(message_id):
+        raise HTTPException(status_code=404, detail="dead-letter 메시지를 찾을 수 없습니다.")
+    return {"id": message_id, "status": "pending"}
 
 
 @app.get("/", summary="헬스체크")
-def health():
+async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", summary="Prometheus 메트릭", include_in_schema=False)
+def metrics():
+    """
+    발송/Slack/Firestore/HTTP 요청 지연 히스토그램, 발송/실패/재시도/캐시 카운터, 대기열 깊이와 캠페인 실행 시간 게이지를
+    Prometheus 텍스트 형식으로 반환합니다.
+    """
+    return Response(render_metrics(), media_type=CONTENT_TYPE)
+
+
+@app.get("/cache/stats", summary="Firestore 조회 캐시 통계")
+async def cache_stats():
+    """
+    Firestore 조회 캐시의 hit/miss/coalesced/eviction 수와 현재 크기를 조회합니다.
+    """
+    return firestore_cache.stats()
+
+
+@app.get("/debug/traces", summary="최근 요청 구간 추적 목록")
+def list_traces(limit: int = Query(50, ge=1, le=1000), route: Optional[str] = None, min_ms: float = Query(0.0, ge=0)):
+    """
+    구간 추적을 켠 요청(X-Trace 헤더, TRACE_SAMPLE_RATE 샘플링, TRACE_SLOW_MS 이상 걸린 요청)을 최신순으로 조회합니다.
+    route는 라우트 템플릿(예: /firestore/user/{user_id}/usage), min_ms는 최소 소요 시간(ms)입니다.
+    """
+    return trace_buffer.list(limit, route, min_ms)
+
+
+@app.get("/debug/traces/{trace_id}", summary="요청 구간 추적 상세")
+def get_trace(trace_id: str):
+    """
+    요청 1건의 구간 트리(endpoint, firestore, solapi, slack.enqueue, serialize 등)와 구간 이름별 소요 시간 합계를 조회합니다.
+    """
+    trace = trace_buffer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="추적 기록을 찾을 수 없습니다.")
+    return trace.to_dict()
+
+
+async def _ndjson_lines(first, documents):
+    """첫 문서와 나머지 문서 async 이터레이터를 NDJSON(문서당 한 줄) 바이트로 변환합니다."""
+    try:
+        yield (json.dumps(jsonable_encoder(first), ensure_ascii=False) + "\n").encode("utf-8")
+        async for document in documents:
+            yield (json.dumps(jsonable_encoder(document), ensure_ascii=False) + "\n").encode("utf-8")
+    except Exception as e:
+        # 응답 헤더가 이미 전송되었으므로 로그만 남기고 스트림을 종료
+        logger.exception("NDJSON 스트리밍 중 오류 발생: %s", e)
+
+
 @app.get("/firestore/{collection_name}", summary="Firestore 컬렉션 데이터 조회")
-def read_collection(collection_name: str):
+async def read_collection(
+    collection_name: str,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    start_after: Optional[str] = None,
+    stream: bool = False,
+):
     """
-    지정한 Firestore 컬렉션의 모든 문서를 조회합니다.
+    지정한 Firestore 컬렉션의 문서를 조회합니다.
+    
+    Parameters:
+    - limit: 지정하면 document ID 순으로 limit개씩 페이지 단위 조회 ({"documents": [...], "next_cursor": ...})
+    - start_after: 이전 페이지 응답의 next_cursor
+    - stream: true이면 전체 문서를 NDJSON(application/x-ndjson)으로 스트리밍
+    
+    limit/stream을 모두 지정하지 않으면 기존과 같이 전체 문서를 하나의 JSON 배열로 반환합니다.
+    
+    Example:
+    GET /firestore/intention_app_user?limit=100
+    GET /firestore/intention_app_user?limit=100&start_after=user123
+    GET /firestore/intention_app_user?stream=true
     """
     try:
-        data = get_collection_data(collection_name)
+        if stream:
+            # 첫 문서를 미리 읽어 연결 오류는 스트리밍 시작 전에 500으로 응답
+            documents = iter_collection_data_async(collection_name)
+            try:
+                first = await documents.__anext__()
+            except StopAsyncIteration:
+                return StreamingResponse(iter(()), media_type="application/x-ndjson")
+            return StreamingResponse(_ndjson_lines(first, documents), media_type="application/x-ndjson")
+        if limit is not None or start_after:
+            return await get_collection_page_async(collection_name, limit or 100, start_after)
+        data = await get_collection_data_async(collection_name)
         return data
     except Exception as e:
         # 구체적인 에러 처리가 필요할 수 있습니다.
@@ -64,34 +276,34 @@ def read_collection(collection_name: str):
 
 
 @app.get("/firestore/{collection_name}/user/{user_id}", summary="특정 사용자의 Firestore 데이터 조회")
-def read_user_data(collection_name: str, user_id: str):
+async def read_user_data(collection_name: str, user_id: str):
     """
     지정한 Firestore 컬렉션에서 특정 사용자의 데이터만 조회합니다.
     user_id 필드로 필터링합니다.
     """
     try:
-        data = get_user_data(collection_name, user_id)
+        data = await get_user_data_async(collection_name, user_id)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"사용자 데이터 조회 중 오류 발생: {str(e)}")
 
 
 @app.get("/firestore/{collection_name}/filter", summary="필드 값으로 Firestore 데이터 필터링 조회")
-def read_filtered_data(collection_name: str, field_name: str, field_value: str):
+async def read_filtered_data(collection_name: str, field_name: str, field_value: str):
     """
     지정한 Firestore 컬렉션에서 특정 필드 값으로 필터링하여 데이터를 조회합니다.
     쿼리 파라미터: field_name, field_value
     예: /firestore/users/filter?field_name=email&field_value=user@example.com
     """
     try:
-        data = get_user_data_by_field(collection_name, field_name, field_value)
+        data = await get_user_data_by_field_async(collection_name, field_name, field_value)
         return data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"필터링된 데이터 조회 중 오류 발생: {str(e)}")
 
 
 @app.get("/firestore/user/{user_id}/usage", summary="사용자 일일 사용 시간 조회")
-def get_daily_usage(user_id: str, start_date: str, end_date: str):
+async def get_daily_usage(user_id: str, start_date: str, end_date: str, include_sessions: bool = True):
     """
     특정 사용자의 지정된 날짜 범위 내 총 사용 시간을 계산합니다.
     모든 세션(task)의 start_time과 end_time을 합산하여 계산합니다.
@@ -100,9 +312,11 @@ def get_daily_usage(user_id: str, start_date: str, end_date: str):
     - user_id: 사용자 ID (sanitized_user_id)
     - start_date: 시작 날짜 (YYYY-MM-DD 형식, 쿼리 파라미터)
     - end_date: 종료 날짜 (YYYY-MM-DD 형식, 쿼리 파라미터)
+    - include_sessions: false이면 세션 상세 없이 일별 사전 집계(rollup)를 합산해 빠르게 응답
     
     Example:
     GET /firestore/user/user123/usage?start_date=2024-01-01&end_date=2024-01-01
+    GET /firestore/user/user123/usage?start_date=2024-01-01&end_date=2024-01-31&include_sessions=false
     """
     try:
         # 날짜 형식 검증
@@ -113,49 +327,179 @@ def get_daily_usage(user_id: str, start_date: str, end_date: str):
         except ValueError:
             raise HTTPException(status_code=400, detail="날짜 형식이 올바르지 않습니다. YYYY-MM-DD 형식을 사용하세요.")
         
-        data = get_user_daily_usage(user_id, start_date, end_date)
+        if include_sessions:
+            data = await get_user_daily_usage_async(user_id, start_date, end_date)
+        else:
+            # 사전 집계 조회는 로컬 SQLite I/O이므로 스레드풀에서 실행
+            data = await run_in_threadpool(get_usage_summary, user_id, start_date, end_date)
         return data
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"사용 시간 조회 중 오류 발생: {str(e)}")
 
 
+@app.get("/scheduler/status", summary="스케줄러 리더/실행 기록 조회")
+def get_scheduler_status(limit: int = Query(10, ge=1, le=100)):
+    """
+    이 프로세스가 리더인지, 현재 리스 보유자, 최근 정기 실행의 샤드별 진행 상태와 합산 결과를 조회합니다.
+    """
+    return scheduler_status(limit)
+
+
+_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}$"
+
+
+def _get_campaign(name: str):
+    campaign = campaigns.get(name)
+    if campaign is None:
+        raise HTTPException(status_code=404, detail=f"등록되지 않은 캠페인입니다: {name}")
+    return campaign
+
+
+def _run_test_campaign(name: str) -> dict:
+    return run_campaign(_get_campaign(name))
+
+
+def _dry_run(name: str, target_date: Optional[str] = None, capture: bool = False, latency: float = 0.0,
+             decisions: int = 100) -> dict:
+    campaign = _get_campaign(name)
+    try:
+        return dry_run_campaign(campaign, target_date, capture=capture, latency=latency, decision_limit=decisions)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"dry-run 중 오류 발생: {str(e)}")
+
+
 @app.post("/test/morning-notification", summary="오전 사용량 알림 테스트")
-def test_morning_notification():
+def test_morning_notification(dry_run: bool = Query(False, description="true면 발송하지 않고 단계별 소요 시간/판정만 반환")):
     """
     오전 7시 스케줄러 기능을 수동으로 테스트합니다.
-    전날 사용량 종합 통계를 모든 수신자에게 전송합니다.
+    전날 사용량 종합 통계를 모든 수신자에게 전송합니다. (dry_run=true면 발송하지 않음)
     """
+    if dry_run:
+        return _dry_run("morning_usage_notification")
     try:
-        from scheduler import _morning_usage_notification
-        _morning_usage_notification()
+        _run_test_campaign("morning_usage_notification")
         return {"status": "success", "message": "오전 사용량 알림이 전송되었습니다."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"오전 알림 테스트 중 오류 발생: {str(e)}")
 
 
 @app.post("/test/evening-notification", summary="오후 사용량 알림 테스트")
-def test_evening_notification():
+def test_evening_notification(dry_run: bool = Query(False, description="true면 발송하지 않고 단계별 소요 시간/판정만 반환")):
     """
     오후 7시 스케줄러 기능을 수동으로 테스트합니다.
-    당일 사용량 종합 통계를 모든 수신자에게 전송합니다.
+    당일 사용량 종합 통계를 모든 수신자에게 전송합니다. (dry_run=true면 발송하지 않음)
     """
+    if dry_run:
+        return _dry_run("evening_usage_notification")
     try:
-        from scheduler import _evening_usage_notification
-        _evening_usage_notification()
+        _run_test_campaign("evening_usage_notification")
         return {"status": "success", "message": "오후 사용량 알림이 전송되었습니다."}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"오후 알림 테스트 중 오류 발생: {str(e)}")
 
 
+@app.post("/test/campaigns/{name}", summary="캠페인 알림 테스트")
+def test_campaign(name: str):
+    """
+    설정된 캠페인(CAMPAIGNS_FILE 또는 기본 캠페인)을 지금 한 번 실행합니다.
+    결과로 전체/성공/실패 수를 반환합니다. 수동 실행은 매번 새 실행 ID(manual:...)로 멱등 키를 만들므로
+    같은 날짜의 정기 실행 발송을 막지 않습니다.
+    """
+    try:
+        result = _run_test_campaign(name)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"캠페인 테스트 중 오류 발생: {str(e)}")
+    if result is None:
+        raise HTTPException(status_code=500, detail="캠페인 실행 중 오류가 발생했습니다. 서버 로그를 확인하세요.")
+    return {"status": "success", "campaign": name, "result": result}
+
+
+@app.post("/test/campaigns/{name}/dry-run", summary="캠페인 dry-run (발송 없음)")
+def dry_run_test_campaign(
+    name: str,
+    target_date: Optional[str] = Query(None, pattern=_DATE_PATTERN, description="사용량 대상 날짜 (기본: 캠페인 기준 오늘)"),
+    capture: bool = Query(False, description="실행 입력을 replay용 스냅샷으로 저장"),
+    latency: float = Query(0.0, ge=0, le=10, description="SOLAPI 그룹 요청당 흉내 낼 발송 지연(초)"),
+    decisions: int = Query(100, ge=0, description="응답에 포함할 사용자별 판정 수"),
+):
+    """
+    Firestore의 실제 명단/사용량으로 전체 파이프라인을 실행하되 SMS는 보내지 않습니다.
+    결과와 단계별 소요 시간(roster/eligibility/usage/decide/render/dispatch), 사용자별 판정과 메시지 본문을 반환합니다.
+    """
+    return _dry_run(name, target_date, capture, latency, decisions)
+
+
+@app.post("/test/campaigns/{name}/replay", summary="캠페인 replay (스냅샷 재실행, 발송 없음)")
+def replay_test_campaign(
+    name: str,
+    target_date: str = Query(..., pattern=_DATE_PATTERN, description="스냅샷의 사용량 대상 날짜"),
+    latency: float = Query(0.0, ge=0, le=10, description="SOLAPI 그룹 요청당 흉내 낼 발송 지연(초)"),
+    decisions: int = Query(100, ge=0, description="응답에 포함할 사용자별 판정 수"),
+    run: Optional[str] = Query(None, pattern="^[0-9a-z]+$", description="스냅샷 실행 이름 (기본: 정기 실행, 없으면 최근 실행)"),
+):
+    """
+    지난 실행에서 저장한 스냅샷(명단, 사용량, 실행 시각, 캠페인 정의)으로 같은 실행을 발송 없이 다시 실행합니다.
+    입력이 매번 같으므로 단계별 소요 시간을 비교해 성능 변화를 확인할 수 있습니다.
+    """
+    try:
+        return replay_campaign(name, target_date, latency=latency, decision_limit=decisions, run=run)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"replay 중 오류 발생: {str(e)}")
+
+
+@app.get("/test/campaigns/{name}/snapshots", summary="캠페인 스냅샷 목록")
+def get_campaign_snapshots(name: str):
+    """replay할 수 있는 스냅샷(대상 날짜별 파일, 크기, 실행별 샤드 수와 완전 여부) 목록을 최근 날짜 순으로 반환합니다."""
+    return {"campaign": name, "snapshots": list_snapshots(name)}
+
+
 # -------------------------
-# 애플리케이션 시작 시 스케줄러 실행
+# 애플리케이션 시작 시 스케줄러 실행 / 종료 시 리소스 정리
 # -------------------------
 
 @app.on_event("startup")
 def on_startup():
+    if settings.firestore_listener_mode:
+        roster_watcher.start()
+    # 이전 실행에서 남은 발송 대기열 메시지를 이어서 발송
+    outbox.start()
     start_scheduler()
 
 
+@app.on_event("shutdown")
+def on_shutdown():
+    # 처리 중인 샤드가 끝나고 리스를 반환한 뒤 발송 자원을 정리
+    stop_scheduler()
+    job_manager.shutdown()
+    outbox.stop()
+    sms_dispatcher.shutdown()
+    # 발송이 모두 끝난 뒤 남은 Slack 이벤트를 전송
+    slack_logger.close()
+    usage_rollup_store.close()
+    recipient_store.close()
+    roster_watcher.stop()
+    close_firestore_client()
+
+
+@app.on_event("shutdown")
+async def on_shutdown_async():
+    # 비동기 클라이언트는 이벤트 루프 안에서 닫아야 하므로 별도 async 훅에서 정리
+    await async_solapi_client.aclose()
+    await close_async_firestore_client()
+    # 마지막 종료 훅: 큐에 남은 로그를 모두 출력
+    shutdown_logging()
+
+
 # -------------------------
 # 개발용 실행 스크립트
 # -------------------------
@@ -0,0 +1,317 @@
+"""metrics.py
+Prometheus 형식 메트릭
+----------------------
+외부 의존성 없이 카운터/게이지/히스토그램을 모아 두고 GET /metrics에서
+Prometheus 텍스트 형식(0.0.4)으로 내보낸다.
+
+- 발송 경로에서는 라벨별 자식 객체를 한 번 만들어 두고 재사용하므로 기록 1회는 락 1번 + 덧셈 몇 번이다.
+- 대기열 깊이, 캐시 hit/miss처럼 다른 모듈이 이미 세고 있는 값은 수집 시점에 콜백(register_collector)으로 읽는다.
+- 라벨 값은 라우트 템플릿, 함수 이름처럼 종류가 정해진 값만 사용한다. (전화번호/사용자 ID 금지)
+"""
+
+import bisect
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+__all__ = [
+    "Counter", "Gauge", "Histogram", "Registry", "MetricsMiddleware",
+    "registry", "render", "register_collector", "CONTENT_TYPE",
+]
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 외부 API 호출 지연(초)에 맞춘 기본 히스토그램 구간
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 콜백 수집 결과: (이름, 타입, 설명, [(라벨 dict, 값), ...])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    """라벨 조합별 자식 객체를 관리하는 메트릭 공통 부분"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """라벨 값 순서대로 자식 객체를 반환한다. 발송 경로에서는 반환값을 모듈 변수로 잡아 두고 재사용한다."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: 라벨 {self.labelnames} 값이 필요합니다.")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabelled(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name}: labels()로 라벨 값을 지정해야 합니다.")
+        return self._children[()]
+
+    def _items(self):
+        with self._lock:
+            items = list(self._children.items())
+        return [(dict(zip(self.labelnames, key)), child) for key, child in items]
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.type_name}"]
+        for labels, child in self._items():
+            lines.extend(self._sample_lines(labels, child))
+        return lines
+
+    def _sample_lines(self, labels: Dict[str, str], child) -> List[str]:
+        return [f"{self.name}{_format_labels(labels)} {_format_value(child.get())}"]
+
+
+class _Value:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def get(self) -> float:
+        return self._value
+
+
+class _GaugeValue(_Value):
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+
+class Counter(_Metric):
+    """단조 증가 카운터 (이름은 _total로 끝나게 짓는다)"""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+
+class Gauge(_Metric):
+    """현재 값을 나타내는 게이지"""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeValue()
+
+    def set(self, value: float) -> None:
+        self._unlabelled().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._unlabelled().dec(amount)
+
+
+class _HistogramValue:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self) -> "_Timer":
+        """with 구간의 소요 시간을 기록하는 타이머"""
+        return _Timer(self)
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_started")
+
+    def __init__(self, histogram: _HistogramValue):
+        self._histogram = histogram
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.observe(time.perf_counter() - self._started)
+        return False
+
+
+class Histogram(_Metric):
+    """구간별 누적 개수와 합계를 기록하는 히스토그램"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(float(bucket) for bucket in buckets if bucket != math.inf))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled().observe(value)
+
+    def time(self) -> _Timer:
+        return self._unlabelled().time()
+
+    def _sample_lines(self, labels: Dict[str, str], child: _HistogramValue) -> List[str]:
+        counts, total = child.snapshot()
+        if not any(counts):
+            # 미리 만들어 둔 라벨 조합 중 아직 기록이 없는 것은 내보내지 않는다.
+            return []
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_format_labels({**labels, 'le': _format_value(bound)})} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """메트릭과 수집 콜백 모음"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"이미 등록된 메트릭입니다: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """수집 시점에 값을 읽는 콜백을 등록한다. 콜백이 실패하면 그 콜백의 메트릭만 빠진다."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning("수집 콜백 실패 (%s): %s", getattr(collector, '__name__', collector), e)
+                continue
+            for name, type_name, documentation, samples in families:
+                lines.append(f"# HELP {name} {_escape(documentation)}")
+                lines.append(f"# TYPE {name} {type_name}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+# 프로세스 공용 레지스트리
+registry = Registry()
+register_collector = registry.register_collector
+render = registry.render
+
+
+# -------------------------
+# HTTP 요청 처리 시간
+# -------------------------
+
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "엔드포인트별 HTTP 요청 처리 시간(초)", ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    엔드포인트별 요청 처리 시간을 기록하는 ASGI 미들웨어
+    라벨은 실제 경로가 아니라 라우트 템플릿(/jobs/{job_id})을 사용하고, 매칭되지 않은 요청은 "unmatched"로 묶는다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = ["500"]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.labels(scope["method"], path, status[0]).observe(time.perf_counter() - started)
+
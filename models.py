@@ -3,8 +3,13 @@ Pydantic 데이터 모델 정의
 """
 
 import re
+from typing import Iterable, List, Tuple
 from pydantic import BaseModel, validator, Field
 
+# 전화번호 정규화/검증 패턴 (호출마다 컴파일하지 않도록 미리 컴파일)
+_PHONE_STRIP_PATTERN = re.compile(r'[-\s\(\)\.]')
+_PHONE_VALID_PATTERN = re.compile(r'^\+?[0-9]{10,15}$')
+
 
 def normalize_phone_number(phone_number: str) -> str:
     """
@@ -22,7 +27,7 @@ def normalize_phone_number(phone_number: str) -> str:
         return ""
     
     # 하이픈, 공백, 괄호, 점 등 제거
-    normalized = re.sub(r'[-\s\(\)\.]', '', phone_number.strip())
+    normalized = _PHONE_STRIP_PATTERN.sub('', phone_number.strip())
     
     # + 기호는 유지 (국제번호 형식)
     if normalized.startswith('+'):
@@ -38,6 +43,34 @@ def normalize_phone_number(phone_number: str) -> str:
     return normalized
 
 
+def normalize_phone_numbers(phone_numbers: Iterable[str]) -> Tuple[List[str], List[Tuple[int, str, str]]]:
+    """
+    여러 전화번호를 한 번에 정규화/검증합니다. (대량 등록용, PhoneNumber 검증과 같은 규칙)
+    
+    Args:
+        phone_numbers: 원본 전화번호 문자열 이터러블
+        
+    Returns:
+        (정규화된 유효 번호 리스트, [(입력 순번, 원본 값, 거부 사유), ...])
+    """
+    strip = _PHONE_STRIP_PATTERN.sub
+    is_valid = _PHONE_VALID_PATTERN.match
+    valid = []
+    rejected = []
+    for index, raw in enumerate(phone_numbers):
+        if not raw:
+            rejected.append((index, raw, "전화번호는 필수입니다."))
+            continue
+        normalized = strip('', raw.strip())
+        if not normalized.startswith('+') and len(normalized) == 10 and normalized.startswith('10'):
+            normalized = '0' + normalized
+        if is_valid(normalized):
+            valid.append(normalized)
+        else:
+            rejected.append((index, raw, "유효하지 않은 전화번호 형식입니다."))
+    return valid, rejected
+
+
 class PhoneNumber(BaseModel):
     """전화번호 모델 (하이픈 포함/미포함 모두 지원)"""
     
@@ -52,7 +85,7 @@ class PhoneNumber(BaseModel):
         normalized = normalize_phone_number(v)
         
         # 정규화된 번호 검증
-        if not re.match(r'^\+?[0-9]{10,15}$', normalized):
+        if not _PHONE_VALID_PATTERN.match(normalized):
             raise ValueError("유효하지 않은 전화번호 형식입니다.")
         
         return normalized
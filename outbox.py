@@ -0,0 +1,431 @@
+"""outbox.py
+영속 발송 대기열(outbox)
+------------------------
+broadcast()와 스케줄러 작업은 메시지를 SOLAPI로 바로 보내지 않고 SQLite outbox에 먼저 기록한다.
+백그라운드 워커가 대기열을 꺼내 sms_dispatcher로 묶음 발송하고 결과를 기록한다.
+
+- 멱등 키(idempotency_key)가 같은 메시지는 한 번만 저장/발송된다. (예: 작업:날짜:사용자)
+- 네트워크 오류/타임아웃 같은 일시적 실패는 지수 백오프로 재시도하고,
+  OUTBOX_MAX_ATTEMPTS 회를 넘기거나 SOLAPI가 접수를 거부한 메시지는 dead-letter로 옮긴다.
+- 프로세스가 중간에 재시작되어도 남은 메시지는 다음 시작 시 이어서 발송된다.
+  (발송 중 상태로 OUTBOX_SENDING_TIMEOUT이 지난 메시지는 pending으로 되돌리므로 종료 직전 요청은 한 번 더 발송될 수 있음)
+- 여러 워커 프로세스가 같은 파일을 써도 되도록 꺼내기(claim)는 쓰기 잠금(BEGIN IMMEDIATE) 안에서 처리한다.
+- cancel(broadcast_id)는 아직 보내지 않은 메시지를 cancelled로 바꾼다. 워커가 이미 꺼낸 묶음도
+  SOLAPI 요청 직전에 취소 여부를 확인하므로, 이미 전송 중인 요청만 끝까지 처리된다.
+"""
+
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config import settings
+from dispatcher import sms_dispatcher
+from metrics import registry, register_collector
+from slack_logger import slack_logger
+from sms_sender import _chunked, _record_deliveries, _send_chunk
+from tracing import span
+
+__all__ = ["Outbox", "outbox"]
+
+logger = logging.getLogger(__name__)
+
+# 메시지 상태
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+DEAD = "dead"
+CANCELLED = "cancelled"
+
+outbox_retries = registry.counter("outbox_retries_total", "일시적 실패로 재시도가 예약된 메시지 수")
+
+# 결과 상태(send_bulk 형식) -> outbox 상태
+_RESULT_STATUSES = {"success": SENT, "failed": DEAD, "pending": PENDING, "sending": SENDING, "cancelled": CANCELLED}
+
+
+class Outbox:
+    """
+    SQLite(WAL) 기반 발송 대기열
+
+    Args:
+        path: SQLite 파일 경로
+        max_attempts: 최대 발송 시도 횟수 (넘으면 dead-letter)
+        retry_base: 첫 재시도 대기 시간(초), 이후 2배씩 증가
+        retry_max: 재시도 대기 시간 상한(초)
+        claim_size: 워커가 한 번에 꺼내는 최대 메시지 수
+    """
+
+    def __init__(self, path: str, max_attempts: int = settings.outbox_max_attempts,
+                 retry_base: float = settings.outbox_retry_base_seconds,
+                 retry_max: float = settings.outbox_retry_max_seconds,
+                 claim_size: int = settings.solapi_batch_size * settings.sms_dispatch_max_in_flight,
+                 poll_interval: float = settings.outbox_poll_interval,
+                 sending_timeout: float = settings.outbox_sending_timeout):
+        self.path = str(path)
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.claim_size = claim_size
+        self.poll_interval = poll_interval
+        self.sending_timeout = sending_timeout
+        self._recovered_at = 0.0
+        self._conn = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()      # 새 메시지 등록 시 워커를 깨움
+        self._progress = threading.Condition()  # 메시지 처리 완료 시 대기 중인 submit()을 깨움
+        self._stop = threading.Event()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._cancelled = set()                 # 남은 메시지가 있는 취소된 broadcast_id (워커가 발송 직전에 확인)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    broadcast_id TEXT,
+                    phone TEXT NOT NULL,
+                    body TEXT NOT NULL,
+                    user_info TEXT,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    result TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox (status, next_attempt_at);
+                CREATE INDEX IF NOT EXISTS idx_outbox_broadcast ON outbox (broadcast_id, status);
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _now() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    # --- 등록 / 대기 ---
+
+    def enqueue(self, messages: List[dict], broadcast_id: Optional[str] = None) -> List[str]:
+        """
+        메시지를 대기열에 등록하고 각 메시지의 멱등 키를 입력 순서대로 반환한다.
+        idempotency_key가 없으면 "{broadcast_id}:{phone}"을 사용하며, 이미 있는 키는 다시 등록하지 않는다.
+        """
+        now, created = time.time(), self._now()
+        keys = [item.get("idempotency_key") or f"{broadcast_id}:{item['phone']}" for item in messages]
+        rows = [
+            (key, broadcast_id, item["phone"], item["body"], item.get("user_info"), PENDING, now, created, created)
+            for key, item in zip(keys, messages)
+        ]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO outbox (idempotency_key, broadcast_id, phone, body, user_info, "
+                    "status, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        self._ensure_worker()
+        self._wakeup.set()
+        return keys
+
+    def results(self, keys: List[str]) -> Dict[str, dict]:
+        """멱등 키별 현재 상태/결과"""
+        rows = []
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows.extend(conn.execute(
+                    f"SELECT idempotency_key, phone, status, attempts, last_error, result "
+                    f"FROM outbox WHERE idempotency_key IN ({placeholders})",
+                    chunk,
+                ).fetchall())
+        return {row[0]: self._to_result(*row[1:]) for row in rows}
+
+    @staticmethod
+    def _to_result(phone, status, attempts, last_error, result) -> dict:
+        if status == SENT:
+            return {**json.loads(result), "attempts": attempts}
+        if status == DEAD:
+            return {"phone": phone, "status": "failed", "detail": last_error, "attempts": attempts}
+        return {"phone": phone, "status": status, "detail": last_error, "attempts": attempts}
+
+    def submit(self, messages: List[dict], broadcast_id: Optional[str] = None,
+               timeout: float = settings.outbox_wait_timeout) -> List[dict]:
+        """
+        메시지를 등록하고 모두 발송 완료(sent) 또는 dead-letter가 될 때까지 기다린 뒤
+        send_bulk와 같은 형식의 결과를 입력 순서대로 반환한다.
+        timeout 안에 끝나지 않은 메시지는 status가 pending/sending인 채로 반환되며, 워커가 계속 처리한다.
+        """
+        # 발송은 워커 스레드에서 일어나므로 요청 추적에는 등록~완료 대기 전체가 이 구간 하나로 나타난다.
+        with span("outbox.submit", messages=len(messages)):
+            keys = self.enqueue(messages, broadcast_id)
+            deadline = time.monotonic() + timeout
+            while True:
+                results = self.results(keys)
+                if all(result["status"] in ("success", "failed", CANCELLED) for result in results.values()):
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                with self._progress:
+                    self._progress.wait(min(remaining, self.poll_interval))
+        return [results[key] for key in keys]
+
+    def wait_for_progress(self, timeout: float) -> None:
+        """워커가 묶음 처리를 마치거나 취소가 일어날 때까지 최대 timeout초 기다린다."""
+        with self._progress:
+            self._progress.wait(timeout)
+
+    # --- 워커 ---
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._recover()
+                self._worker = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+                self._worker.start()
+
+    def start(self) -> None:
+        """워커를 시작한다. 이전 실행에서 남은 메시지가 있으면 이어서 발송한다."""
+        self._ensure_worker()
+
+    def _recover(self) -> None:
+        """
+        비정상 종료로 sending 상태에 남은 메시지를 pending으로 되돌린다.
+        다른 워커 프로세스가 발송 중인 메시지는 건드리지 않도록 sending_timeout이 지난 것만 되돌린다.
+        """
+        self._recovered_at = time.monotonic()
+        stale_before = datetime.fromtimestamp(time.time() - self.sending_timeout, timezone.utc).isoformat()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE outbox SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                    (PENDING, self._now(), SENDING, stale_before),
+                )
+        if cursor.rowcount:
+            logger.info("발송 중 상태로 남은 메시지 %d건을 다시 대기열에 넣었습니다.", cursor.rowcount)
+
+    def _claim(self) -> list:
+        """발송 시각이 된 pending 메시지를 sending으로 바꾸고 반환한다."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # 다른 프로세스의 워커가 같은 메시지를 동시에 꺼내지 않도록 쓰기 잠금을 먼저 잡는다.
+                conn.execute("BEGIN IMMEDIATE")
+                rows = conn.execute(
+                    "SELECT id, idempotency_key, broadcast_id, phone, body, user_info, attempts FROM outbox "
+                    "WHERE status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+                    (PENDING, time.time(), self.claim_size),
+                ).fetchall()
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                    [(SENDING, self._now(), row[0]) for row in rows],
+                )
+        columns = ("id", "idempotency_key", "broadcast_id", "phone", "body", "user_info", "attempts")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def _next_due_in(self) -> Optional[float]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.retry_max, self.retry_base * (2 ** (attempts - 1)))
+        # 동시에 실패한 메시지들이 한꺼번에 재시도하지 않도록 지터 추가
+        return delay * random.uniform(0.5, 1.0)
+
+    def _send_unless_cancelled(self, chunk: List[dict]) -> List[dict]:
+        """묶음 중 취소된 브로드캐스트의 메시지는 보내지 않고 cancelled 결과로 돌려준다."""
+        cancelled = [item["broadcast_id"] in self._cancelled for item in chunk]
+        active = [item for item, skip in zip(chunk, cancelled) if not skip]
+        sent = iter(_send_chunk(active) if active else [])
+        return [
+            {"phone": item["phone"], "status": CANCELLED, "detail": "작업이 취소되었습니다."} if skip else next(sent)
+            for item, skip in zip(chunk, cancelled)
+        ]
+
+    def _process(self, items: List[dict]) -> None:
+        """꺼낸 메시지를 묶음 발송하고 결과에 따라 sent / 재시도 / dead / cancelled로 기록한다."""
+        chunks = list(_chunked(items, settings.solapi_batch_size))
+        updates, deliveries, now, updated_at = [], {}, time.time(), self._now()
+        for chunk, chunk_results in zip(chunks, sms_dispatcher.map(self._send_unless_cancelled, chunks)):
+            for item, result in zip(chunk, chunk_results):
+                if result["status"] == CANCELLED:
+                    updates.append((CANCELLED, item["attempts"], now, result["detail"], None, updated_at, item["id"]))
+                    continue
+                attempts = item["attempts"] + 1
+                if result["status"] == "success":
+                    updates.append((SENT, attempts, now, None, json.dumps(result, ensure_ascii=False), updated_at, item["id"]))
+                    slack_logger.log_sms_success(item["phone"], item["body"], item["user_info"])
+                elif result.get("retryable") and attempts < self.max_attempts:
+                    updates.append((PENDING, attempts, now + self._backoff(attempts), result["detail"], None, updated_at,
+                                    item["id"]))
+                    outbox_retries.inc()
+                    continue
+                else:
+                    updates.append((DEAD, attempts, now, result["detail"], None, updated_at, item["id"]))
+                    slack_logger.log_sms_failure(item["phone"], item["body"], result["detail"], item["user_info"])
+                deliveries.setdefault(item["broadcast_id"], []).append(result)
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ?, "
+                    "result = ?, updated_at = ? WHERE id = ?",
+                    updates,
+                )
+            self._prune_cancelled(conn)
+        for broadcast_id, results in deliveries.items():
+            _record_deliveries(results, broadcast_id)
+
+    def _prune_cancelled(self, conn: sqlite3.Connection) -> None:
+        """남은(pending/sending) 메시지가 없는 브로드캐스트를 취소 목록에서 뺀다. (self._lock 안에서 호출)"""
+        for broadcast_id in list(self._cancelled):
+            remaining = conn.execute(
+                "SELECT 1 FROM outbox WHERE broadcast_id = ? AND status IN (?, ?) LIMIT 1",
+                (broadcast_id, PENDING, SENDING),
+            ).fetchone()
+            if remaining is None:
+                self._cancelled.discard(broadcast_id)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._recovered_at >= self.sending_timeout:
+                    # 실행 중 다른 워커 프로세스가 죽어 남긴 메시지도 주기적으로 회수
+                    self._recover()
+                items = self._claim()
+                if items:
+                    self._process(items)
+                    with self._progress:
+                        self._progress.notify_all()
+                    continue
+                due_in = self._next_due_in()
+            except Exception as e:
+                logger.exception("대기열 처리 중 오류 발생: %s", e)
+                due_in = None
+            wait = self.poll_interval if due_in is None else min(due_in, self.poll_interval)
+            self._wakeup.wait(wait)
+            self._wakeup.clear()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """진행 중인 묶음 발송이 끝나면 워커를 멈춘다. 남은 메시지는 다음 시작 시 이어서 발송된다."""
+        self._stop.set()
+        self._wakeup.set()
+        worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+        with self._lock:
+            if self._conn is not None and (worker is None or not worker.is_alive()):
+                self._conn.close()
+                self._conn = None
+
+    # --- 조회 / dead-letter ---
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0, CANCELLED: 0, **dict(rows)}
+
+    # --- 브로드캐스트 단위 조회 / 취소 ---
+
+    def progress(self, broadcast_id: str) -> Dict[str, int]:
+        """브로드캐스트에 속한 메시지의 상태별 개수"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM outbox WHERE broadcast_id = ? GROUP BY status", (broadcast_id,)
+            ).fetchall()
+        return {PENDING: 0, SENDING: 0, SENT: 0, DEAD: 0, CANCELLED: 0, **dict(rows)}
+
+    def broadcast_results(self, broadcast_id: str, limit: int = 100, start_after: Optional[int] = None,
+                          status: Optional[str] = None) -> dict:
+        """
+        브로드캐스트의 메시지별 결과를 등록 순서대로 limit개 조회한다. ({"items": [...], "next_cursor": ...})
+        status는 결과 상태(success/failed/pending/sending/cancelled)로 필터링한다.
+        """
+        query = "SELECT id, phone, status, attempts, last_error, result FROM outbox WHERE broadcast_id = ? AND id > ?"
+        params = [broadcast_id, start_after or 0]
+        if status:
+            query += " AND status = ?"
+            params.append(_RESULT_STATUSES.get(status, status))
+        with self._lock:
+            rows = self._connection().execute(query + " ORDER BY id LIMIT ?", (*params, limit + 1)).fetchall()
+        items = [{"id": row[0], **self._to_result(*row[1:])} for row in rows[:limit]]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+    def cancel(self, broadcast_id: str) -> int:
+        """
+        브로드캐스트의 남은 메시지를 취소하고 취소된 개수를 반환한다.
+        이미 워커가 꺼낸(sending) 메시지도 SOLAPI 요청 전이면 보내지 않고 cancelled로 기록된다.
+        """
+        self._cancelled.add(broadcast_id)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE outbox SET status = ?, last_error = ?, updated_at = ? WHERE broadcast_id = ? AND status = ?",
+                    (CANCELLED, "작업이 취소되었습니다.", self._now(), broadcast_id, PENDING),
+                )
+            self._prune_cancelled(conn)
+        with self._progress:
+            self._progress.notify_all()
+        return cursor.rowcount
+
+    def dead_letters(self, limit: int = 100, start_after: Optional[int] = None) -> dict:
+        """dead-letter 메시지를 id 순으로 limit개 조회한다. ({"items": [...], "next_cursor": ...})"""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT id, idempotency_key, broadcast_id, phone, body, attempts, last_error, updated_at "
+                "FROM outbox WHERE status = ? AND id > ? ORDER BY id LIMIT ?",
+                (DEAD, start_after or 0, limit + 1),
+            ).fetchall()
+        columns = ("id", "idempotency_key", "broadcast_id", "phone", "body", "attempts", "last_error", "updated_at")
+        items = [dict(zip(columns, row)) for row in rows[:limit]]
+        return {"items": items, "next_cursor": items[-1]["id"] if len(rows) > limit else None}
+
+    def retry_dead_letter(self, message_id: int) -> bool:
+        """dead-letter 메시지를 다시 대기열에 넣는다. dead 상태가 아니면 False"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE outbox SET status = ?, attempts = 0, next_attempt_at = ?, updated_at = ? "
+                    "WHERE id = ? AND status = ?",
+                    (PENDING, time.time(), self._now(), message_id, DEAD),
+                )
+        if cursor.rowcount:
+            self._ensure_worker()
+            self._wakeup.set()
+        return cursor.rowcount == 1
+
+
+outbox = Outbox(settings.outbox_db)
+
+
+def _collect_metrics():
+    counts = outbox.stats()
+    yield ("outbox_messages", "gauge", "발송 대기열의 상태별 메시지 수 (pending/sending이 대기열 깊이)",
+           [({"status": status}, count) for status, count in counts.items()])
+
+
+register_collector(_collect_metrics)
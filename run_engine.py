@@ -0,0 +1,121 @@
+"""run_engine.py
+정기 알림 병렬 실행 엔진
+------------------------
+정기 알림 1회 실행(또는 coordination 샤드 1개)의 사용자 명단을 청크로 나눠 워커 풀에서 처리한다.
+각 청크는 읽기(load) -> 메시지 생성(build) -> 발송(send) 순서로 진행되고, 청크끼리는 겹쳐서 진행되므로
+한 청크가 SMS 발송 완료를 기다리는 동안 다른 청크가 Firestore를 읽는다.
+
+- Firestore 읽기와 SMS 발송은 각각 RUN_READ_CONCURRENCY / RUN_SEND_CONCURRENCY 개 청크까지만 동시에 진행한다.
+  (상한은 프로세스 전체에서 공유되므로 여러 샤드가 동시에 실행되어도 유지된다)
+- 청크 처리 중 예외가 나면 그 청크의 사용자는 실패로 합산하고 나머지 청크는 계속 처리한다.
+- 워커 스레드는 호출 스레드의 로그 컨텍스트(run_id, campaign 등)를 이어받는다.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from config import settings
+
+__all__ = ["RunEngine", "run_engine"]
+
+logger = logging.getLogger(__name__)
+
+
+class RunEngine:
+    """
+    청크 단위 병렬 실행기
+
+    Args:
+        workers: 동시에 처리할 청크 수 (워커 스레드 수)
+        chunk_size: 청크 1개의 사용자 수
+        read_concurrency: 동시에 Firestore를 읽을 수 있는 청크 수
+        send_concurrency: 동시에 발송(outbox 등록 후 완료 대기)할 수 있는 청크 수
+    """
+
+    def __init__(self, workers: int = settings.run_workers, chunk_size: int = settings.run_chunk_size,
+                 read_concurrency: int = settings.run_read_concurrency,
+                 send_concurrency: int = settings.run_send_concurrency):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._read_slots = threading.BoundedSemaphore(read_concurrency)
+        self._send_slots = threading.BoundedSemaphore(send_concurrency)
+
+    def reading(self):
+        """Firestore 읽기 상한 안에서 실행할 구간 (with run_engine.reading(): ...)"""
+        return self._read_slots
+
+    def sending(self):
+        """SMS 발송 상한 안에서 실행할 구간"""
+        return self._send_slots
+
+    def _chunks(self, users: list) -> List[list]:
+        return [users[index:index + self.chunk_size] for index in range(0, len(users), self.chunk_size)]
+
+    def run(self, name: str, users: list,
+            load: Callable[[list], object],
+            build: Callable[[list, object], Tuple[list, int]],
+            send: Callable[[list], List[dict]],
+            workers: Optional[int] = None) -> dict:
+        """
+        users를 청크로 나눠 처리하고 결과를 합산한다.
+
+        Args:
+            name: 로그에 표시할 실행 이름
+            users: 처리할 사용자 목록
+            load: load(chunk) -> 청크의 읽기 결과 (읽기 상한 안에서 실행)
+            build: build(chunk, loaded) -> (발송할 메시지 목록, 생성 단계 실패 수)
+            send: send(messages) -> 메시지별 결과 목록 (status가 "success"면 성공, 발송 상한 안에서 실행)
+            workers: 이번 실행의 워커 수 (기본값은 엔진 설정)
+
+        Returns:
+            {"total", "success", "failed", "chunks", "errors", "elapsed"}
+        """
+        started = time.perf_counter()
+        chunks = self._chunks(users)
+        totals = {"total": len(users), "success": 0, "failed": 0, "chunks": len(chunks), "errors": []}
+        lock = threading.Lock()
+
+        def process(chunk: list) -> None:
+            try:
+                with self._read_slots:
+                    loaded = load(chunk)
+                messages, failed = build(chunk, loaded)
+                results = []
+                if messages:
+                    with self._send_slots:
+                        results = send(messages)
+                success = sum(1 for result in results if result["status"] == "success")
+                failed += len(results) - success
+            except Exception as e:
+                logger.exception("%s 청크 처리 실패 (%d명): %s", name, len(chunk), e)
+                with lock:
+                    totals["failed"] += len(chunk)
+                    totals["errors"].append(str(e))
+                return
+            with lock:
+                totals["success"] += success
+                totals["failed"] += failed
+
+        pool_size = max(1, min(workers or self.workers, len(chunks)))
+        if pool_size == 1:
+            for chunk in chunks:
+                process(chunk)
+        else:
+            with ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="run-engine") as executor:
+                # 청크마다 호출 스레드의 컨텍스트 복사본에서 실행 (같은 Context는 동시에 여러 스레드에서 쓸 수 없음)
+                futures = [executor.submit(contextvars.copy_context().run, process, chunk) for chunk in chunks]
+                for future in futures:
+                    future.result()
+
+        totals["elapsed"] = round(time.perf_counter() - started, 3)
+        logger.info("%s: %d명, 청크 %d개, 워커 %d개, %d명 성공, %d명 실패, %s초", name, totals['total'], totals['chunks'],
+                    pool_size, totals['success'], totals['failed'], totals['elapsed'])
+        return totals
+
+
+# 프로세스 공용 실행 엔진 (읽기/발송 상한 공유)
+run_engine = RunEngine()
@@ -1,215 +1,190 @@
 """scheduler.py
 APScheduler 기반 정기 브로드캐스트 관리
+
+설정된 캠페인(campaigns.campaigns)마다 cron 작업을 등록하고, 실행은 campaigns.run_campaign 파이프라인으로 처리한다.
+SCHEDULER_COORDINATION이 none이 아니면 리스를 가진 리더 프로세스 하나만 cron 작업을 실행한다.
+cron 작업은 실행 기록(coordination)에 샤드들을 등록하고, 모든 프로세스가 샤드를 나눠 처리한다.
 """
 
+import logging
 from datetime import datetime, timedelta
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.cron import CronTrigger
+from typing import Optional
+
 import pytz
 
-from config import TIMEZONE
-from sms_sender import send_sms
-from firestore_client import get_user_daily_usage, get_users_with_phone
+from config import settings
+from campaigns import campaigns, run_campaign, scheduled_run_id, shard_rosters, RosterSource
+from coordination import coordinator, holder_id, LeaderElector, ShardWorker
+from logging_setup import log_context
 from slack_logger import slack_logger
 
-__all__ = ["start_scheduler"]
+__all__ = ["start_scheduler", "stop_scheduler", "scheduler_status"]
+
+logger = logging.getLogger(__name__)
 
 # 한국 시간대 명시적 설정
 KST = pytz.timezone('Asia/Seoul')
 
 
-def _morning_usage_notification():
-    """오전 7시: 전날 사용량 알림 (real role 사용자만)"""
-    try:
-        # 전날 날짜 계산 (KST 기준으로 명시적 설정)
-        kst_now = datetime.now(KST)
-        yesterday = (kst_now - timedelta(days=1)).strftime('%Y-%m-%d')
-        
-        print(f"[Morning Scheduler] 현재 KST 시간: {kst_now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        print(f"[Morning Scheduler] 조회 대상 날짜: {yesterday}")
-        
-        # real role을 가진 사용자들만 조회
-        users_with_phone = get_users_with_phone(role_filter="real")
-
-        # 현재 날짜 및 시간 (KST)
-        now_kst = datetime.now(KST)
-        
-        if not users_with_phone:
-            print("[Morning Scheduler] real role을 가진 사용자가 없습니다.")
-            return
-        
-        success_count = 0
-        failed_count = 0
-        total_count = len(users_with_phone)
-        
-        for user_data in users_with_phone:
-            try:
-                # 사용자별 날짜 필터링
-                dashboard_data = user_data.get('dashboard_data', {})
-                start_date = dashboard_data.get('start_date')
-                end_date = dashboard_data.get('end_date')
-
-                if isinstance(start_date, datetime):
-                    start_date = start_date.astimezone(KST)
-                if isinstance(end_date, datetime):
-                    end_date = end_date.astimezone(KST)
-
-                # 날짜 유효성 검사
-                if not (start_date and start_date <= now_kst and (not end_date or end_date >= now_kst)):
-                    continue
-
-                user_id = user_data.get('user_id')
-                username = user_data.get('name', user_data.get('user_id', '사용자'))
-                phone = user_data.get('phone', '').strip()
-                
-                if not phone:
-                    print(f"[Morning Scheduler] {username}님의 전화번호가 없습니다.")
-                    continue
-                
-                # intention_app_user 컬렉션에서 각 사용자의 전날 사용량 조회
-                usage_data = get_user_daily_usage(user_id, yesterday, yesterday)
-                
-                total_seconds = usage_data['total_usage']['total_seconds']
-                formatted_time = usage_data['total_usage']['formatted']
-                
-                # 전날 사용 시간이 2시간(7200초) 미만인 경우에만 알림 발송
-                if total_seconds < 7200:
-                    if total_seconds > 0:
-                        message = f"{username}님, 어제 {formatted_time} 동안 사용하셨네요. 오늘은 조금만 더 힘내봐요! 💪"
-                    else:
-                        message = f"{username}님, 어제는 앱을 사용하지 않으셨네요. 오늘은 앱을 꼭 사용해보세요! 💻"
-                    
-                    # 사용자 정보 생성 (Slack 로깅용)
-                    user_info = f"사용자 ID: {user_id}, 이름: {username}, Role: {user_data.get('role', 'N/A')}"
-                    
-                    # 해당 사용자의 전화번호로 개인화된 메시지 전송
-                    try:
-                        send_sms(phone, message, user_info)
-                        success_count += 1
-                        print(f"[Morning Scheduler] {username}님({user_id}) 전날 사용량 알림 전송 완료: {phone}")
-                    except Exception as e:
-                        print(f"[Morning Scheduler] SMS 전송 실패 ({phone}, {username}): {e}")
-                        failed_count += 1
-                else:
-                    # 사용 시간이 2시간 이상인 경우 건너뛰기
-                    print(f"[Morning Scheduler] {username}님({user_id})은/는 전날 목표 사용 시간을 달성하여 알림을 건너뜁니다.")
-
-            except Exception as e:
-                print(f"[Morning Scheduler] User {user_id} 처리 실패: {e}")
-                failed_count += 1
-        
-        # 실제 발송 대상자 수 조정 (total_count는 조회된 전체 사용자 수 유지)
-        print(f"[Morning Scheduler] 전날 사용량 2시간 미만 real 사용자 대상 알림 완료: {success_count}명 전송 성공, {failed_count}명 실패")
-        
-        # 슬랙에 최종 결과 로깅
-        slack_logger.log_broadcast_result(total_count, success_count, failed_count)
-        
-    except Exception as e:
-        print(f"[Morning Scheduler] 오류 발생: {e}")
+# -------------------------
+# 샤드 실행 (coordination 사용 시)
+# -------------------------
+
+# 스케줄에 등록할 캠페인 (작업 이름 = 캠페인 이름)
+_RUN_JOBS = {name: campaign for name, campaign in campaigns.items() if campaign.enabled}
+
+_LEASE_NAME = "usage_notification_scheduler"
+_scheduler = None
 
 
-def _evening_usage_notification():
-    """오후 7시: 당일 사용량 알림 (real role 사용자만)"""
+def _start_run(job_name: str, fire_time: Optional[datetime] = None) -> bool:
+    """
+    실행 1회를 샤드로 나눠 실행 기록에 등록한다. run_id는 작업:대상 날짜이므로
+    같은 날짜의 실행이 이미 있으면(리더 인계 후 재시작 등) 다시 등록하지 않는다.
+    명단은 여기서 한 번만 조회해 샤드별로 나눠 함께 저장한다. (조회에 실패하면 샤드가 각자 조회)
+    """
+    campaign = _RUN_JOBS[job_name]
+    target_date = campaign.target_date(fire_time)
+    run_id = scheduled_run_id(campaign, target_date)
+    shard_count = settings.scheduler_run_shards
+    if coordinator.has_run(run_id):
+        logger.info("이미 등록된 실행입니다: %s", run_id, extra={"run_id": run_id})
+        return False
     try:
-        # 오늘 날짜 계산 (KST 기준으로 명시적 설정)
-        kst_now = datetime.now(KST)
-        today = kst_now.strftime('%Y-%m-%d')
-        
-        print(f"[Evening Scheduler] 현재 KST 시간: {kst_now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-        print(f"[Evening Scheduler] 조회 대상 날짜: {today}")
-        
-        # real role을 가진 사용자들만 조회
-        users_with_phone = get_users_with_phone(role_filter="real")
-
-        # 현재 날짜 및 시간 (KST)
-        now_kst = datetime.now(KST)
-        
-        if not users_with_phone:
-            print("[Evening Scheduler] real role을 가진 사용자가 없습니다.")
-            return
-        
-        success_count = 0
-        failed_count = 0
-        total_count = len(users_with_phone)
-        
-        for user_data in users_with_phone:
-            try:
-                # 사용자별 날짜 필터링
-                dashboard_data = user_data.get('dashboard_data', {})
-                start_date = dashboard_data.get('start_date')
-                end_date = dashboard_data.get('end_date')
-
-                if isinstance(start_date, datetime):
-                    start_date = start_date.astimezone(KST)
-                if isinstance(end_date, datetime):
-                    end_date = end_date.astimezone(KST)
-
-                # 날짜 유효성 검사
-                if not (start_date and start_date <= now_kst and (not end_date or end_date >= now_kst)):
-                    continue
-
-                user_id = user_data.get('user_id')
-                username = user_data.get('name', user_data.get('user_id', '사용자'))
-                phone = user_data.get('phone', '').strip()
-                
-                if not phone:
-                    print(f"[Evening Scheduler] {username}님의 전화번호가 없습니다.")
-                    continue
-                
-                # intention_app_user 컬렉션에서 각 사용자의 오늘 사용량 조회
-                usage_data = get_user_daily_usage(user_id, today, today)
-                
-                total_seconds = usage_data['total_usage']['total_seconds']
-                formatted_time = usage_data['total_usage']['formatted']
-
-                # 당일 사용 시간이 2시간(7200초) 미만인 경우에만 알림 발송
-                if total_seconds < 7200:
-                    if total_seconds > 0:
-                        message = f"{username}님, 오늘 현재까지 {formatted_time} 사용하셨어요. 남은 시간도 화이팅! 🔥"
-                    else:
-                        message = f"{username}님, 오늘은 아직 앱을 사용하지 않으셨네요. 지금부터 어플 실행 어떠세요? 💪"
-                    
-                    # 사용자 정보 생성 (Slack 로깅용)
-                    user_info = f"사용자 ID: {user_id}, 이름: {username}, Role: {user_data.get('role', 'N/A')}"
-                    
-                    # 해당 사용자의 전화번호로 개인화된 메시지 전송
-                    try:
-                        send_sms(phone, message, user_info)
-                        success_count += 1
-                        print(f"[Evening Scheduler] {username}님({user_id}) 당일 사용량 알림 전송 완료: {phone}")
-                    except Exception as e:
-                        print(f"[Evening Scheduler] SMS 전송 실패 ({phone}, {username}): {e}")
-                        failed_count += 1
-                else:
-                    # 사용 시간이 2시간 이상인 경우 건너뛰기
-                    print(f"[Evening Scheduler] {username}님({user_id})은/는 당일 목표 사용 시간을 달성하여 알림을 건너뜁니다.")
-            
-            except Exception as e:
-                print(f"[Evening Scheduler] User {user_id} 처리 실패: {e}")
-                failed_count += 1
-        
-        print(f"[Evening Scheduler] 당일 사용량 2시간 미만 real 사용자 대상 알림 완료: {success_count}명 전송 성공, {failed_count}명 실패")
-        
-        # 슬랙에 최종 결과 로깅
-        slack_logger.log_broadcast_result(total_count, success_count, failed_count)
-        
+        rosters = shard_rosters(campaign, shard_count)
     except Exception as e:
-        print(f"[Evening Scheduler] 오류 발생: {e}")
+        logger.warning("실행 등록 전 명단 조회 실패, 샤드별로 조회합니다: %s", e, extra={"run_id": run_id})
+        rosters = None
+    if not coordinator.create_run(run_id, job_name, shard_count, {"target_date": target_date}, rosters):
+        logger.info("이미 등록된 실행입니다: %s", run_id, extra={"run_id": run_id})
+        return False
+    logger.info("실행 등록: %s (샤드 %d개)", run_id, settings.scheduler_run_shards, extra={"run_id": run_id})
+    _shard_worker.wake()
+    return True
+
+
+def _run_shard(job_name: str):
+    campaign = _RUN_JOBS[job_name]
+
+    def handler(params, shard, shard_count):
+        run_id = scheduled_run_id(campaign, params["target_date"])
+        # 리더가 저장한 샤드 명단을 쓴다. (없으면 LiveSource가 전체 명단에서 이 샤드를 골라냄)
+        payload = coordinator.shard_payload(run_id, shard)
+        return run_campaign(
+            campaign, params["target_date"], shard, shard_count, report_result=False,
+            source=RosterSource(payload) if payload is not None else None, run_id=run_id,
+        )
+    return handler
+
+
+def _on_run_finalized(summary: dict) -> None:
+    """모든 샤드가 끝난 실행의 합산 결과를 Slack에 한 번 로깅한다."""
+    logger.info("실행 완료: %s - 전체 %d명, %d명 전송 성공, %d명 실패%s", summary['run_id'], summary['total'],
+                summary['success'], summary['failed'],
+                f", 실패 샤드 {summary['failed_shards']}" if summary["failed_shards"] else "",
+                extra={"run_id": summary['run_id'], "total": summary['total'], "success": summary['success'],
+                       "failed": summary['failed']})
+    slack_logger.log_broadcast_result(summary["total"], summary["success"], summary["failed"])
+
+
+def _on_elected() -> None:
+    """리더가 되면 cron 스케줄러를 시작하고, 인계 전에 놓친 최근 실행이 있으면 바로 등록한다."""
+    global _scheduler
+    from apscheduler.schedulers.background import BackgroundScheduler
+    scheduler = BackgroundScheduler(timezone=KST)
+    for job_name, campaign in _RUN_JOBS.items():
+        scheduler.add_job(_start_run, campaign.trigger, args=[job_name], name=job_name,
+                          misfire_grace_time=int(settings.scheduler_misfire_grace_seconds))
+    scheduler.start()
+    _scheduler = scheduler
+    _log_jobs(scheduler)
+
+    now = datetime.now(KST)
+    grace = timedelta(seconds=settings.scheduler_misfire_grace_seconds)
+    for job_name, campaign in _RUN_JOBS.items():
+        fire_time = campaign.trigger.get_next_fire_time(None, now - grace)
+        if fire_time is not None and fire_time <= now:
+            _start_run(job_name, fire_time)
+
+
+def _on_demoted() -> None:
+    global _scheduler
+    scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        logger.info("리더 자격을 잃어 cron 스케줄러를 중지했습니다.")
+
+
+_shard_worker = ShardWorker(coordinator, {job_name: _run_shard(job_name) for job_name in _RUN_JOBS}, _on_run_finalized)
+_leader_elector = LeaderElector(coordinator, _LEASE_NAME, _on_elected, _on_demoted)
+
+
+def _log_jobs(scheduler) -> None:
+    # 스케줄러 상태 확인
+    logger.info("등록된 작업 수: %d", len(scheduler.get_jobs()))
+    for job in scheduler.get_jobs():
+        next_run_kst = job.next_run_time.astimezone(KST) if job.next_run_time else None
+        logger.info("작업: %s - 다음 실행: %s", job.name, next_run_kst)
+
+
+def _run_local(job_name: str) -> None:
+    """coordination 없이 이 프로세스에서 바로 실행 (run_id는 샤드 실행과 같은 작업:대상 날짜)"""
+    campaign = _RUN_JOBS[job_name]
+    target_date = campaign.target_date()
+    run_id = scheduled_run_id(campaign, target_date)
+    with log_context(run_id=run_id):
+        run_campaign(campaign, target_date, run_id=run_id)
 
 
 def start_scheduler():
-    # 스케줄러를 한국 시간대로 명시적 설정
+    """
+    정기 알림 스케줄러를 시작한다.
+    coordination을 사용하면 모든 프로세스가 샤드 처리에 참여하고, 리스를 얻은 리더만 cron 작업을 실행한다.
+    """
+    global _scheduler
+    if coordinator is not None:
+        _shard_worker.start()
+        _leader_elector.start()
+        logger.info("리더 선출 참여 (%s, %s)", settings.scheduler_coordination, holder_id)
+        return
+
+    # 스케줄러를 한국 시간대로 명시적 설정 (apscheduler는 스케줄러를 시작할 때 불러온다)
+    from apscheduler.schedulers.background import BackgroundScheduler
     scheduler = BackgroundScheduler(timezone=KST)
     
-    # 개인화된 사용량 알림 스케줄 추가 (한국 시간 기준)
-    scheduler.add_job(_morning_usage_notification, CronTrigger(hour=7, minute=0, timezone=KST), name="morning_usage_notification")
-    scheduler.add_job(_evening_usage_notification, CronTrigger(hour=19, minute=0, timezone=KST), name="evening_usage_notification")
+    # 캠페인별 개인화된 사용량 알림 스케줄 추가 (한국 시간 기준)
+    for job_name, campaign in _RUN_JOBS.items():
+        scheduler.add_job(_run_local, campaign.trigger, args=[job_name], name=job_name)
     
     scheduler.start()
-    print("[Scheduler] real 사용자 대상 사용량 알림 스케줄러 시작됨 (KST 기준)")
-    
-    # 스케줄러 상태 확인
-    print(f"[Scheduler] 등록된 작업 수: {len(scheduler.get_jobs())}")
-    for job in scheduler.get_jobs():
-        next_run_kst = job.next_run_time.astimezone(KST) if job.next_run_time else None
-        print(f"[Scheduler] 작업: {job.name} - 다음 실행: {next_run_kst}")
+    _scheduler = scheduler
+    logger.info("사용량 알림 캠페인 스케줄러 시작됨 (KST 기준)")
+    _log_jobs(scheduler)
+
+
+def stop_scheduler():
+    """리스를 반환하고 스케줄러/샤드 처리를 멈춘다. (처리 중인 샤드는 끝까지 처리)"""
+    global _scheduler
+    if coordinator is not None:
+        _leader_elector.stop()
+        _shard_worker.stop()
+        coordinator.close()
+    scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+
+
+def scheduler_status(limit: int = 10) -> dict:
+    """리더/리스 상태, 등록된 캠페인과 최근 실행 기록"""
+    scheduled = [campaign.to_dict() for campaign in _RUN_JOBS.values()]
+    if coordinator is None:
+        return {"coordination": "none", "holder": holder_id, "is_leader": True, "lease": None,
+                "campaigns": scheduled, "runs": []}
+    return {
+        "coordination": settings.scheduler_coordination,
+        "holder": holder_id,
+        "is_leader": _leader_elector.is_leader,
+        "lease": coordinator.lease(_LEASE_NAME),
+        "campaigns": scheduled,
+        "runs": coordinator.runs(limit),
+    }
@@ -1,20 +1,82 @@
 """slack_logger.py
 Slack 로깅 모듈
 SMS 발송 결과와 오류를 Slack으로 전송하는 기능을 담당합니다.
+
+발송 이벤트는 제한된 크기의 큐에 넣기만 하고 바로 반환하므로, Slack 웹훅이 느려도
+SMS 발송 경로가 막히지 않습니다. 백그라운드 워커가 이벤트를 모아 SLACK_DIGEST_SIZE 건
+또는 SLACK_DIGEST_INTERVAL 초마다 요약 메시지 1건으로 전송합니다.
 """
 
 import json
-import requests
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Optional, Dict, Any
-from config import SLACK_WEBHOOK_URL, TIMEZONE
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Dict, Any, List
+
+try:
+    import fcntl
+except ImportError:     # Windows: 프로세스 간 잠금 없이 동작 (단일 워커 전용)
+    fcntl = None
+
+from config import settings, TIMEZONE
+from metrics import registry, register_collector
+from tracing import span
+
+if TYPE_CHECKING:
+    import requests
+
+logger = logging.getLogger(__name__)
+
+# 요약 메시지에 개별 블록으로 표시할 최대 실패 건수 (Slack 메시지당 블록 50개 제한)
+_MAX_FAILURE_BLOCKS = 40
+# Slack section 텍스트 길이 제한
+_MAX_SECTION_TEXT = 2900
+
+slack_post_seconds = registry.histogram("slack_post_duration_seconds", "Slack 웹훅 전송 1건 소요 시간(초)", ("outcome",))
+_POST_SECONDS = {outcome: slack_post_seconds.labels(outcome) for outcome in ("success", "error")}
 
 
 class SlackLogger:
     """Slack 로깅 클래스"""
     
-    def __init__(self, webhook_url: str = SLACK_WEBHOOK_URL):
+    def __init__(
+        self,
+        webhook_url: str = settings.slack_webhook_url,
+        queue_size: int = settings.slack_queue_size,
+        digest_size: int = settings.slack_digest_size,
+        digest_interval: float = settings.slack_digest_interval,
+        spill_path: Optional[str] = settings.slack_spill_file,
+    ):
         self.webhook_url = webhook_url
+        self.digest_size = digest_size
+        self.digest_interval = digest_interval
+        self.spill_path = Path(spill_path) if spill_path else None
+        self.dropped_count = 0   # 큐 포화로 버려진 이벤트 수
+        self.spilled_count = 0   # 큐 포화로 디스크에 임시 저장된 이벤트 수
+        
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._session = None
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._spill_lock_file = None
+        self._closed = False
+    
+    def _get_session(self) -> "requests.Session":
+        """웹훅 전송에 재사용할 HTTP 세션 (keep-alive 연결 풀, requests import와 함께 첫 전송 시 생성)"""
+        if self._session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.headers.update({'Content-Type': 'application/json'})
+            self._session = session
+        return self._session
     
     def _send_to_slack(self, payload: Dict[str, Any]) -> bool:
         """
@@ -26,28 +88,239 @@ class SlackLogger:
         Returns:
             전송 성공 여부
         """
+        started = time.perf_counter()
+        ok = False
         try:
-            response = requests.post(
-                self.webhook_url,
-                headers={'Content-Type': 'application/json'},
-                data=json.dumps(payload),
-                timeout=10
-            )
-            return response.status_code == 200
+            with span("slack.post"):
+                response = self._get_session().post(
+                    self.webhook_url,
+                    data=json.dumps(payload),
+                    timeout=10
+                )
+            ok = response.status_code == 200
+            return ok
         except Exception as e:
-            print(f"Slack 전송 실패: {e}")
+            logger.warning("Slack 전송 실패: %s", e)
+            return False
+        finally:
+            _POST_SECONDS["success" if ok else "error"].observe(time.perf_counter() - started)
+    
+    # -------------------------
+    # 이벤트 큐 / 백그라운드 워커
+    # -------------------------
+    
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="slack-logger", daemon=True)
+                self._worker.start()
+    
+    def _enqueue(self, event: Dict[str, Any]) -> None:
+        """이벤트를 큐에 넣습니다. 큐가 가득 차면 대기하지 않고 디스크에 임시 저장하거나 버립니다."""
+        with span("slack.enqueue", kind=event["kind"]):
+            if self._closed:
+                # 종료 이후 들어온 이벤트는 워커 없이 바로 전송
+                self._deliver([event])
+                return
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(event)
+            except queue.Full:
+                self._spill(event)
+    
+    @contextmanager
+    def _locked_spill(self):
+        """
+        임시 저장 파일 잠금. 여러 워커 프로세스(uvicorn --workers N)가 같은 파일을 쓰고 읽어 비우므로
+        프로세스 간에는 파일 잠금(.lock, flock)으로, 스레드 간에는 self._spill_lock으로 배타한다.
+        """
+        with self._spill_lock:
+            if fcntl is None:
+                yield
+                return
+            if self._spill_lock_file is None:
+                self._spill_lock_file = open(self.spill_path.with_name(self.spill_path.name + ".lock"), "a")
+            fcntl.flock(self._spill_lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._spill_lock_file.fileno(), fcntl.LOCK_UN)
+    
+    def _spill(self, event: Dict[str, Any]) -> None:
+        if self.spill_path is None:
+            self.dropped_count += 1
+            return
+        try:
+            with self._locked_spill(), open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+            self.spilled_count += 1
+        except OSError as e:
+            self.dropped_count += 1
+            logger.warning("Slack 이벤트 임시 저장 실패: %s", e)
+    
+    def _load_spilled(self) -> List[Dict[str, Any]]:
+        """디스크에 임시 저장된 이벤트를 읽고 파일을 비웁니다."""
+        if self.spill_path is None or not self.spill_path.exists():
+            return []
+        try:
+            with self._locked_spill():
+                with open(self.spill_path, "r", encoding="utf-8") as f:
+                    lines = f.readlines()
+                self.spill_path.unlink()
+        except FileNotFoundError:
+            return []   # 다른 워커 프로세스가 먼저 가져감
+        except OSError as e:
+            logger.warning("Slack 임시 저장 이벤트 로드 실패: %s", e)
+            return []
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+        return events
+    
+    def _run(self) -> None:
+        pending = []
+        deadline = 0.0
+        while True:
+            if not pending:
+                # 유휴 상태일 때 디스크에 밀려난 이벤트를 다시 가져온다
+                spilled = self._load_spilled()
+                if spilled:
+                    self._deliver(spilled)
+                timeout = 1.0
+            else:
+                timeout = max(0.0, deadline - time.monotonic())
+            
+            try:
+                event = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                if pending and time.monotonic() >= deadline:
+                    self._deliver(pending)
+                    pending = []
+                continue
+            
+            kind = event["kind"]
+            if kind in ("success", "failure"):
+                if not pending:
+                    deadline = time.monotonic() + self.digest_interval
+                pending.append(event)
+                if len(pending) >= self.digest_size:
+                    self._deliver(pending)
+                    pending = []
+            elif kind == "payload":
+                # 요약 대상이 아닌 메시지는 앞선 이벤트를 먼저 보낸 뒤 그대로 전송
+                self._deliver(pending + [event])
+                pending = []
+            else:  # flush / stop
+                self._deliver(pending + self._load_spilled())
+                pending = []
+                event["done"].set()
+                if kind == "stop":
+                    return
+    
+    def _deliver(self, events: List[Dict[str, Any]]) -> None:
+        """이벤트 목록을 Slack 메시지로 변환해 전송합니다. 발송 이벤트는 digest_size 단위로 요약합니다."""
+        batch = []
+        for event in events:
+            if event["kind"] == "payload":
+                self._send_digest(batch)
+                batch = []
+                self._send_to_slack(event["payload"])
+            else:
+                batch.append(event)
+                if len(batch) >= self.digest_size:
+                    self._send_digest(batch)
+                    batch = []
+        self._send_digest(batch)
+    
+    def _send_digest(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        if len(events) == 1:
+            event = events[0]
+            if event["kind"] == "success":
+                self._send_to_slack(self._build_success_payload(event))
+            else:
+                self._send_to_slack(self._build_failure_payload(event))
+            return
+        self._send_to_slack(self._build_digest_payload(events))
+    
+    def flush(self, timeout: float = 10.0) -> bool:
+        """
+        큐에 쌓인 이벤트를 모두 전송할 때까지 대기합니다.
+        
+        Returns:
+            timeout 안에 전송을 마쳤는지 여부
+        """
+        return self._signal("flush", timeout)
+    
+    def close(self, timeout: float = 10.0) -> bool:
+        """남은 이벤트를 전송하고 워커와 HTTP 세션을 정리합니다. (애플리케이션 종료 시 호출)"""
+        done = self._signal("stop", timeout)
+        self._closed = True
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+        return done
+    
+    def _signal(self, kind: str, timeout: float) -> bool:
+        if self._worker is None or not self._worker.is_alive():
+            return True
+        done = threading.Event()
+        try:
+            self._queue.put({"kind": kind, "done": done}, timeout=timeout)
+        except queue.Full:
             return False
+        return done.wait(timeout)
+    
+    # -------------------------
+    # 로깅 API
+    # -------------------------
     
     def log_sms_success(self, phone: str, message: str, user_info: Optional[str] = None) -> None:
         """
-        SMS 발송 성공 로그를 Slack으로 전송합니다.
+        SMS 발송 성공 로그를 Slack 전송 큐에 넣습니다.
         
         Args:
             phone: 수신 전화번호
             message: 발송된 메시지 내용
             user_info: 사용자 정보 (선택사항)
         """
-        current_time = datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+        self._enqueue({
+            "kind": "success",
+            "phone": phone,
+            "message": message,
+            "user_info": user_info,
+            "time": datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    
+    def log_sms_failure(self, phone: str, message: str, error: str, user_info: Optional[str] = None) -> None:
+        """
+        SMS 발송 실패 로그를 Slack 전송 큐에 넣습니다.
+        
+        Args:
+            phone: 수신 전화번호
+            message: 발송 시도한 메시지 내용
+            error: 오류 메시지
+            user_info: 사용자 정보 (선택사항)
+        """
+        self._enqueue({
+            "kind": "failure",
+            "phone": phone,
+            "message": message,
+            "error": error,
+            "user_info": user_info,
+            "time": datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+        })
+    
+    def _build_success_payload(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """단건 SMS 발송 성공 메시지"""
+        phone, message, user_info = event["phone"], event["message"], event.get("user_info")
+        current_time = event["time"]
         
         # 메시지 길이 제한 (Slack 메시지 길이 제한 고려)
         display_message = message[:100] + "..." if len(message) > 100 else message
@@ -94,19 +367,13 @@ class SlackLogger:
                 }
             })
         
-        self._send_to_slack(payload)
+        return payload
     
-    def log_sms_failure(self, phone: str, message: str, error: str, user_info: Optional[str] = None) -> None:
-        """
-        SMS 발송 실패 로그를 Slack으로 전송합니다.
-        
-        Args:
-            phone: 수신 전화번호
-            message: 발송 시도한 메시지 내용
-            error: 오류 메시지
-            user_info: 사용자 정보 (선택사항)
-        """
-        current_time = datetime.now(TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+    def _build_failure_payload(self, event: Dict[str, Any]) -> Dict[str, Any]:
+        """단건 SMS 발송 실패 메시지"""
+        phone, message, user_info = event["phone"], event["message"], event.get("user_info")
+        error = event["error"]
+        current_time = event["time"]
         
         # 메시지 길이 제한
         display_message = message[:100] + "..." if len(message) > 100 else message
@@ -160,11 +427,80 @@ class SlackLogger:
                 }
             })
         
-        self._send_to_slack(payload)
+        return payload
+    
+    def _build_digest_payload(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """여러 발송 이벤트를 묶은 요약 메시지"""
+        successes = [event for event in events if event["kind"] == "success"]
+        failures = [event for event in events if event["kind"] == "failure"]
+        
+        payload = {
+            "text": f"📱 SMS 발송 요약 (성공 {len(successes)}건, 실패 {len(failures)}건)",
+            "blocks": [
+                {
+                    "type": "header",
+                    "text": {
+                        "type": "plain_text",
+                        "text": "📱 SMS 발송 요약"
+                    }
+                },
+                {
+                    "type": "section",
+                    "fields": [
+                        {
+                            "type": "mrkdwn",
+                            "text": f"*성공:*\n{len(successes)}건"
+                        },
+                        {
+                            "type": "mrkdwn",
+                            "text": f"*실패:*\n{len(failures)}건"
+                        },
+                        {
+                            "type": "mrkdwn",
+                            "text": f"*기간:*\n{events[0]['time']} ~ {events[-1]['time']}"
+                        }
+                    ]
+                }
+            ]
+        }
+        
+        for event in failures[:_MAX_FAILURE_BLOCKS]:
+            text = f"🚨 *{event['phone']}* ({event['time']})\n```{event['error']}```"
+            if event.get("user_info"):
+                text += f"\n{event['user_info']}"
+            payload["blocks"].append({
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": text[:_MAX_SECTION_TEXT]
+                }
+            })
+        if len(failures) > _MAX_FAILURE_BLOCKS:
+            payload["blocks"].append({
+                "type": "context",
+                "elements": [{"type": "mrkdwn", "text": f"외 실패 {len(failures) - _MAX_FAILURE_BLOCKS}건"}]
+            })
+        
+        if successes:
+            lines = []
+            for event in successes:
+                line = f"• {event['phone']} ({event['time']})"
+                if event.get("user_info"):
+                    line += f" - {event['user_info']}"
+                lines.append(line)
+            payload["blocks"].append({
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": ("*성공 수신자:*\n" + "\n".join(lines))[:_MAX_SECTION_TEXT]
+                }
+            })
+        
+        return payload
     
     def log_broadcast_result(self, total_count: int, success_count: int, failed_count: int) -> None:
         """
-        브로드캐스트 결과를 Slack으로 전송합니다.
+        브로드캐스트 결과를 Slack 전송 큐에 넣습니다. (요약 없이 단독 메시지로 전송)
         
         Args:
             total_count: 전체 수신자 수
@@ -216,8 +552,17 @@ class SlackLogger:
             ]
         }
         
-        self._send_to_slack(payload)
+        self._enqueue({"kind": "payload", "payload": payload})
 
 
 # 전역 인스턴스
-slack_logger = SlackLogger() 
\ No newline at end of file
+slack_logger = SlackLogger() 
+
+def _collect_metrics():
+    yield ("slack_queue_depth", "gauge", "Slack 전송 대기 이벤트 수", [({}, slack_logger._queue.qsize())])
+    yield ("slack_events_dropped_total", "counter", "큐 포화로 버려진 Slack 이벤트 수", [({}, slack_logger.dropped_count)])
+    yield ("slack_events_spilled_total", "counter", "큐 포화로 디스크에 임시 저장된 Slack 이벤트 수",
+           [({}, slack_logger.spilled_count)])
+
+
+register_collector(_collect_metrics)
@@ -2,45 +2,94 @@
 SOLAPI 기반 SMS 발송 모듈
 """
 
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from typing import List, Optional
 
 from fastapi import HTTPException
-from solapi.model import RequestMessage
 
-from config import message_service, SENDER_PHONE
-from crud import load_recipients
+from config import settings, get_message_service
+from crud import recipient_store
+from dispatcher import sms_dispatcher
+from metrics import registry
+from tracing import span
 from slack_logger import slack_logger
+from solapi_client import SolapiHTTPError, async_solapi_client
 
-__all__ = ["send_sms", "broadcast"]
+__all__ = ["send_sms", "send_sms_async", "send_bulk", "broadcast"]
+
+logger = logging.getLogger(__name__)
+
+solapi_send_seconds = registry.histogram(
+    "solapi_send_duration_seconds", "SOLAPI 발송 요청 1건(단일/그룹) 처리 시간(초)", ("client", "outcome"),
+)
+sms_messages_sent = registry.counter("sms_messages_sent_total", "SOLAPI가 접수한 메시지 수", ("path",))
+sms_messages_failed = registry.counter(
+    "sms_messages_failed_total", "발송에 실패한 메시지 수 (outbox 재시도 예정 포함)", ("path",),
+)
+
+# 발송 경로에서 라벨 조회를 하지 않도록 자식 메트릭을 미리 만들어 둔다.
+_SEND_SECONDS = {
+    (client, outcome): solapi_send_seconds.labels(client, outcome)
+    for client in ("sync", "async") for outcome in ("success", "error")
+}
+_SENT = {path: sms_messages_sent.labels(path) for path in ("single", "async", "group")}
+_FAILED = {path: sms_messages_failed.labels(path) for path in ("single", "async", "group")}
+
+
+@contextmanager
+def _timed_send(client: str):
+    """SOLAPI 요청 1건의 소요 시간을 성공/오류로 나눠 기록 (추적 중인 요청이면 solapi 구간)"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span("solapi", client=client):
+            yield
+        outcome = "success"
+    finally:
+        _SEND_SECONDS[client, outcome].observe(time.perf_counter() - started)
+
+
+def _count_results(results: List[dict]) -> List[dict]:
+    success = sum(1 for result in results if result["status"] == "success")
+    if success:
+        _SENT["group"].inc(success)
+    if len(results) > success:
+        _FAILED["group"].inc(len(results) - success)
+    return results
+
+
+def _record_deliveries(results: List[dict], broadcast_id: Optional[str] = None) -> None:
+    """발송 이력을 기록한다. 기록 실패는 발송 결과를 바꾸지 않도록 로그만 남긴다."""
+    try:
+        recipient_store.record_deliveries(results, broadcast_id)
+    except Exception as e:
+        logger.warning("발송 이력 기록 실패 (%d건): %s", len(results), e)
 
 
 def send_sms(phone: str, body: str, user_info: Optional[str] = None) -> dict:
     """단일 SMS 발송"""
+    from solapi.model import RequestMessage
+
     try:
         # SOLAPI 메시지 모델 생성
         message = RequestMessage(
-            from_=SENDER_PHONE,  # 발신번호 (등록된 발신번호만 사용 가능)
+            from_=settings.sender_phone,  # 발신번호 (등록된 발신번호만 사용 가능)
             to=phone,  # 수신번호
             text=body,
         )
         
         # 메시지 발송
-        response = message_service.send(message)
-        
-        result = {
-            "group_id": response.group_info.group_id,
-            "total_count": response.group_info.count.total,
-            "success_count": response.group_info.count.registered_success,
-            "failed_count": response.group_info.count.registered_failed,
-            "status": "success"
-        }
-        
-        # 성공 로그를 Slack으로 전송
-        slack_logger.log_sms_success(phone, body, user_info)
-        
-        return result
+        with _timed_send("sync"):
+            response = get_message_service().send(message)
     except Exception as e:
         error_msg = f"SMS 발송 실패: {str(e)}"
+        _FAILED["single"].inc()
+        _record_deliveries([{"phone": phone, "status": "failed", "detail": error_msg}])
         
         # 실패 로그를 Slack으로 전송
         slack_logger.log_sms_failure(phone, body, str(e), user_info)
@@ -48,27 +97,293 @@ def send_sms(phone: str, body: str, user_info: Optional[str] = None) -> dict:
         # 발송 실패 시
         raise HTTPException(status_code=500, detail=error_msg)
 
+    # 여기부터는 발송이 접수된 뒤이므로 이력 기록/로그 실패를 발송 실패로 보고하지 않는다.
+    _SENT["single"].inc()
+    result = {
+        "group_id": response.group_info.group_id,
+        "total_count": response.group_info.count.total,
+        "success_count": response.group_info.count.registered_success,
+        "failed_count": response.group_info.count.registered_failed,
+        "status": "success"
+    }
+    _record_deliveries([{"phone": phone, **result}])
+    
+    # 성공 로그를 Slack으로 전송
+    slack_logger.log_sms_success(phone, body, user_info)
+    
+    return result
+
+
+async def send_sms_async(phone: str, body: str, user_info: Optional[str] = None) -> dict:
+    """
+    단일 SMS 비동기 발송 (send_sms와 같은 결과/예외 형식)
+    이벤트 루프를 막지 않도록 연결 풀을 재사용하는 async_solapi_client로 전송한다.
+    """
+    from solapi.model import RequestMessage
+
+    try:
+        message = RequestMessage(
+            from_=settings.sender_phone,
+            to=phone,
+            text=body,
+        )
+        with _timed_send("async"):
+            response = await async_solapi_client.send([message])
+    except Exception as e:
+        error_msg = f"SMS 발송 실패: {str(e)}"
+        _FAILED["async"].inc()
+        await asyncio.to_thread(
+            _record_deliveries, [{"phone": phone, "status": "failed", "detail": error_msg}]
+        )
+        slack_logger.log_sms_failure(phone, body, str(e), user_info)
+        raise HTTPException(status_code=500, detail=error_msg)
+
+    _SENT["async"].inc()
+    result = {
+        "group_id": response.group_info.group_id,
+        "total_count": response.group_info.count.total,
+        "success_count": response.group_info.count.registered_success,
+        "failed_count": response.group_info.count.registered_failed,
+        "status": "success"
+    }
+    # 발송 이력 기록은 로컬 디스크 I/O이므로 스레드에서 실행
+    await asyncio.to_thread(_record_deliveries, [{"phone": phone, **result}])
+    slack_logger.log_sms_success(phone, body, user_info)
+    return result
+
+
+def _chunked(items: List[dict], size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# 4xx 중 요청 한도 초과(HTTP 429)만 서버가 접수하지 않은 것이 확실하면서 다시 보내면 되는 오류로 본다.
+_TOO_MANY_REQUESTS = 429
+# 응답을 받지 못한 요청의 접수 여부를 조회할 때 수신번호별로 확인할 메시지 수 / 조회 시작 시각 여유
+_RECONCILE_PROBES = 3
+_RECONCILE_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def _rejected_status(error: Exception) -> Optional[int]:
+    """서버가 4xx로 요청을 거절한 예외면 HTTP 상태 코드 (응답을 받지 못했거나 5xx면 None)"""
+    if isinstance(error, SolapiHTTPError) and error.status_code < 500:
+        return error.status_code
+    return None
+
+
+def _is_not_sent(error: Exception) -> bool:
+    """연결 자체를 맺지 못해 요청이 서버에 닿지 않은 것이 확실한 예외인지"""
+    import httpx
+
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout))
+
+
+def _find_received(service, batch: str, chunk: List[dict], requested_at: datetime) -> Optional[dict]:
+    """
+    응답을 받지 못한 그룹 요청이 SOLAPI에 접수되었는지 조회한다.
+    앞쪽 수신번호 몇 개의 최근 메시지에서 customFields의 batch가 같은 메시지를 찾아 그룹을 알아낸 뒤,
+    그 그룹에 등록된 메시지를 묶음 내 인덱스 -> 메시지로 반환한다. (그룹이 없으면 None = 접수되지 않음)
+    """
+    from solapi.model.request.messages.get_messages import GetMessagesRequest
+
+    since = (requested_at - _RECONCILE_CLOCK_SKEW).isoformat()
+    group_id = None
+    for item in chunk[:_RECONCILE_PROBES]:
+        found = service.get_messages(GetMessagesRequest(to=item["phone"], start_date=since, limit=20))
+        group_id = next((
+            message.group_id for message in found.message_list.values()
+            if (message.custom_fields or {}).get("batch") == batch
+        ), None)
+        if group_id is not None:
+            break
+    if group_id is None:
+        return None
+
+    received, start_key = {}, None
+    while True:
+        page = service.get_messages(GetMessagesRequest(group_id=group_id, limit=500, start_key=start_key))
+        for message in page.message_list.values():
+            received[(message.custom_fields or {}).get("idx")] = message
+        if not page.next_key or page.next_key == start_key or len(received) >= len(chunk):
+            return received
+        start_key = page.next_key
+
+
+def _failed_results(chunk: List[dict], detail: str, retryable: bool) -> List[dict]:
+    results = [{"phone": item["phone"], "status": "failed", "detail": detail} for item in chunk]
+    if retryable:
+        for result in results:
+            result["retryable"] = True
+    return results
+
+
+def _reconcile_chunk(service, batch: str, chunk: List[dict], requested_at: datetime, error: Exception) -> List[dict]:
+    """
+    응답 없이 끝난 그룹 요청(읽기 타임아웃, 연결 끊김, 5xx)의 결과를 접수 여부 조회로 정한다.
+    allow_duplicates=True로 보내므로 접수된 메시지를 다시 보내면 중복 발송되어,
+    접수되지 않은 것이 확인된 메시지만 재시도 가능한 실패로 표시한다.
+    """
+    try:
+        received = _find_received(service, batch, chunk, requested_at)
+    except Exception as lookup_error:
+        # 접수 여부를 알 수 없으면 중복 발송을 막기 위해 재시도하지 않는다. (outbox dead -> 확인 후 재등록)
+        logger.warning("응답 없는 발송 요청의 접수 여부 조회 실패: %s", lookup_error)
+        return _failed_results(chunk, f"SMS 발송 실패(접수 여부 확인 불가): {str(error)}", retryable=False)
+    if received is None:
+        return _failed_results(chunk, f"SMS 발송 실패: {str(error)}", retryable=True)
+
+    results = []
+    for index, item in enumerate(chunk):
+        message = received.get(str(index))
+        if message is None:
+            # 그룹은 접수되었지만 이 메시지는 등록되지 않음 (메시지 자체의 접수 실패)
+            results.append({"phone": item["phone"], "status": "failed",
+                            "detail": f"SMS 발송 실패: 접수되지 않은 메시지 ({str(error)})"})
+        else:
+            results.append({
+                "phone": item["phone"],
+                "group_id": message.group_id,
+                "message_id": message.message_id,
+                "status": "success",
+                "detail": "응답을 받지 못했지만 접수 확인됨",
+            })
+    return results
+
+
+def _send_chunk(chunk: List[dict]) -> List[dict]:
+    """
+    메시지 묶음을 SOLAPI 그룹 요청 1건으로 발송하고, 메시지별 결과를 입력 순서대로 반환한다.
+    각 메시지의 customFields에 묶음 내 인덱스를 넣어 응답의 실패 목록을 원래 수신자와 매칭한다.
+
+    요청이 실패하면 재시도(outbox) 여부를 나눈다.
+    - 4xx(인증, 검증, 잔액 부족 등): 다시 보내도 같은 결과이므로 재시도하지 않음 (요청 한도 초과 HTTP 429는 재시도)
+    - 연결 실패: 서버에 닿지 않았으므로 재시도
+    - 응답을 받지 못함(타임아웃, 5xx 등): 묶음 ID(customFields의 batch)로 접수 여부를 조회한 뒤 접수되지 않은 메시지만 재시도
+    """
+    # solapi SDK(pydantic 모델)는 import 비용이 커서 첫 발송 시점에 불러온다. (이후에는 sys.modules 조회)
+    from solapi.error.MessageNotReceiveError import MessageNotReceivedError
+    from solapi.model import RequestMessage
+    from solapi.model.request.send_message_request import SendRequestConfig
+
+    batch = uuid.uuid4().hex
+    request_messages = [
+        RequestMessage(
+            from_=settings.sender_phone,
+            to=item["phone"],
+            text=item["body"],
+            custom_fields={"idx": str(index), "batch": batch},
+        )
+        for index, item in enumerate(chunk)
+    ]
+
+    service = None
+    requested_at = datetime.now(timezone.utc)
+    try:
+        service = get_message_service()
+        with _timed_send("sync"):
+            response = service.send(
+                request_messages,
+                SendRequestConfig(allow_duplicates=True, show_message_list=True),
+            )
+    except MessageNotReceivedError as e:
+        # 그룹 내 모든 메시지 접수 실패
+        failures = {
+            (failed.custom_fields or {}).get("idx"): failed.status_message
+            for failed in e.failed_messages
+        }
+        return _count_results([
+            {"phone": item["phone"], "status": "failed",
+             "detail": f"SMS 발송 실패: {failures.get(str(index), str(e))}"}
+            for index, item in enumerate(chunk)
+        ])
+    except Exception as e:
+        status = _rejected_status(e)
+        if status is not None:
+            # 서버가 요청을 거절함: 요청 한도 초과(429)만 재시도
+            return _count_results(_failed_results(chunk, f"SMS 발송 실패: {str(e)}", status == _TOO_MANY_REQUESTS))
+        if service is None or _is_not_sent(e):
+            return _count_results(_failed_results(chunk, f"SMS 발송 실패: {str(e)}", retryable=True))
+        return _count_results(_reconcile_chunk(service, batch, chunk, requested_at, e))
+
+    group_info = response.group_info
+    failures = {
+        (failed.custom_fields or {}).get("idx"): failed.status_message
+        for failed in (response.failed_message_list or [])
+    }
+    message_ids = {
+        (item.custom_fields or {}).get("idx"): item.message_id
+        for item in (response.message_list or [])
+    }
+
+    results = []
+    for index, item in enumerate(chunk):
+        key = str(index)
+        if key in failures:
+            results.append({
+                "phone": item["phone"],
+                "status": "failed",
+                "detail": f"SMS 발송 실패: {failures[key]}",
+            })
+        else:
+            results.append({
+                "phone": item["phone"],
+                "group_id": group_info.group_id,
+                "message_id": message_ids.get(key),
+                "total_count": group_info.count.total,
+                "success_count": group_info.count.registered_success,
+                "failed_count": group_info.count.registered_failed,
+                "status": "success",
+            })
+    return _count_results(results)
+
+
+def _send_and_log_chunk(chunk: List[dict]) -> List[dict]:
+    """묶음 발송 후 메시지별 결과를 Slack으로 전송 (디스패처 작업 스레드에서 실행)"""
+    chunk_results = _send_chunk(chunk)
+    for item, result in zip(chunk, chunk_results):
+        if result["status"] == "success":
+            slack_logger.log_sms_success(item["phone"], item["body"], item.get("user_info"))
+        else:
+            slack_logger.log_sms_failure(item["phone"], item["body"], result["detail"], item.get("user_info"))
+    return chunk_results
+
+
+def send_bulk(messages: List[dict], broadcast_id: Optional[str] = None) -> List[dict]:
+    """
+    여러 건의 SMS를 SOLAPI 그룹(send-many) 단위로 묶어 발송
+
+    묶음 요청들은 sms_dispatcher를 통해 초당 요청 수와 동시 요청 수 한도 안에서 동시에 전송된다.
+    SOLAPI_BATCH_SIZE=1 로 설정하면 메시지 1건당 요청 1건으로 동시 발송된다.
+
+    Args:
+        messages: {"phone", "body", "user_info"(선택)} 딕셔너리 리스트
+        broadcast_id: 발송 이력(deliveries)에 함께 기록할 브로드캐스트 ID
+
+    Returns:
+        입력 순서와 같은 메시지별 결과 리스트.
+        성공: {"phone", "group_id", "message_id", ..., "status": "success"}
+        실패: {"phone", "status": "failed", "detail"}
+    """
+    results = []
+    for chunk_results in sms_dispatcher.map(_send_and_log_chunk, _chunked(messages, settings.solapi_batch_size)):
+        results.extend(chunk_results)
+    _record_deliveries(results, broadcast_id)
+    return results
+
 
 def broadcast(body: str) -> List[dict]:
     """등록된 모든 수신자에게 메시지 발송"""
-    recipients = load_recipients()
+    recipients = recipient_store.list()
     if not recipients:
         raise HTTPException(status_code=400, detail="수신자 목록이 비어 있습니다.")
     
-    results = []
-    success_count = 0
-    failed_count = 0
-    
-    for phone in recipients:
-        try:
-            # 개별 발송 시 일부 실패가 전체를 중단시키지 않도록 예외 처리
-            result = send_sms(phone, body)
-            results.append({"phone": phone, **result})
-            success_count += 1
-        except HTTPException as exc:
-            # 실패한 경우, 로그 대신 결과 리스트에 에러 정보 추가
-            results.append({"phone": phone, "status": "failed", "detail": exc.detail})
-            failed_count += 1
+    # outbox(영속 대기열)에 등록 후 발송 완료까지 대기 (일시적 실패는 재시도, 재시작 후에도 이어서 발송)
+    # outbox가 sms_sender를 사용하므로 순환 import를 피하기 위해 함수 안에서 import
+    from outbox import outbox
+    broadcast_id = f"broadcast:{uuid.uuid4().hex}"
+    results = outbox.submit([{"phone": phone, "body": body} for phone in recipients], broadcast_id)
+    success_count = sum(1 for result in results if result["status"] == "success")
+    failed_count = len(results) - success_count
     
     # 브로드캐스트 결과를 Slack으로 전송
     slack_logger.log_broadcast_result(len(recipients), success_count, failed_count)
@@ -0,0 +1,158 @@
+"""solapi_client.py
+비동기 SOLAPI 클라이언트
+------------------------
+async 엔드포인트에서 이벤트 루프를 막지 않고 SOLAPI로 발송하기 위한 httpx.AsyncClient 기반 클라이언트.
+SOLAPI SDK(SolapiMessageService.send)는 요청마다 새 HTTP 연결을 만드는 동기 호출이므로,
+요청/응답 모델과 인증 방식은 SDK의 것을 그대로 쓰고 전송만 연결 풀을 재사용하는 비동기 방식으로 바꾼다.
+HTTP 오류 응답은 SDK와 같은 args(errorCode, errorMessage)에 상태 코드를 더한 SolapiHTTPError로 올린다.
+(SDK 동기 클라이언트도 fetch로 전송 함수를 바꿔 같은 예외를 쓴다 - config.get_message_service)
+httpx와 solapi SDK는 import 비용이 커서 첫 발송 때 불러온다. (모듈 import와 인스턴스 생성은 가벼움)
+"""
+
+import asyncio
+from typing import TYPE_CHECKING, List, Optional
+
+from config import settings
+
+if TYPE_CHECKING:
+    import httpx
+    from solapi.model import RequestMessage
+    from solapi.model.request.send_message_request import SendRequestConfig
+    from solapi.model.response.send_message_response import SendMessageResponse
+
+__all__ = ["AsyncSolapiClient", "SolapiHTTPError", "async_solapi_client", "fetch"]
+
+
+class SolapiHTTPError(Exception):
+    """
+    SOLAPI HTTP 오류 응답 (4xx/5xx)
+
+    args는 SDK 예외와 같은 (errorCode, errorMessage)이고, status_code로 요청 한도 초과(429) 등을 구분한다.
+    """
+
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(code, message)
+        self.status_code = status_code
+        self.code = code
+
+
+def _raise_for_status(response: "httpx.Response") -> None:
+    """SDK(default_fetcher)와 같은 규칙으로 오류 응답을 예외로 바꾼다. (5xx는 errorCode가 "UnknownError")"""
+    if 400 <= response.status_code < 500:
+        error = response.json()
+        raise SolapiHTTPError(response.status_code, error.get("errorCode", "UnknownError"),
+                              error.get("errorMessage", "An Error occurred"))
+    if response.status_code >= 500:
+        raise SolapiHTTPError(response.status_code, "UnknownError", response.text)
+
+
+def fetch(auth_parameter: dict, request: dict, data=None):
+    """
+    SDK default_fetcher를 대신하는 전송 함수. 요청 방식은 같고 오류 응답만 SolapiHTTPError로 올린다.
+    """
+    import httpx
+    from solapi.lib.authenticator import Authenticator
+
+    headers = {
+        "Authorization": Authenticator(auth_parameter["api_key"], auth_parameter["api_secret"]).get_auth_info(),
+        "Content-Type": "application/json",
+        "Connection": "keep-alive",
+    }
+    with httpx.Client(transport=httpx.HTTPTransport(retries=3)) as client:
+        response = client.request(method=request["method"], url=request["url"], headers=headers, json=data)
+    _raise_for_status(response)
+    try:
+        return response.json()
+    except Exception as exc:
+        raise Exception(response.text) from exc
+
+
+class AsyncSolapiClient:
+    """
+    연결 풀을 재사용하는 비동기 SOLAPI 발송 클라이언트
+
+    Args:
+        api_key / api_secret: SOLAPI 인증 정보
+        base_url: API 주소 (부하 테스트 시 로컬 스텁 서버)
+        max_connections: 최대 동시 연결 수
+        timeout: 요청 타임아웃(초)
+    """
+
+    def __init__(self, api_key: str, api_secret: str, base_url: str,
+                 max_connections: int = settings.solapi_http_max_connections,
+                 timeout: float = settings.solapi_http_timeout):
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._api_key = api_key
+        self._api_secret = api_secret
+        self._authenticator = None
+        self._client = None
+        self._client_loop = None
+        self._slots = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        """
+        이벤트 루프별로 하나의 AsyncClient(연결 풀)를 재사용한다.
+        연결 풀 대기열이 길어지면 httpcore의 요청 배정 비용이 대기 요청 수에 비례해 커지므로,
+        동시 요청 수는 연결 수만큼의 세마포어로 풀 밖에서 제한한다.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            import httpx
+
+            self._slots = asyncio.Semaphore(self.max_connections)
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                transport=httpx.AsyncHTTPTransport(retries=3),
+            )
+            self._client_loop = loop
+        return self._client
+
+    def _get_authenticator(self):
+        if self._authenticator is None:
+            from solapi.lib.authenticator import Authenticator
+
+            self._authenticator = Authenticator(self._api_key, self._api_secret)
+        return self._authenticator
+
+    async def send(self, messages: List["RequestMessage"],
+                   request_config: Optional["SendRequestConfig"] = None) -> "SendMessageResponse":
+        """SolapiMessageService.send와 같은 규칙으로 발송한다. (모든 메시지 접수 실패 시 MessageNotReceivedError)"""
+        from solapi.error.MessageNotReceiveError import MessageNotReceivedError
+        from solapi.model.request.send_message_request import SendMessageRequest
+        from solapi.model.response.send_message_response import SendMessageResponse
+
+        request = SendMessageRequest(messages=messages)
+        if request_config is not None:
+            request.app_id = request_config.app_id
+            request.allow_duplicates = request_config.allow_duplicates
+            request.show_message_list = request_config.show_message_list
+
+        client = self._get_client()
+        async with self._slots:
+            response = await client.post(
+                "/messages/v4/send-many/detail",
+                json=request.model_dump(exclude_none=True, by_alias=True),
+                headers={"Authorization": self._get_authenticator().get_auth_info()},
+            )
+        _raise_for_status(response)
+
+        result = SendMessageResponse.model_validate(response.json())
+        count = result.group_info.count
+        if result.failed_message_list and count.total == count.registered_failed:
+            raise MessageNotReceivedError(result.failed_message_list)
+        return result
+
+    async def aclose(self) -> None:
+        client, self._client, self._client_loop, self._slots = self._client, None, None, None
+        if client is not None:
+            await client.aclose()
+
+
+async_solapi_client = AsyncSolapiClient(settings.solapi_api_key, settings.solapi_api_secret, settings.solapi_base_url)
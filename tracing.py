@@ -0,0 +1,311 @@
+"""tracing.py
+요청별 구간 추적
+----------------
+느린 요청의 시간이 Firestore, SOLAPI, Slack, 응답 직렬화 중 어디에 쓰였는지 보기 위한 선택 기능.
+
+- TracingMiddleware가 추적 대상 요청에만 루트 구간을 만든다. (TRACE_HEADER 헤더, TRACE_SAMPLE_RATE 샘플링,
+  TRACE_SLOW_MS 이상 걸린 요청) 추적하지 않는 요청에서 span()은 contextvar 조회 1번만 한다.
+- 외부 호출 지점(firestore_client, sms_sender, slack_logger)은 with span(...)으로 하위 구간을 남긴다.
+  contextvar로 이어지므로 스레드 풀(run_in_threadpool, run_engine)에서 실행된 호출도 같은 트리에 붙는다.
+- TracedRoute가 엔드포인트 함수 실행을 "endpoint" 구간으로 감싸고, 엔드포인트 반환부터 응답 시작까지를
+  "serialize" 구간(응답 모델 검증 + JSON 직렬화)으로 기록한다.
+- 완료된 추적은 크기 제한 링 버퍼(TRACE_BUFFER_SIZE)에 보관하고 GET /debug/traces로 조회한다.
+  라벨과 마찬가지로 실제 경로 대신 라우트 템플릿만 기록한다. (전화번호/사용자 ID 제외)
+
+Slack 웹훅 전송은 백그라운드 워커가 요청과 별도로 처리하므로 요청 트리에는 큐 등록(slack.enqueue)만 나타난다.
+"""
+
+import contextvars
+import functools
+import inspect
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi.routing import APIRoute
+from starlette.datastructures import MutableHeaders
+
+from config import settings
+
+__all__ = ["span", "Trace", "TraceBuffer", "TracingMiddleware", "TracedRoute", "trace_buffer"]
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    """추적 트리의 구간 하나 (시각은 perf_counter 기준)"""
+
+    __slots__ = ("trace", "name", "attributes", "started", "ended", "error", "children")
+
+    def __init__(self, trace: "Trace", name: str, attributes: dict, started: Optional[float] = None):
+        self.trace = trace
+        self.name = name
+        self.attributes = attributes
+        self.started = time.perf_counter() if started is None else started
+        self.ended = None
+        self.error = None
+        self.children: List[Span] = []
+
+    def duration(self) -> float:
+        return (self.ended if self.ended is not None else time.perf_counter()) - self.started
+
+    def to_dict(self, origin: float) -> dict:
+        duration = self.duration()
+        children = [child.to_dict(origin) for child in list(self.children)]
+        node = {
+            "name": self.name,
+            **self.attributes,
+            "start_ms": round((self.started - origin) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            # 하위 구간이 동시에 실행되면 합계가 구간 시간보다 커질 수 있어 0 아래로는 내리지 않는다.
+            "self_ms": round(max(0.0, duration - sum(child.duration() for child in self.children)) * 1000, 3),
+        }
+        if self.ended is None:
+            node["unfinished"] = True
+        if self.error:
+            node["error"] = self.error
+        if children:
+            node["children"] = children
+        return node
+
+
+class _SpanScope:
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, span: Span):
+        self._span = span
+
+    def __enter__(self) -> Span:
+        self._token = _current.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        self._span.ended = time.perf_counter()
+        if exc_type is not None:
+            self._span.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        return False
+
+
+class _NoopScope:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP = _NoopScope()
+
+
+def span(name: str, **attributes):
+    """
+    현재 추적 중인 요청이면 하위 구간을 기록하는 컨텍스트 매니저를, 아니면 아무것도 하지 않는 것을 반환한다.
+    예) with span("firestore", function="get_user_data"): ...
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    child = parent.trace.add_span(parent, name, attributes)
+    return _NOOP if child is None else _SpanScope(child)
+
+
+class Trace:
+    """요청 1건의 구간 트리"""
+
+    def __init__(self, method: str, reason: str, max_spans: int = settings.trace_max_spans):
+        self.id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.reason = reason    # header | sample | slow
+        self.route = None
+        self.status = None
+        self.started_at = time.time()
+        self.max_spans = max_spans
+        self.span_count = 1
+        self.dropped_spans = 0
+        self._lock = threading.Lock()
+        self.root = Span(self, "request", {})
+
+    def add_span(self, parent: Span, name: str, attributes: dict, started: Optional[float] = None) -> Optional[Span]:
+        """parent 아래에 구간을 추가한다. 구간 수가 max_spans에 이르면 추가하지 않고 버린 수만 센다."""
+        with self._lock:
+            if self.span_count >= self.max_spans:
+                self.dropped_spans += 1
+                return None
+            self.span_count += 1
+        child = Span(self, name, attributes, started)
+        parent.children.append(child)
+        return child
+
+    def duration_ms(self) -> float:
+        return self.root.duration() * 1000
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "route": self.route,
+            "status": self.status,
+            "reason": self.reason,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration_ms(), 3),
+            "spans": self.span_count,
+            "dropped_spans": self.dropped_spans,
+        }
+
+    def totals(self) -> Dict[str, dict]:
+        """구간 이름별 호출 수와 소요 시간 합계 (같은 이름 구간 안에 중첩된 구간은 한 번만 셈)"""
+        totals = {}
+
+        def visit(node: Span, inside: frozenset):
+            if node.name not in inside:
+                entry = totals.setdefault(node.name, {"count": 0, "total_ms": 0.0})
+                entry["count"] += 1
+                entry["total_ms"] += node.duration() * 1000
+            for child in list(node.children):
+                visit(child, inside | {node.name})
+
+        for child in list(self.root.children):
+            visit(child, frozenset())
+        return {name: {"count": entry["count"], "total_ms": round(entry["total_ms"], 3)}
+                for name, entry in sorted(totals.items(), key=lambda item: -item[1]["total_ms"])}
+
+    def to_dict(self) -> dict:
+        return {**self.summary(), "totals": self.totals(), "tree": self.root.to_dict(self.root.started)}
+
+
+class TraceBuffer:
+    """최근 추적을 최대 size건 보관하는 링 버퍼"""
+
+    def __init__(self, size: int = settings.trace_buffer_size):
+        self._traces = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def list(self, limit: int = 50, route: Optional[str] = None, min_ms: float = 0.0) -> List[dict]:
+        """최신순 요약 목록"""
+        with self._lock:
+            traces = list(self._traces)
+        found = []
+        for trace in reversed(traces):
+            if route is not None and trace.route != route:
+                continue
+            if trace.duration_ms() < min_ms:
+                continue
+            found.append(trace.summary())
+            if len(found) >= limit:
+                break
+        return found
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        with self._lock:
+            return next((trace for trace in self._traces if trace.id == trace_id), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+# 프로세스 공용 버퍼
+trace_buffer = TraceBuffer()
+
+
+class TracingMiddleware:
+    """
+    추적 대상 요청에 루트 구간을 만들고, 끝나면 링 버퍼에 넣는 ASGI 미들웨어
+    헤더/샘플링으로 추적한 요청은 응답 헤더 X-Trace-Id로 추적 ID를 알려 준다.
+    """
+
+    def __init__(self, app, buffer: TraceBuffer = trace_buffer, header: str = settings.trace_header,
+                 sample_rate: float = settings.trace_sample_rate, slow_ms: float = settings.trace_slow_ms,
+                 max_spans: int = settings.trace_max_spans):
+        self.app = app
+        self.buffer = buffer
+        self.header = header.lower().encode("latin-1") if header else None
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.max_spans = max_spans
+
+    def _reason(self, scope) -> Optional[str]:
+        if self.header is not None and any(name == self.header for name, _ in scope["headers"]):
+            return "header"
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        if self.slow_ms > 0:
+            return "slow"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        reason = self._reason(scope) if scope["type"] == "http" else None
+        if reason is None:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(scope["method"], reason, self.max_spans)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                _record_serialize(trace)
+                if reason != "slow":
+                    MutableHeaders(scope=message).append("X-Trace-Id", trace.id)
+            await send(message)
+
+        token = _current.set(trace.root)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            trace.root.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current.reset(token)
+            trace.root.ended = time.perf_counter()
+            trace.route = getattr(scope.get("route"), "path", None) or "unmatched"
+            trace.status = status[0]
+            if reason != "slow" or trace.duration_ms() >= self.slow_ms:
+                self.buffer.add(trace)
+
+
+def _record_serialize(trace: Trace) -> None:
+    """엔드포인트 반환 시각부터 응답 시작까지를 serialize 구간으로 추가한다."""
+    endpoint = next((child for child in reversed(trace.root.children) if child.name == "endpoint"), None)
+    if endpoint is None or endpoint.ended is None:
+        return
+    serialize = trace.add_span(trace.root, "serialize", {}, started=endpoint.ended)
+    if serialize is not None:
+        serialize.ended = time.perf_counter()
+
+
+def _traced_endpoint(endpoint):
+    """엔드포인트 함수 실행을 endpoint 구간으로 감싼다. (FastAPI는 __wrapped__의 시그니처로 파라미터를 해석)"""
+    name = endpoint.__name__
+
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            with span("endpoint", function=name):
+                return await endpoint(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with span("endpoint", function=name):
+            return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class TracedRoute(APIRoute):
+    """엔드포인트 실행 구간을 기록하는 라우트 (app.router.route_class로 지정)"""
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
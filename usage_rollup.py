@@ -0,0 +1,270 @@
+"""usage_rollup.py
+사용자별/일별(KST) 사용량 사전 집계(rollup)
+--------------------------------------------
+원본 sessions를 매번 다시 읽지 않도록, 마감된 날짜의 사용량(초, 세션 수)을 로컬 SQLite에
+날짜 버킷으로 저장해 두고 기간 조회는 버킷 합산으로 응답한다.
+
+- 사용자별로 집계가 끝난 연속 구간 [first_day, watermark_day]를 기록하고,
+  이후 조회에서는 watermark 이후에 추가된 날짜만 원본 세션에서 읽어 버킷을 채운다.
+- 세션이 늦게 동기화될 수 있으므로 날짜가 끝난 뒤 USAGE_ROLLUP_SETTLE_HOURS 시간이
+  지나야 마감된 것으로 본다. 아직 마감되지 않은 날짜(오늘 포함)는 매번 원본에서 계산한다.
+"""
+
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from config import settings, TIMEZONE
+from firestore_client import build_total_usage, get_daily_usage_for_users, get_user_usage_by_day
+
+__all__ = ["UsageRollupStore", "usage_rollup_store", "get_usage_summary", "get_daily_totals"]
+
+_DATE_FORMAT = '%Y-%m-%d'
+
+
+class UsageRollupStore:
+    """usage_daily(일별 버킷)와 rollup_state(사용자별 집계 구간)를 보관하는 SQLite 저장소"""
+
+    def __init__(self, path: str):
+        self.path = str(path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS usage_daily (
+                    user_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    total_seconds REAL NOT NULL,
+                    session_count INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, day)
+                );
+                CREATE TABLE IF NOT EXISTS rollup_state (
+                    user_id TEXT PRIMARY KEY,
+                    first_day TEXT NOT NULL,
+                    watermark_day TEXT NOT NULL
+                );
+                """
+            )
+            self._conn = conn
+        return self._conn
+
+    def get_state(self, user_id: str) -> Optional[Tuple[str, str]]:
+        """집계가 끝난 연속 구간 (first_day, watermark_day). 없으면 None"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT first_day, watermark_day FROM rollup_state WHERE user_id = ?", (user_id,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def save_days(self, user_id: str, buckets: Dict[str, Tuple[float, int]],
+                  first_day: Optional[str] = None, watermark_day: Optional[str] = None) -> None:
+        """날짜 버킷을 저장하고, 구간이 주어지면 기존 구간과 합쳐 넓힌다."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO usage_daily (user_id, day, total_seconds, session_count) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(user_id, day, seconds, count) for day, (seconds, count) in buckets.items()],
+                )
+                if first_day and watermark_day:
+                    conn.execute(
+                        "INSERT INTO rollup_state (user_id, first_day, watermark_day) VALUES (?, ?, ?) "
+                        "ON CONFLICT(user_id) DO UPDATE SET "
+                        "first_day = MIN(first_day, excluded.first_day), "
+                        "watermark_day = MAX(watermark_day, excluded.watermark_day)",
+                        (user_id, first_day, watermark_day),
+                    )
+
+    def save_day(self, day: str, buckets: Dict[str, Tuple[float, int]],
+                 ranges: Dict[str, Tuple[str, str]]) -> None:
+        """여러 사용자의 같은 날짜 버킷과 구간을 한 트랜잭션으로 저장한다."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO usage_daily (user_id, day, total_seconds, session_count) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(user_id, day, seconds, count) for user_id, (seconds, count) in buckets.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO rollup_state (user_id, first_day, watermark_day) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET "
+                    "first_day = MIN(first_day, excluded.first_day), "
+                    "watermark_day = MAX(watermark_day, excluded.watermark_day)",
+                    [(user_id, first_day, watermark_day) for user_id, (first_day, watermark_day) in ranges.items()],
+                )
+
+    def sum_range(self, user_id: str, start_day: str, end_day: str) -> Tuple[float, int]:
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT COALESCE(SUM(total_seconds), 0), COALESCE(SUM(session_count), 0) "
+                "FROM usage_daily WHERE user_id = ? AND day BETWEEN ? AND ?",
+                (user_id, start_day, end_day),
+            ).fetchone()
+        return float(row[0]), int(row[1])
+
+    def _select_in(self, sql: str, user_ids: list, params: tuple = ()) -> list:
+        """user_id IN (...) 조회를 SQLite 바인딩 변수 개수 제한 안에서 나누어 실행한다."""
+        rows = []
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(user_ids), 500):
+                chunk = user_ids[start:start + 500]
+                placeholders = ",".join("?" for _ in chunk)
+                rows.extend(conn.execute(sql.format(placeholders=placeholders), [*params, *chunk]).fetchall())
+        return rows
+
+    def get_day(self, user_ids: Iterable[str], day: str) -> Dict[str, Tuple[float, int]]:
+        """여러 사용자의 특정 날짜 버킷. 저장되지 않은 사용자는 결과에 없음"""
+        rows = self._select_in(
+            "SELECT user_id, total_seconds, session_count FROM usage_daily "
+            "WHERE day = ? AND user_id IN ({placeholders})",
+            list(user_ids), (day,),
+        )
+        return {user_id: (seconds, count) for user_id, seconds, count in rows}
+
+    def get_states(self, user_ids: Iterable[str]) -> Dict[str, Tuple[str, str]]:
+        """여러 사용자의 집계 구간. 구간이 없는 사용자는 결과에 없음"""
+        rows = self._select_in(
+            "SELECT user_id, first_day, watermark_day FROM rollup_state WHERE user_id IN ({placeholders})",
+            list(user_ids),
+        )
+        return {user_id: (first_day, watermark_day) for user_id, first_day, watermark_day in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+usage_rollup_store = UsageRollupStore(settings.usage_rollup_db)
+
+
+def _parse_day(value: str) -> date:
+    return datetime.strptime(value, _DATE_FORMAT).date()
+
+
+def _format_day(value: date) -> str:
+    return value.strftime(_DATE_FORMAT)
+
+
+def _last_settled_day() -> date:
+    """버킷으로 저장해도 되는(마감된) 마지막 날짜"""
+    settled_now = datetime.now(TIMEZONE) - timedelta(hours=settings.usage_rollup_settle_hours)
+    return settled_now.date() - timedelta(days=1)
+
+
+def _fill_days(user_id: str, start_day: date, end_day: date) -> Dict[str, Tuple[float, int]]:
+    """원본 세션에서 [start_day, end_day] 버킷을 계산한다. 세션이 없는 날짜도 0으로 채운다."""
+    buckets = get_user_usage_by_day(user_id, _format_day(start_day), _format_day(end_day))
+    day = start_day
+    while day <= end_day:
+        buckets.setdefault(_format_day(day), (0.0, 0))
+        day += timedelta(days=1)
+    return buckets
+
+
+def _refresh_user(user_id: str, start_day: date, end_day: date) -> None:
+    """[start_day, end_day](마감된 날짜)가 버킷으로 저장되어 있도록 부족한 부분만 원본에서 채운다."""
+    state = usage_rollup_store.get_state(user_id)
+    if state is None:
+        buckets = _fill_days(user_id, start_day, end_day)
+        usage_rollup_store.save_days(user_id, buckets, _format_day(start_day), _format_day(end_day))
+        return
+
+    first_day, watermark_day = _parse_day(state[0]), _parse_day(state[1])
+    if start_day < first_day:
+        buckets = _fill_days(user_id, start_day, first_day - timedelta(days=1))
+        usage_rollup_store.save_days(user_id, buckets, _format_day(start_day), state[1])
+    if end_day > watermark_day:
+        # watermark 이후 날짜만 증분 집계
+        buckets = _fill_days(user_id, watermark_day + timedelta(days=1), end_day)
+        usage_rollup_store.save_days(user_id, buckets, state[0], _format_day(end_day))
+
+
+def get_usage_summary(user_id: str, start_date: str, end_date: str) -> dict:
+    """
+    특정 사용자의 기간 내 총 사용 시간을 버킷 합산으로 계산합니다.
+    get_user_daily_usage와 같은 형식이며, 세션 상세(sessions)는 포함하지 않습니다.
+    """
+    start_day, end_day = _parse_day(start_date), _parse_day(end_date)
+    settled_end = min(end_day, _last_settled_day())
+
+    total_seconds, session_count = 0.0, 0
+    if start_day <= settled_end:
+        _refresh_user(user_id, start_day, settled_end)
+        total_seconds, session_count = usage_rollup_store.sum_range(
+            user_id, _format_day(start_day), _format_day(settled_end)
+        )
+
+    # 아직 마감되지 않은 날짜는 원본 세션에서 계산 (저장하지 않음)
+    partial_start = max(start_day, settled_end + timedelta(days=1))
+    if partial_start <= end_day:
+        for seconds, count in get_user_usage_by_day(user_id, _format_day(partial_start), end_date).values():
+            total_seconds += seconds
+            session_count += count
+
+    return {
+        'user_id': user_id,
+        'date_range': {
+            'start_date': start_date,
+            'end_date': end_date
+        },
+        'total_usage': build_total_usage(total_seconds),
+        'session_count': session_count,
+        'sessions': []
+    }
+
+
+def get_daily_totals(user_ids: Iterable[str], target_date: str) -> dict:
+    """
+    여러 사용자의 특정 날짜 사용량. get_daily_usage_for_users와 같은 형식입니다.
+    마감된 날짜는 저장된 버킷을 읽고, 버킷이 없는 사용자만 원본에서 일괄 집계한 뒤 저장합니다.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    target_day = _parse_day(target_date)
+    if target_day > _last_settled_day():
+        return get_daily_usage_for_users(user_ids, target_date)
+
+    totals = usage_rollup_store.get_day(user_ids, target_date)
+    missing = [user_id for user_id in user_ids if user_id not in totals]
+    if missing:
+        fetched = get_daily_usage_for_users(missing, target_date)
+        buckets = {
+            user_id: (float(usage['total_usage']['total_seconds']), usage['session_count'])
+            for user_id, usage in fetched.items()
+        }
+        states = usage_rollup_store.get_states(missing)
+        ranges = {}
+        for user_id in buckets:
+            extended = _extended_range(states.get(user_id), target_day)
+            if extended:
+                ranges[user_id] = extended
+        usage_rollup_store.save_day(target_date, buckets, ranges)
+        totals.update(buckets)
+
+    return {
+        user_id: {
+            'total_usage': build_total_usage(seconds),
+            'session_count': count,
+        }
+        for user_id, (seconds, count) in totals.items()
+    }
+
+
+def _extended_range(state: Optional[Tuple[str, str]], day: date) -> Optional[Tuple[str, str]]:
+    """day를 기존 집계 구간에 이어 붙일 수 있으면 새 구간을, 아니면 None을 반환"""
+    if state is None:
+        return _format_day(day), _format_day(day)
+    first_day, watermark_day = _parse_day(state[0]), _parse_day(state[1])
+    if first_day - timedelta(days=1) <= day <= watermark_day + timedelta(days=1):
+        return _format_day(min(first_day, day)), _format_day(max(watermark_day, day))
+    return None